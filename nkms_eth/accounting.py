@@ -0,0 +1,401 @@
+from collections import namedtuple, OrderedDict
+from itertools import accumulate
+from typing import List, Tuple, Dict
+
+
+Downtime = namedtuple('Downtime', ('start_period', 'end_period'))
+
+
+def find_downtime(downtime: List[Downtime], start_index: int, period: int) -> int:
+    """See MinersEscrow.findDowntime; The index of the first downtime from start_index ending in or after the period"""
+
+    low, high = start_index, len(downtime)
+    while low < high:
+        middle = (low + high) // 2
+        if downtime[middle].end_period < period:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def get_downtime_periods(downtime: List[Downtime], downtime_cum_sum: List[int], start_index: int,
+                         min_period: int, max_period: int) -> Tuple[int, int]:
+    """
+    See MinersEscrow.getDowntimePeriods;
+    Returns the number of downtime periods from min_period to max_period and the index to continue from.
+    """
+
+    def cum_sum(index: int) -> int:
+        return downtime_cum_sum[index - 1] if index > 0 else 0
+
+    first_index = find_downtime(downtime, start_index, min_period)
+    stop_index = find_downtime(downtime, first_index, max(min_period, max_period))
+
+    downtime_periods = 0
+    if first_index < stop_index:
+        start_period = downtime[first_index].start_period
+        downtime_periods = cum_sum(stop_index) - cum_sum(first_index) - (max(min_period, start_period) - start_period)
+    if min_period <= max_period and stop_index < len(downtime) and downtime[stop_index].start_period <= max_period:
+        downtime_periods += max_period - max(min_period, downtime[stop_index].start_period) + 1
+
+    return downtime_periods, stop_index
+
+
+def calculate_refund(rate: int, start_period: int, last_period: int, downtime: List[Downtime],
+                     index_of_downtime_periods: int, last_refunded_period: int, last_active_period: int,
+                     current_period: int, downtime_cum_sum: List[int]=None) -> Tuple[int, int, int]:
+    """
+    See PolicyManager.calculateRefund;
+    Returns the refund value with the arrangement's new indexOfDowntimePeriods and lastRefundedPeriod.
+    """
+
+    if downtime_cum_sum is None:
+        downtime_cum_sum = list(accumulate(end - start + 1 for start, end in downtime))
+
+    max_period = min(current_period, last_period)
+    min_period = max(start_period, last_refunded_period)
+    downtime_periods = 0
+
+    index = index_of_downtime_periods
+    if index < len(downtime):
+        downtime_periods, index = get_downtime_periods(downtime, downtime_cum_sum, index, min_period, max_period)
+
+    if index == len(downtime) and last_active_period < max_period:
+        downtime_periods += max_period - max(min_period - 1, last_active_period)
+
+    return rate * downtime_periods, index, max_period + 1
+
+
+class ArrangementState:
+    """Off-chain copy of PolicyManager.ArrangementInfo"""
+
+    def __init__(self, index_of_downtime_periods: int, last_refunded_period: int=0, active: bool=True):
+        self.index_of_downtime_periods = index_of_downtime_periods
+        self.last_refunded_period = last_refunded_period
+        self.active = active
+
+
+class PolicyState:
+    """Off-chain copy of PolicyManager.Policy"""
+
+    def __init__(self, policy_id: bytes, client: str, rate: int, start_period: int, last_period: int,
+                 nodes: List[str]):
+
+        self.id = policy_id
+        self.client = client
+        self.rate = rate
+        self.start_period = start_period
+        self.last_period = last_period
+        self.nodes = nodes
+        self.disabled = False
+
+        self.arrangements = OrderedDict()    # Node address -> ArrangementState
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(client={}, nodes={}, disabled={})"
+        return r.format(class_name, self.client, len(self.nodes), self.disabled)
+
+
+class NodeState:
+    """
+    Off-chain copy of the escrow downtime record of a node (MinersEscrow.MinerInfo)
+    and of its reward record (PolicyManager.NodeInfo).
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+
+        # MinersEscrow
+        self.value = 0
+        self.last_active_period = 0
+        self.downtime = list()
+        self.downtime_cum_sum = list()     # Downtime periods up to and including each downtime
+        self.confirmed_periods = list()    # Confirmed but not yet mined
+
+        # PolicyManager
+        self.reward = 0
+        self.reward_rate = 0
+        self.last_mined_period = 0
+        self.reward_delta = dict()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(address={}, reward={}, downtime={})"
+        return r.format(class_name, self.address, self.reward, len(self.downtime))
+
+    def confirm_activity(self, next_period: int) -> None:
+        """See MinersEscrow.confirmActivity(uint256)"""
+
+        if self.last_active_period == next_period:
+            return    # Only the locked value of an already confirmed period changed
+
+        current_period = next_period - 1
+        if self.last_active_period < current_period:
+            self.downtime.append(Downtime(self.last_active_period + 1, current_period))
+            total = self.downtime_cum_sum[-1] if self.downtime_cum_sum else 0
+            self.downtime_cum_sum.append(total + current_period - self.last_active_period)
+        self.confirmed_periods.append(next_period)
+        self.last_active_period = next_period
+
+    def update_reward(self, period: int) -> None:
+        """See PolicyManager.updateReward"""
+
+        if self.last_mined_period == 0 or period <= self.last_mined_period:
+            return
+        self.reward_rate = self.get_reward_rate(period)
+        self.last_mined_period = period
+        self.reward += self.reward_rate
+
+    def get_reward_rate(self, period: int) -> int:
+        """Reward earned for mining the period, given the reward deltas known now"""
+
+        if self.last_mined_period == 0:
+            return 0
+        changes = (delta for delta_period, delta in self.reward_delta.items()
+                   if self.last_mined_period < delta_period <= period)
+        return self.reward_rate + sum(changes)
+
+    def add_reward_delta(self, period: int, delta: int) -> None:
+        self.reward_delta[period] = self.reward_delta.get(period, 0) + delta
+
+
+class PolicyAccountant:
+    """
+    Reconstructs the reward and refund state of PolicyManager locally,
+    by replaying MinersEscrow and PolicyManager events from a block cursor.
+
+    Withdrawable rewards and refundable amounts are then answered for any node or policy
+    without eth_calls; The fixed terms of each policy are read once, when it is created.
+    """
+
+    _escrow_events = ('Deposited', 'Withdrawn', 'ActivityConfirmed', 'Mined')
+    _policy_events = ('PolicyCreated', 'PolicyRevoked', 'ArrangementRevoked', 'RefundForArrangement',
+                      'RefundForPolicy', 'Withdrawn')
+
+    def __init__(self, policy_agent, miner_agent):
+        self.policy_agent = policy_agent
+        self.miner_agent = miner_agent
+
+        self.block_cursor = None    # Last processed block number
+        self.current_period = None
+
+        self.nodes = dict()            # Address -> NodeState
+        self.policies = OrderedDict()  # Policy ID -> PolicyState
+
+        self.__seconds_per_period = None
+        self.__block_periods = dict()
+        self.__deposits = set()    # (Transaction hash, owner) of Deposited events not applied yet
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(policies={}, nodes={}, block_cursor={})"
+        return r.format(class_name, len(self.policies), len(self.nodes), self.block_cursor)
+
+    @property
+    def _web3(self):
+        return self.miner_agent.blockchain._chain.web3
+
+    def _get_period(self, block_number: int) -> int:
+        if block_number not in self.__block_periods:
+            timestamp = self._web3.eth.getBlock(block_number)['timestamp']
+            self.__block_periods[block_number] = timestamp // self.__seconds_per_period
+        return self.__block_periods[block_number]
+
+    def _get_node(self, address: str) -> NodeState:
+        address = self._web3.toChecksumAddress(address)
+        if address not in self.nodes:
+            self.nodes[address] = NodeState(address=address)
+        return self.nodes[address]
+
+    def _read_policy(self, policy_id: bytes) -> PolicyState:
+        """Read the terms of a policy, which never change after creation"""
+
+        null_address = self.miner_agent._deployer._null_addr
+        fields = (0, 4, 5, 6)    # PolicyManager.PolicyInfoField Client, Rate, StartPeriod, LastPeriod
+        values = self.policy_agent.read_batch('getPolicyInfo', ((field, policy_id, null_address) for field in fields))
+        client_bytes, rate, start_period, last_period = values
+
+        n_nodes = self.policy_agent.read().getPolicyNodesLength(policy_id)
+        nodes = self.policy_agent.read_batch('getPolicyNode', ((policy_id, index) for index in range(n_nodes)))
+
+        policy = PolicyState(policy_id=policy_id,
+                             client=self._web3.toChecksumAddress('0x' + client_bytes[-20:].hex()),
+                             rate=int.from_bytes(rate, byteorder='big'),
+                             start_period=int.from_bytes(start_period, byteorder='big'),
+                             last_period=int.from_bytes(last_period, byteorder='big'),
+                             nodes=[self._web3.toChecksumAddress(node) for node in nodes])
+        return policy
+
+    @staticmethod
+    def _get_policy_id(args: dict) -> bytes:
+        policy_id = args['policyId']
+        return policy_id.encode('latin-1') if isinstance(policy_id, str) else bytes(policy_id)
+
+    def _refund(self, policy: PolicyState, node_address: str, period: int) -> int:
+        """Apply PolicyManager.calculateRefund to the arrangement in the period"""
+
+        node, arrangement = self.nodes[node_address], policy.arrangements[node_address]
+        value, arrangement.index_of_downtime_periods, arrangement.last_refunded_period = \
+            calculate_refund(rate=policy.rate,
+                             start_period=policy.start_period,
+                             last_period=policy.last_period,
+                             downtime=node.downtime,
+                             downtime_cum_sum=node.downtime_cum_sum,
+                             index_of_downtime_periods=arrangement.index_of_downtime_periods,
+                             last_refunded_period=arrangement.last_refunded_period,
+                             last_active_period=node.last_active_period,
+                             current_period=period)
+        return value
+
+    def _apply(self, source: str, entry: dict) -> None:
+        name, args = entry['event'], entry['args']
+        period = self._get_period(entry['blockNumber'])
+
+        if source == 'escrow':
+            node = self._get_node(args['owner'])
+            deposit = (entry['transactionHash'], node.address)
+            if deposit in self.__deposits:
+                # deposit and preDeposit set lastActivePeriod of a miner without tokens
+                # before any event of the transaction
+                self.__deposits.remove(deposit)
+                if node.value == 0:
+                    node.last_active_period = period
+            if name == 'ActivityConfirmed':
+                node.confirm_activity(args['period'])
+            elif name == 'Deposited':
+                node.value += args['value']
+            elif name == 'Withdrawn':
+                node.value -= args['value']
+            elif name == 'Mined':
+                node.value += args['value']
+                mined_periods = [p for p in node.confirmed_periods if p <= args['period']]
+                for mined_period in mined_periods:
+                    node.update_reward(mined_period)
+                node.confirmed_periods = node.confirmed_periods[len(mined_periods):]
+            return
+
+        if name == 'PolicyCreated':
+            policy = self._read_policy(self._get_policy_id(args))
+            self.policies[policy.id] = policy
+            for node_address in policy.nodes:
+                node = self._get_node(node_address)
+                node.add_reward_delta(policy.start_period, policy.rate)
+                node.add_reward_delta(policy.last_period + 1, -policy.rate)
+                if node.last_mined_period == 0:
+                    node.last_mined_period = period
+                policy.arrangements[node.address] = ArrangementState(index_of_downtime_periods=len(node.downtime))
+            return
+
+        if name == 'Withdrawn':
+            self._get_node(args['node']).reward = 0
+            return
+
+        policy = self.policies[self._get_policy_id(args)]
+        if name == 'ArrangementRevoked':
+            node = self._get_node(args['node'])
+            arrangement = policy.arrangements[node.address]
+            self._refund(policy, node.address, period)
+            node.add_reward_delta(arrangement.last_refunded_period, -policy.rate)
+            node.add_reward_delta(policy.last_period + 1, policy.rate)
+            arrangement.active = False
+        elif name == 'RefundForArrangement':
+            node_address = self._web3.toChecksumAddress(args['node'])
+            self._refund(policy, node_address, period)
+            if policy.arrangements[node_address].last_refunded_period > policy.last_period:
+                policy.arrangements[node_address].active = False
+        elif name == 'RefundForPolicy':
+            if not any(arrangement.active for arrangement in policy.arrangements.values()):
+                policy.disabled = True
+        elif name == 'PolicyRevoked':
+            policy.disabled = True
+
+    def sync(self) -> int:
+        """Replay the events emitted since the block cursor and return the number of processed events"""
+
+        if self.__seconds_per_period is None:
+            self.__seconds_per_period = self.miner_agent.read().secondsPerPeriod()
+
+        latest_block = self._web3.eth.getBlock('latest')
+        self.current_period = latest_block['timestamp'] // self.__seconds_per_period
+        from_block = 0 if self.block_cursor is None else self.block_cursor + 1
+        if latest_block['number'] < from_block:
+            return 0
+
+        filter_params = {'fromBlock': from_block, 'toBlock': latest_block['number']}
+        entries = list()
+        for source, agent, event_names in (('escrow', self.miner_agent, self._escrow_events),
+                                           ('policy', self.policy_agent, self._policy_events)):
+            for event_name in event_names:
+                for entry in agent._contract.pastEvents(event_name, filter_params).get():
+                    entries.append((source, entry))
+        entries.sort(key=lambda item: (item[1]['blockNumber'], item[1]['logIndex']))
+        self.__deposits.update((entry['transactionHash'], self._web3.toChecksumAddress(entry['args']['owner']))
+                               for source, entry in entries if source == 'escrow' and entry['event'] == 'Deposited')
+
+        for source, entry in entries:
+            self._apply(source, entry)
+
+        self.block_cursor = latest_block['number']
+        return len(entries)
+
+    def get_withdrawable_reward(self, node_address: str) -> int:
+        """Reward the node can withdraw from the PolicyManager now"""
+
+        node = self.nodes.get(self._web3.toChecksumAddress(node_address))
+        return node.reward if node is not None else 0
+
+    def get_reward_rate(self, node_address: str, period: int=None) -> int:
+        """Reward the node will earn for mining the period (the current period by default)"""
+
+        node = self.nodes.get(self._web3.toChecksumAddress(node_address))
+        if node is None:
+            return 0
+        return node.get_reward_rate(self.current_period if period is None else period)
+
+    def get_refund(self, policy_id: bytes, period: int=None) -> Dict[str, int]:
+        """Value refund(policyId) would return to the client in the period, per active arrangement"""
+
+        policy = self.policies[policy_id]
+        period = self.current_period if period is None else period
+        if policy.disabled:
+            return dict()
+
+        refunds = OrderedDict()
+        for node_address, arrangement in policy.arrangements.items():
+            if not arrangement.active:
+                continue
+            node = self.nodes[node_address]
+            value, _index, _last_refunded_period = \
+                calculate_refund(rate=policy.rate,
+                                 start_period=policy.start_period,
+                                 last_period=policy.last_period,
+                                 downtime=node.downtime,
+                                 downtime_cum_sum=node.downtime_cum_sum,
+                                 index_of_downtime_periods=arrangement.index_of_downtime_periods,
+                                 last_refunded_period=arrangement.last_refunded_period,
+                                 last_active_period=node.last_active_period,
+                                 current_period=period)
+            refunds[node_address] = value
+        return refunds
+
+    def get_revocation_refund(self, policy_id: bytes, period: int=None) -> int:
+        """Value revokePolicy(policyId) would return to the client in the period"""
+
+        policy = self.policies[policy_id]
+        period = self.current_period if period is None else period
+        refund = sum(self.get_refund(policy_id, period=period).values())
+
+        # Fees of all periods after the refunded ones are returned as well
+        last_refunded_period = min(period, policy.last_period) + 1
+        n_active = sum(arrangement.active for arrangement in policy.arrangements.values())
+        return refund + n_active * (policy.last_period + 1 - last_refunded_period) * policy.rate
+
+    def get_client_refunds(self, client: str, period: int=None) -> Dict[bytes, int]:
+        """Refundable value of every enabled policy of the client"""
+
+        client = self._web3.toChecksumAddress(client)
+        return OrderedDict((policy_id, sum(self.get_refund(policy_id, period=period).values()))
+                           for policy_id, policy in self.policies.items()
+                           if policy.client == client and not policy.disabled)
@@ -1,9 +1,11 @@
+import asyncio
 from abc import ABC
 from collections import OrderedDict
 from datetime import datetime
-from typing import Tuple, List, Union
+from typing import Tuple, List, Union, Iterable
 
 from nkms_eth.agents import NuCypherKMSTokenAgent
+from nkms_eth.instrumentation import instrumented, bind_tag
 
 
 class TokenActor(ABC):
@@ -65,9 +67,16 @@ class Miner(TokenActor):
         self.__update_locked_tokens()
 
     def __update_locked_tokens(self) -> None:
-        """Query the contract for the amount of locked tokens on this miner's eth address and cache it"""
+        """
+        Fetch the amount of locked tokens on this miner's eth address from the agent's miner state cache;
+        The escrow events are only replayed once a new block is mined.
+        """
 
-        self.__locked_tokens = self.miner_agent.read().getLockedTokens(self.address)
+        state_cache = self.miner_agent.state_cache
+        block_number = self.blockchain._chain.web3.eth.blockNumber
+        if state_cache.block_cursor is None or block_number > state_cache.block_cursor:
+            state_cache.sync()
+        self.__locked_tokens = state_cache.locked_tokens(self.address)
 
     @property
     def is_staking(self):
@@ -103,6 +112,7 @@ class Miner(TokenActor):
 
         return deposit_txhash
 
+    @instrumented
     def deposit(self, amount: int, locktime: int) -> Tuple[str, str]:
         """Public facing method for token locking."""
         approve_txhash = self._approve_escrow(amount=amount)
@@ -110,6 +120,7 @@ class Miner(TokenActor):
 
         return approve_txhash, deposit_txhash
 
+    @instrumented
     def switch_lock(self):
         lock_txhash = self.miner_agent.transact({'from': self.address}).switchLock()
         self.blockchain.wait_for_receipt(lock_txhash)
@@ -127,17 +138,21 @@ class Miner(TokenActor):
 
         return txhash
 
-    def mint(self) -> Tuple[str, str]:
-        """Computes and transfers tokens to the miner's account"""
+    @instrumented
+    def mint(self) -> str:
+        """
+        Computes and transfers tokens to the miner's account;
+        confirmActivity mints all confirmed periods in a single batch before confirming the next one.
+        """
 
-        confirm_txhash = self.miner_agent.transact({'from': self.address, 'gas_price': 0}).confirmActivity()
-        mint_txhash = self.miner_agent.transact({'from': self.address, 'gas_price': 0}).mint()
+        mint_txhash = self.miner_agent.transact({'from': self.address, 'gas_price': 0}).confirmActivity()
 
         self.blockchain.wait_for_receipt(mint_txhash)
         self._transactions.append((datetime.utcnow(), mint_txhash))
 
-        return confirm_txhash, mint_txhash
+        return mint_txhash
 
+    @instrumented
     def collect_policy_reward(self, policy_manager):
         """Collect rewarded ETH"""
 
@@ -148,6 +163,7 @@ class Miner(TokenActor):
 
         return policy_reward_txhash
 
+    @instrumented
     def collect_staking_reward(self) -> str:
         """Withdraw tokens rewarded for staking."""
 
@@ -166,6 +182,7 @@ class Miner(TokenActor):
 
         return reward_txhash
 
+    @instrumented
     def stake(self, amount, locktime, entire_balance=False, auto_switch_lock=False):
         """
         High level staking method for Miners.
@@ -199,6 +216,7 @@ class Miner(TokenActor):
 
         return staking_transactions
 
+    @instrumented
     def publish_data(self, data) -> str:
         """Store new data"""
 
@@ -209,26 +227,169 @@ class Miner(TokenActor):
 
         return txhash
 
+    @instrumented
     def fetch_data(self) -> tuple:
         """Retrieve all asosciated contract data for this miner."""
 
-        count_bytes = self.miner_agent.read().getMinerInfo(self.miner_agent.MinerInfo.MINER_IDS_LENGTH.value,
-                                                           self.address,
-                                                           0).encode('latin-1')  # TODO change when v4 of web3.py is released
-
-        count = self.blockchain._chain.web3.toInt(count_bytes)
+        count = self.miner_agent.read_miner_info(self.miner_agent.MinerInfo.MINER_IDS_LENGTH, self.address)
 
-        miner_ids = list()
-        for index in range(count):
-            miner_id = self.miner_agent.read().getMinerInfo(self.miner_agent.MinerInfo.MINER_ID.value,
-                                                            self.address,
-                                                            index)
-            encoded_miner_id = miner_id.encode('latin-1')
-            miner_ids.append(encoded_miner_id)
+        calls = ((self.miner_agent.MinerInfo.MINER_ID.value, self.address, index) for index in range(count))
+        miner_ids = self.miner_agent.read_batch('getMinerInfo', calls)
 
         return tuple(miner_ids)
 
 
+class AsyncMiner(Miner):
+    """
+    Miner with coroutine staking flows.
+
+    Each flow submits all of its transactions up front, with explicit consecutive nonces,
+    and then awaits their receipts concurrently; Many AsyncMiners can be driven from
+    a single event loop with asyncio.gather.
+    """
+
+    _gas_margin = 1.25    # Over the estimate, as other transactions may change the state first
+
+    def __init__(self, miner_agent, address, loop=None):
+        super().__init__(miner_agent=miner_agent, address=address)
+        self._loop = loop    # The running loop if not given
+
+        self.__nonce_lock = None    # Created on first use, inside the running loop
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop if self._loop is not None else asyncio.get_event_loop()
+
+    async def _run(self, func, *args):
+        """Run a blocking web3 call in the loop's executor, in the context of the calling task"""
+        return await self.loop.run_in_executor(None, bind_tag(func), *args)    # Carries the RPC tag of the action
+
+    async def _estimate(self, agent, function_name: str, args: tuple, payload: dict, after: tuple) -> int:
+        """
+        Estimate the gas of a call; Nodes estimate against the pending state, which includes the earlier
+        transactions of the flow. If the estimate fails because they are not pending anymore nor mined yet,
+        wait for them and estimate again.
+        """
+
+        contract = getattr(agent, '_contract', agent)    # An agent or a plain contract
+
+        def estimate():
+            return getattr(contract.estimateGas(dict(payload, **{'from': self.address})), function_name)(*args)
+
+        try:
+            gas = await self._run(estimate)
+        except Exception:
+            if not after:
+                raise
+            tracker = self.blockchain.receipt_tracker
+            await asyncio.gather(*(tracker.wait_async(txhash, loop=self.loop) for txhash in after))
+            gas = await self._run(estimate)
+        return int(gas * self._gas_margin)
+
+    async def _send(self, agent, function_name: str, *args, after: tuple=(), **payload) -> str:
+        """
+        Submit a transaction from this miner's address with the next nonce, without waiting for the receipt;
+        after are the transactions of the same flow it depends on.
+        """
+
+        if self.__nonce_lock is None:
+            self.__nonce_lock = asyncio.Lock()
+
+        gas = await self._estimate(agent, function_name, args, payload=payload, after=after)
+        async with self.__nonce_lock:
+            nonce_manager = self.blockchain.nonce_manager
+            nonce = await self._run(nonce_manager.next, self.address)
+
+            transaction = {'from': self.address, 'nonce': nonce, 'gas': gas}
+            transaction.update(payload)
+
+            def send():
+                return getattr(agent.transact(transaction), function_name)(*args)
+
+            try:
+                txhash = await self._run(send)
+            except Exception:
+                nonce_manager.reset(self.address)    # Re-read the pending nonce from the node next time
+                raise
+
+        self._transactions.append((datetime.utcnow(), txhash))
+        return txhash
+
+    async def _wait(self, *txhashes):
+        """Await the receipts of all transactions concurrently"""
+
+        tracker = self.blockchain.receipt_tracker
+        waiters = (tracker.wait_async(txhash, loop=self.loop) for txhash in txhashes)
+        try:
+            return await asyncio.gather(*waiters)
+        finally:
+            self.blockchain.nonce_manager.release(self.address, count=len(txhashes))
+
+    @instrumented
+    async def deposit(self, amount: int, locktime: int) -> Tuple[str, str]:
+        approve_txhash = await self._send(self.token_agent, 'approve', self.miner_agent.contract_address, amount)
+        deposit_txhash = await self._send(self.miner_agent, 'deposit', amount, locktime, after=(approve_txhash, ))
+
+        await self._wait(approve_txhash, deposit_txhash)
+        return approve_txhash, deposit_txhash
+
+    @instrumented
+    async def switch_lock(self) -> str:
+        lock_txhash = await self._send(self.miner_agent, 'switchLock')
+
+        await self._wait(lock_txhash)
+        return lock_txhash
+
+    @instrumented
+    async def confirm_activity(self) -> str:
+        txhash = await self._send(self.miner_agent, 'confirmActivity')
+
+        await self._wait(txhash)
+        return txhash
+
+    @instrumented
+    async def mint(self) -> str:
+        mint_txhash = await self._send(self.miner_agent, 'confirmActivity', gas_price=0)
+
+        await self._wait(mint_txhash)
+        return mint_txhash
+
+    @instrumented
+    async def collect_policy_reward(self, policy_manager) -> str:
+        policy_reward_txhash = await self._send(policy_manager, 'withdraw')
+
+        await self._wait(policy_reward_txhash)
+        return policy_reward_txhash
+
+    @instrumented
+    async def stake(self, amount, locktime, entire_balance=False, auto_switch_lock=False) -> OrderedDict:
+        """Pipelined version of Miner.stake; approve, deposit and switchLock are in flight together."""
+
+        if entire_balance and amount:
+            raise self.StakingError("Specify an amount or entire balance, not both")
+
+        if not locktime >= 0:
+            min_stake_time = self.miner_agent._deployer._min_release_periods
+            raise self.StakingError('Locktime must be at least {}'.format(min_stake_time))
+
+        if entire_balance is True:
+            amount = await self._run(self.token_balance)
+        elif not amount > 0:
+            raise self.StakingError('Staking amount must be greater than zero.')
+
+        staking_transactions = OrderedDict()
+        staking_transactions['approve'] = await self._send(self.token_agent, 'approve',
+                                                           self.miner_agent.contract_address, amount)
+        staking_transactions['deposit'] = await self._send(self.miner_agent, 'deposit', amount, locktime,
+                                                           after=(staking_transactions['approve'], ))
+        if auto_switch_lock is True:
+            staking_transactions['switch_lock'] = await self._send(self.miner_agent, 'switchLock',
+                                                                   after=(staking_transactions['deposit'], ))
+
+        await self._wait(*staking_transactions.values())
+        return staking_transactions
+
+
 class PolicyAuthor(TokenActor):
     """Alice"""
 
@@ -238,6 +399,7 @@ class PolicyAuthor(TokenActor):
 
         self._arrangements = OrderedDict()    # Track authored policies by id
 
+    @instrumented
     def revoke_arrangement(self, arrangement_id):
         """Get the arrangement from the cache and revoke it on the blockchain"""
         try:
@@ -248,6 +410,22 @@ class PolicyAuthor(TokenActor):
             txhash = arrangement.revoke()
         return txhash
 
+    @instrumented
+    def revoke_policies(self, policy_ids: Iterable[bytes], gas_price: int=None) -> list:
+        """
+        Revoke many policies at once, e.g. every policy of a compromised Bob;
+        The refunds of each transaction are sent back in one transfer. Returns the receipts.
+        """
+        receipts = self.policy_agent.revoke_policies(policy_ids, author=self, gas_price=gas_price)
+        return receipts
+
+    @instrumented
+    def refund_policies(self, policy_ids: Iterable[bytes], gas_price: int=None) -> list:
+        """Collect the refunds for miner downtime of many policies at once; Returns the receipts"""
+        receipts = self.policy_agent.refund_policies(policy_ids, author=self, gas_price=gas_price)
+        return receipts
+
+    @instrumented
     def recruit(self, quantity: int) -> List[str]:
         """Uses sampling logic to gather miner address from the blockchain"""
 
@@ -2,12 +2,15 @@ import random
 from abc import ABC
 from enum import Enum
 
-from functools import partial
-from typing import Set, Generator, List
+from typing import Set, Generator, List, Iterable, Tuple, Callable
 
+from eth_abi import decode_abi
 from web3.contract import Contract
 
 from nkms_eth.deployers import MinerEscrowDeployer, NuCypherKMSTokenDeployer, PolicyManagerDeployer, ContractDeployer
+from nkms_eth.instrumentation import instrumented
+from nkms_eth.stakes import MinerState, StakeIndex, ConfirmedPeriod, MinerStateCache, MINER_SNAPSHOT_FIELDS, \
+    MINERS_INFO_PAGE
 
 
 class EthereumContractAgent(ABC):
@@ -16,6 +19,7 @@ class EthereumContractAgent(ABC):
     """
 
     _principal_contract_name = NotImplemented
+    _batch_size = 100    # Calls per JSON-RPC batch request
 
     class ContractNotDeployed(ContractDeployer.ContractDeploymentError):
         pass
@@ -45,7 +49,7 @@ class EthereumContractAgent(ABC):
     def origin(self) -> str:
         return self.blockchain._chain.web3.eth.accounts[0]    # TODO: make swappable
 
-    def read(self):
+    def read(self, cached: bool=True):
         """
         Returns an object that exposes the contract instance functions.
 
@@ -53,10 +57,55 @@ class EthereumContractAgent(ABC):
         results in zero state changes, and costs zero gas.
         Useful as a dry-run before sending an actual transaction.
 
+        Unless cached is False, results are served from the blockchain's view cache
+        while the latest block doesn't change; The block number is read once per read().
+
         See more on interacting with contract instances in the Populus docs:
         http://populus.readthedocs.io/en/latest/dev_cycle.part-07.html#call-an-instance-function
         """
-        return self._contract.call()
+        if cached is False:
+            return self._contract.call()
+        return CachedCall(agent=self, view_cache=self.blockchain.view_cache)
+
+    def read_batch(self, function_name: str, calls: Iterable[tuple], batch_size: int=None,
+                   block_identifier: int=None) -> list:
+        """
+        Call a contract view function once for each tuple of arguments in calls,
+        packing up to batch_size calls into each JSON-RPC request.
+
+        All calls are executed against the same block (the latest, unless specified),
+        and the decoded results are returned in the same order as calls.
+        """
+
+        if batch_size is None:
+            batch_size = self._batch_size
+        if block_identifier is None:
+            block_identifier = self.blockchain._chain.web3.eth.blockNumber
+
+        calls = list(calls)
+        if not calls:
+            return list()
+        output_types = self._get_output_types(function_name, n_inputs=len(calls[0]))
+
+        results = list()
+        for start in range(0, len(calls), batch_size):
+            batch = calls[start:start+batch_size]
+
+            transactions = [{'to': self.contract_address, 'data': self._contract.encodeABI(fn_name=function_name, args=args)}
+                            for args in batch]
+            raw_results = self.blockchain.batch_call(transactions, block_identifier=block_identifier)
+
+            for raw_result in raw_results:
+                decoded = decode_abi(output_types, raw_result)
+                results.append(decoded[0] if len(decoded) == 1 else tuple(decoded))
+
+        return results
+
+    def _get_output_types(self, function_name: str, n_inputs: int) -> List[str]:
+        for abi in self._contract.abi:
+            if abi.get('type') == 'function' and abi['name'] == function_name and len(abi['inputs']) == n_inputs:
+                return [output['type'] for output in abi['outputs']]
+        raise ValueError('{} has no function {} with {} inputs'.format(self.contract_name, function_name, n_inputs))
 
     def transact(self, payload: dict):
         """Packs kwargs into payload dictionary and transmits an eth contract transaction"""
@@ -69,6 +118,44 @@ class EthereumContractAgent(ABC):
         return self.read().balanceOf(address)
 
 
+class CachedCall:
+    """Contract call proxy answering view calls from the view cache, for the latest block at its creation"""
+
+    def __init__(self, agent: EthereumContractAgent, view_cache):
+        self.agent = agent
+        self.view_cache = view_cache
+        self.block_number = view_cache.block_number()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(contract={}, block={})"
+        return r.format(class_name, self.agent.contract_name, self.block_number)
+
+    @classmethod
+    def _freeze(cls, value):
+        if isinstance(value, (list, tuple)):
+            return tuple(cls._freeze(item) for item in value)
+        return value
+
+    def __getattr__(self, function_name: str):
+        call = getattr(self.agent._contract.call(), function_name)
+
+        def cached_call(*args):
+            key = (self.agent.contract_address, function_name, self._freeze(args))
+            try:
+                return self.view_cache.get(self.block_number, key)
+            except KeyError:
+                pass
+            except TypeError:    # Unhashable arguments
+                return call(*args)
+
+            result = call(*args)
+            self.view_cache.put(self.block_number, key, result)
+            return result
+
+        return cached_call
+
+
 class NuCypherKMSTokenAgent(EthereumContractAgent):
 
     _deployer = NuCypherKMSTokenDeployer
@@ -113,12 +200,16 @@ class MinerAgent(EthereumContractAgent):
         DOWNTIME_END_PERIOD = 14
         MINER_IDS_LENGTH = 15
         MINER_ID = 16
+        DOWNTIME_CUM_SUM = 17
 
-    def __init__(self, token_agent: NuCypherKMSTokenAgent):
+    def __init__(self, token_agent: NuCypherKMSTokenAgent, snapshot_store=None):
         super().__init__(blockchain=token_agent.blockchain)  # TODO: public
         self.token_agent = token_agent
         self.miners = list()    # Tracks per client
 
+        self.state_cache = MinerStateCache(miner_agent=self, snapshot_store=snapshot_store)
+        self._stake_indices = dict()    # Sampling indices and cache revisions by duration
+
     def get_miner_ids(self) -> Set[str]:
         """
         Fetch all miner IDs from the local cache and return them in a set
@@ -126,6 +217,7 @@ class MinerAgent(EthereumContractAgent):
 
         return {miner.get_id() for miner in self.miners}
 
+    @instrumented
     def swarm(self) -> Generator[str, None, None]:
         """
         Returns an iterator of all miner addresses via cumulative sum, on-network.
@@ -133,23 +225,177 @@ class MinerAgent(EthereumContractAgent):
         Miner addresses will be returned in the order in which they were added to the MinersEscrow's ledger
         """
 
-        info_reader = partial(self.read().getMinerInfo,
-                              self.MinerInfo.MINERS_LENGTH.value,
-                              self._deployer._null_addr)
-
-        count = info_reader(0).encode('latin-1')
-        count = self.blockchain._chain.web3.toInt(count)
+        count = self.read_miner_info(self.MinerInfo.MINERS_LENGTH, self._deployer._null_addr)
 
-        for index in range(count):
-            addr = info_reader(index).encode('latin-1')
+        calls = ((self.MinerInfo.MINER.value, self._deployer._null_addr, index) for index in range(count))
+        for addr_bytes in self.read_batch('getMinerInfo', calls):
+            addr = '0x' + addr_bytes[-20:].hex()
             yield self.blockchain._chain.web3.toChecksumAddress(addr)
 
-    def sample(self, quantity: int=10, additional_ursulas: float=1.7, attempts: int=5, duration: int=10) -> List[str]:
+    def read_miner_info(self, field: 'MinerAgent.MinerInfo', address: str, index: int=0) -> int:
+        """Read a single integer field of MinersEscrow.getMinerInfo"""
+
+        info_bytes = self.read().getMinerInfo(field.value, address, index).encode('latin-1')
+        return self.blockchain._chain.web3.toInt(info_bytes)
+
+    def read_miner_info_batch(self, fields: Iterable[tuple]) -> List[int]:
+        """Read many (field, address, index) integer fields of MinersEscrow.getMinerInfo in bulk"""
+
+        calls = ((field.value, address, index) for field, address, index in fields)
+        return [int.from_bytes(info_bytes, byteorder='big') for info_bytes in self.read_batch('getMinerInfo', calls)]
+
+    @instrumented
+    def get_miner_states(self, addresses: List[str], start_index: int=0) -> List[MinerState]:
+        """
+        Reconstruct the escrow records of consecutive miners as MinerStates,
+        using two rounds of batched getMinerInfo calls.
+        """
+
+        scalar_fields = (self.MinerInfo.VALUE,
+                         self.MinerInfo.LOCKED_VALUE,
+                         self.MinerInfo.RELEASE,
+                         self.MinerInfo.RELEASE_RATE,
+                         self.MinerInfo.LAST_ACTIVE_PERIOD_F,
+                         self.MinerInfo.CONFIRMED_PERIODS_LENGTH)
+
+        values = self.read_miner_info_batch((field, address, 0) for address in addresses for field in scalar_fields)
+        rows = [values[i:i+len(scalar_fields)] for i in range(0, len(values), len(scalar_fields))]
+
+        period_fields = list()
+        for address, row in zip(addresses, rows):
+            for period_index in range(row[-1]):
+                period_fields.append((self.MinerInfo.CONFIRMED_PERIOD, address, period_index))
+                period_fields.append((self.MinerInfo.CONFIRMED_PERIOD_LOCKED_VALUE, address, period_index))
+        period_values = iter(self.read_miner_info_batch(period_fields))
+
+        states = list()
+        for offset, (address, row) in enumerate(zip(addresses, rows)):
+            value, locked_value, release, release_rate, last_active_period, n_confirmed = row
+            confirmed_periods = [ConfirmedPeriod(next(period_values), next(period_values)) for _ in range(n_confirmed)]
+
+            state = MinerState(address=address,
+                               index=start_index + offset,
+                               value=value,
+                               locked_value=locked_value,
+                               release=bool(release),
+                               release_rate=release_rate,
+                               confirmed_periods=confirmed_periods,
+                               last_active_period=last_active_period)
+            states.append(state)
+
+        return states
+
+    def get_miner_state(self, address: str, index: int) -> MinerState:
+        """Reconstruct the escrow record of a single miner as a MinerState"""
+
+        state, = self.get_miner_states([address], start_index=index)
+        return state
+
+    def _decode_miners_page(self, values: List[int], start_index: int) -> List[MinerState]:
+        """Decode the records of a getMinersInfo page, up to the zeros after the last miner"""
+
+        states = list()
+        for offset, position in enumerate(range(0, len(values), MINER_SNAPSHOT_FIELDS)):
+            if values[position] == 0:
+                break
+            state = MinerState.from_snapshot(values[position:position+MINER_SNAPSHOT_FIELDS], index=start_index+offset)
+            state.address = self.blockchain._chain.web3.toChecksumAddress(state.address)
+            states.append(state)
+
+        return states
+
+    def get_miners_page(self, start_index: int) -> List[MinerState]:
+        """Read the stake information of up to MINERS_INFO_PAGE miners, starting from start_index, in one call"""
+
+        values = self.read().getMinersInfo(start_index)
+        return self._decode_miners_page(values, start_index=start_index)
+
+    @instrumented
+    def snapshot(self) -> List[MinerState]:
+        """
+        Collect the state of every miner in the escrow, in ledger order;
+        All pages are read against the same block, packed into JSON-RPC batch requests.
+        """
+
+        block_number = self.blockchain._chain.web3.eth.blockNumber
+        length_call = (self.MinerInfo.MINERS_LENGTH.value, self._deployer._null_addr, 0)
+        length_bytes, = self.read_batch('getMinerInfo', [length_call], block_identifier=block_number)
+        count = int.from_bytes(length_bytes, byteorder='big')
+
+        start_indices = range(0, count, MINERS_INFO_PAGE)
+        pages = self.read_batch('getMinersInfo', ((start_index, ) for start_index in start_indices),
+                                block_identifier=block_number)
+
+        states = list()
+        for start_index, values in zip(start_indices, pages):
+            states.extend(self._decode_miners_page(values, start_index=start_index))
+
+        return states
+
+    @instrumented
+    def get_stake_index(self, duration: int, refresh: bool=False) -> StakeIndex:
+        """
+        Return the cached sampling index for the duration, rebuilding it from the miner state cache
+        when the period changes or a miner's record is invalidated. Refreshing forces a full snapshot.
+        """
+
+        if refresh is True:
+            self.state_cache.clear()
+        self.state_cache.sync()
+
+        revision, stake_index = self._stake_indices.get(duration, (None, None))
+        if stake_index is None or revision != self.state_cache.revision \
+                or stake_index.current_period != self.state_cache.current_period:
+
+            stake_index = StakeIndex(miners=self.state_cache.states(),
+                                     current_period=self.state_cache.current_period,
+                                     periods=duration)
+            self._stake_indices[duration] = (self.state_cache.revision, stake_index)
+
+        return stake_index
+
+    def _find_cum_sum_on_chain(self, points: List[int], duration: int) -> Set[str]:
+        """Walk the cumulative sum on-network, one findCumSum call per point"""
+
+        deltas = [i-j for i, j in zip(points, [0] + points[:-1])]
+
+        reader = self.read()    # All points against the same block
+        addrs, addr, index, shift = set(), self._deployer._null_addr, 0, 0
+        for delta in deltas:
+            addr, index, shift = reader.findCumSum(index, delta + shift, duration)
+            addrs.add(addr)
+
+        return addrs
+
+    def _find_confirmed_cum_sum(self, points: List[int], duration: int) -> Set[str]:
+        """Resolve each point with the logarithmic findConfirmedCumSum, in batched calls"""
+
+        to_checksum_address = self.blockchain._chain.web3.toChecksumAddress
+        results = self.read_batch('findConfirmedCumSum', ((point, duration) for point in points))
+        return {to_checksum_address(addr) for addr, _index, _shift in results}
+
+    def _verify_stake_index(self, stake_index: StakeIndex, point: int, duration: int) -> bool:
+        """Compare one locally resolved point against the on-chain findCumSum"""
+
+        miner = stake_index.find(point)
+        addr, _index, _shift = self.read().findCumSum(0, point, duration)
+
+        local_addr = miner.address if miner is not None else self._deployer._null_addr
+        return local_addr.lower() == addr.lower()
+
+    @instrumented
+    def sample(self, quantity: int=10, additional_ursulas: float=1.7, attempts: int=5,
+               duration: int=10, verify: bool=False, by_confirmed_stake: bool=False) -> List[str]:
         """
         Select n random staking Ursulas, according to their stake distribution.
         The returned addresses are shuffled, so one can request more than needed and
         throw away those which do not respond.
 
+        Points are resolved locally against a StakeIndex built from an escrow snapshot;
+        if verify is True, the index is checked against the on-chain findCumSum first.
+        If by_confirmed_stake is True, points are resolved on-network with findConfirmedCumSum instead;
+        It weights miners by the stake confirmed for the current period, not by the stake locked for duration.
+
                 _startIndex
                 v
       |-------->*--------------->*---->*------------->|
@@ -174,14 +420,30 @@ class MinerAgent(EthereumContractAgent):
         if not n_tokens > 0:
             raise self.NotEnoughUrsulas('There are no locked tokens.')
 
+        stake_index = self.get_stake_index(duration=duration) if by_confirmed_stake is False else None
+
         for _ in range(attempts):
-            points = [0] + sorted(system_random.randrange(n_tokens) for _ in range(n_select))
-            deltas = [i-j for i, j in zip(points[1:], points[:-1])]
+            points = sorted(system_random.randrange(n_tokens) for _ in range(n_select))
+
+            if by_confirmed_stake is True:
+                addrs = self._find_confirmed_cum_sum(points=points, duration=duration)
+                addrs.discard(self.blockchain._chain.web3.toChecksumAddress(self._deployer._null_addr))
+                if len(addrs) >= quantity:
+                    return system_random.sample(addrs, quantity)
+                continue
 
-            addrs, addr, index, shift = set(), self._deployer._null_addr, 0, 0
-            for delta in deltas:
-                addr, index, shift = self.read().findCumSum(index, delta + shift, duration)
-                addrs.add(addr)
+            if verify is True and not self._verify_stake_index(stake_index, point=points[0], duration=duration):
+                stake_index = self.get_stake_index(duration=duration, refresh=True)
+
+                # Still out of sync with the escrow; resolve this attempt on-network
+                if not self._verify_stake_index(stake_index, point=points[0], duration=duration):
+                    addrs = self._find_cum_sum_on_chain(points=points, duration=duration)
+                    addrs.discard(self._deployer._null_addr)
+                    if len(addrs) >= quantity:
+                        return system_random.sample(addrs, quantity)
+                    continue
+
+            addrs = {miner.address for miner in stake_index.find_many(points) if miner is not None}
 
             if len(addrs) >= quantity:
                 return system_random.sample(addrs, quantity)
@@ -194,15 +456,219 @@ class PolicyAgent(EthereumContractAgent):
     _deployer = PolicyManagerDeployer
     _principal_contract_name = PolicyManagerDeployer._contract_name
 
+    class PolicyInfo(Enum):
+        CLIENT = 0
+        INDEX_OF_DOWNTIME_PERIODS = 1
+        LAST_REFUNDED_PERIOD = 2
+        ARRANGEMENT_DISABLED = 3
+        RATE = 4
+        START_PERIOD = 5
+        LAST_PERIOD = 6
+        DISABLED = 7
+
+    _batch_probe_size = 10      # Policies in the call used to estimate the per-policy gas
+    _batch_gas_share = 0.5      # Share of the block gas limit one batch transaction may use
+    _batch_gas_margin = 1.25    # New nodes and reward periods cost more than the probed ones
+
+    def __init__(self, miner_agent: MinerAgent):
+        super().__init__(blockchain=miner_agent.blockchain)
+        self.miner_agent = miner_agent
+        self._token = miner_agent.token_agent
+
+    @staticmethod
+    def _creation_args(policies: List[tuple]) -> tuple:
+        """Flatten (policy_id, periods, nodes, value) tuples into the arguments of createPolicies"""
+
+        policy_ids, periods, nodes, values = zip(*policies)
+        nodes_lengths = [len(policy_nodes) for policy_nodes in nodes]
+        all_nodes = [node for policy_nodes in nodes for node in policy_nodes]
+        return list(policy_ids), list(periods), nodes_lengths, all_nodes, list(values)
+
+    def _estimate_chunks(self, policies: list, nodes_length: Callable[[tuple], int],
+                         estimate: Callable[[list], int]) -> Tuple[List[list], int, int, int]:
+        """
+        Estimate the fixed gas of a batch function, the gas of each policy and the gas of each of its nodes,
+        and split the policies into chunks that fit the gas budget.
+
+        The per-node gas is probed with the policies with the fewest and the most nodes; If every policy
+        has the same number of nodes it does not change the split, so it is folded into the per-policy gas.
+        """
+
+        def ceil_div(a: int, b: int) -> int:
+            return -(-a // b)
+
+        def n_nodes(chunk: list) -> int:
+            return sum(nodes_length(policy) for policy in chunk)
+
+        smallest = min(policies, key=nodes_length)
+        largest = max(policies, key=nodes_length)
+        smallest_gas = estimate([smallest])
+        if nodes_length(largest) > nodes_length(smallest):
+            extra_nodes = nodes_length(largest) - nodes_length(smallest)
+            node_gas = max(ceil_div(estimate([largest]) - smallest_gas, extra_nodes), 0)
+        else:
+            node_gas = 0
+
+        probe = policies[:self._batch_probe_size]
+        if len(probe) > 1:
+            single_gas = estimate(probe[:1]) - node_gas * n_nodes(probe[:1])
+            probe_gas = estimate(probe) - node_gas * n_nodes(probe)
+            policy_gas = ceil_div(probe_gas - single_gas, len(probe) - 1)
+        else:
+            policy_gas = smallest_gas - node_gas * nodes_length(smallest)
+        base_gas = max(smallest_gas - policy_gas - node_gas * nodes_length(smallest), 0)
+
+        gas_limit = self.blockchain._chain.web3.eth.getBlock('latest')['gasLimit']
+        gas_budget = gas_limit * self._batch_gas_share / self._batch_gas_margin
+
+        chunks, chunk_gas = [[]], base_gas
+        for policy in policies:
+            gas = policy_gas + node_gas * nodes_length(policy)
+            if chunks[-1] and chunk_gas + gas > gas_budget:
+                chunks.append([])
+                chunk_gas = base_gas
+            chunks[-1].append(policy)
+            chunk_gas += gas
+
+        return chunks, base_gas, policy_gas, node_gas
+
+    def _transact_in_chunks(self, function_name: str, policies: list, nodes_length: Callable[[tuple], int],
+                            args: Callable[[list], tuple], payload: dict, value: Callable[[list], int]=None) -> list:
+        """
+        Call a batch function with as few transactions as the gas estimate allows;
+        All chunks are in flight together. Returns the receipts, one per chunk.
+        """
+
+        def chunk_payload(chunk: list) -> dict:
+            return dict(payload, value=value(chunk)) if value is not None else dict(payload)
+
+        def estimate(chunk: list) -> int:
+            gas_estimator = self._contract.estimateGas(chunk_payload(chunk))
+            return getattr(gas_estimator, function_name)(*args(chunk))
+
+        chunks, base_gas, policy_gas, node_gas = self._estimate_chunks(policies, nodes_length=nodes_length,
+                                                                       estimate=estimate)
+
+        queue = self.blockchain.transaction_queue
+        transactions = list()
+        for chunk in chunks:
+            chunk_gas = base_gas + policy_gas * len(chunk) + node_gas * sum(map(nodes_length, chunk))
+            gas = int(chunk_gas * self._batch_gas_margin)
+            transaction = queue.submit(self._contract, function_name, *args(chunk),
+                                       payload=dict(chunk_payload(chunk), gas=gas))
+            transactions.append(transaction)
+
+        queue.wait(transactions)
+        return [transaction.receipt for transaction in transactions]
+
+    @staticmethod
+    def _payload(author, gas_price: int=None) -> dict:
+        payload = {'from': author.address}
+        if gas_price is not None:
+            payload['gasPrice'] = gas_price
+        return payload
+
+    @instrumented
+    def create_policies(self, policies: Iterable[tuple], author, gas_price: int=None) -> list:
+        """
+        Create many policies, given as (policy_id, periods, nodes, value) tuples,
+        with as few createPolicies transactions as the gas estimate allows.
+        All chunks are in flight together; Returns the receipts, one per chunk.
+        """
+
+        policies = [(policy_id, periods, list(nodes), value) for policy_id, periods, nodes, value in policies]
+        if not policies:
+            return list()
+
+        def nodes_length(policy: tuple) -> int:
+            _policy_id, _periods, nodes, _value = policy
+            return len(nodes)
+
+        def value(chunk: List[tuple]) -> int:
+            return sum(policy_value for *_policy, policy_value in chunk)
+
+        return self._transact_in_chunks('createPolicies', policies, nodes_length=nodes_length,
+                                        args=self._creation_args,
+                                        payload=self._payload(author, gas_price), value=value)
+
+    def _transact_policies(self, function_name: str, policy_ids: Iterable[bytes], author, gas_price: int=None) -> list:
+        """Call revokePolicies or refundPolicies, chunked by the number of nodes of each policy"""
+
+        policy_ids = list(policy_ids)
+        if not policy_ids:
+            return list()
+
+        nodes_lengths = self.read_batch('getPolicyNodesLength', ((policy_id, ) for policy_id in policy_ids))
+        policies = list(zip(policy_ids, nodes_lengths))
+
+        def nodes_length(policy: tuple) -> int:
+            _policy_id, length = policy
+            return length
+
+        def args(chunk: List[tuple]) -> tuple:
+            return ([policy_id for policy_id, _nodes_length in chunk], )
+
+        return self._transact_in_chunks(function_name, policies, nodes_length=nodes_length, args=args,
+                                        payload=self._payload(author, gas_price))
+
+    @instrumented
+    def revoke_policies(self, policy_ids: Iterable[bytes], author, gas_price: int=None) -> list:
+        """
+        Revoke many policies with as few revokePolicies transactions as the gas estimate allows,
+        each refunding the client with one transfer; Already revoked policies are skipped.
+        Returns the receipts, one per chunk.
+        """
+        return self._transact_policies('revokePolicies', policy_ids, author=author, gas_price=gas_price)
+
+    @instrumented
+    def refund_policies(self, policy_ids: Iterable[bytes], author, gas_price: int=None) -> list:
+        """
+        Refund the downtime of many policies with as few refundPolicies transactions as the gas estimate allows;
+        Returns the receipts, one per chunk.
+        """
+        return self._transact_policies('refundPolicies', policy_ids, author=author, gas_price=gas_price)
+
+    @instrumented
     def fetch_arrangement_data(self, arrangement_id: bytes) -> list:
-        blockchain_record = self.read().policies(arrangement_id)
+        """Read the client, rate, start period, last period and revocation flag of a policy in one batched request"""
+
+        fields = (self.PolicyInfo.CLIENT,
+                  self.PolicyInfo.RATE,
+                  self.PolicyInfo.START_PERIOD,
+                  self.PolicyInfo.LAST_PERIOD,
+                  self.PolicyInfo.DISABLED)
+
+        calls = ((field.value, arrangement_id, self.miner_agent._deployer._null_addr) for field in fields)
+        client_bytes, *values = self.read_batch('getPolicyInfo', calls)
+        rate, start_period, last_period, disabled = (int.from_bytes(value, byteorder='big') for value in values)
+
+        client = self.blockchain._chain.web3.toChecksumAddress('0x' + client_bytes[-20:].hex())
+        blockchain_record = [client, rate, start_period, last_period, bool(disabled)]
         return blockchain_record
 
-    def revoke_arrangement(self, arrangement_id: bytes, author, gas_price: int):
+    @instrumented
+    def fetch_policy_nodes(self, policy_id: bytes) -> List[str]:
+        """Read the addresses of every node of a policy in one batched request"""
+
+        web3 = self.blockchain._chain.web3
+        number_of_nodes = self.read().getPolicyNodesLength(policy_id)
+        addresses = self.read_batch('getPolicyNode', ((policy_id, index) for index in range(number_of_nodes)))
+        return [web3.toChecksumAddress(address) for address in addresses]
+
+    @instrumented
+    def revoke_arrangement(self, arrangement_id: bytes, author, gas_price: int=None, node: str=None):
         """
-        Revoke by arrangement ID; Only the policy author can revoke the policy
+        Revoke by arrangement ID, or only the arrangement with one node of it;
+        Only the policy author can revoke the policy
         """
 
-        txhash = self.transact({'from': author.address, 'gas_price': gas_price}).revokePolicy(arrangement_id)
+        payload = {'from': author.address}
+        if gas_price is not None:
+            payload['gasPrice'] = gas_price
+
+        if node is None:
+            txhash = self.transact(payload).revokePolicy(arrangement_id)
+        else:
+            txhash = self.transact(payload).revokeArrangement(arrangement_id, node)
         self.blockchain.wait_for_receipt(txhash)
         return txhash
@@ -1,6 +1,15 @@
+import asyncio
+import json
+import threading
+import time
 from abc import ABC
+from collections import deque, OrderedDict
+from typing import List, Union, Callable, Iterable
+
+import requests
 
 from nkms_eth.config import EthereumConfig
+from nkms_eth.instrumentation import RPCStats
 
 
 class TheBlockchain(ABC):
@@ -25,6 +34,9 @@ class TheBlockchain(ABC):
     class IsAlreadyRunning(RuntimeError):
         pass
 
+    class BatchRequestError(RuntimeError):
+        pass
+
     def __init__(self, eth_config: EthereumConfig):
         """
         Configures a populus project and connects to blockchain.network.
@@ -41,7 +53,18 @@ class TheBlockchain(ABC):
         TheBlockchain.__instance = self
 
         self._eth_config = eth_config
-        self._chain = eth_config.provider  # TODO
+
+        # Populus chain (and its web3 and contract provider) configured in the project for this network
+        self._chain = eth_config.project.get_chain(self._network).__enter__()
+
+        # Count every JSON-RPC request by the agent or actor action that made it
+        self.rpc_stats = RPCStats()
+        self._chain.web3.middleware_stack.add(self.rpc_stats.middleware)
+
+        self.receipt_tracker = ReceiptTracker(blockchain=self)
+        self.nonce_manager = NonceManager(blockchain=self)
+        self.transaction_queue = TransactionQueue(blockchain=self)
+        self.view_cache = ViewCache(blockchain=self)
 
     @classmethod
     def get(cls):
@@ -70,11 +93,479 @@ class TheBlockchain(ABC):
         return self._chain.provider.get_contract(name)
 
     def wait_for_receipt(self, txhash, timeout=None) -> None:
+        result = self.receipt_tracker.wait(txhash, timeout=timeout)
+        return result
+
+    def batch_call(self, transactions: List[dict], block_identifier: Union[int, str]='latest') -> List[bytes]:
+        """
+        Executes eth_call for each transaction against the same block and returns the raw results in order.
+
+        The calls are sent as a single JSON-RPC batch request when the provider is reachable over HTTP
+        (through the pool of a PooledHTTPProvider), otherwise they are sent one by one through web3.
+        """
+
+        web3 = self._chain.web3
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+
+        provider = web3.providers[0]
+        endpoint_uri = getattr(provider, 'endpoint_uri', None)
+        if endpoint_uri is None:
+            results = [web3.eth.call(transaction, block_identifier) for transaction in transactions]
+            return [bytes(web3.toBytes(hexstr=r)) if isinstance(r, str) else bytes(r) for r in results]
+
+        payload = [{'jsonrpc': '2.0', 'method': 'eth_call', 'params': [transaction, block_identifier], 'id': request_id}
+                   for request_id, transaction in enumerate(transactions)]
+
+        start = time.monotonic()
+        if hasattr(provider, 'make_batch_request'):
+            responses = provider.make_batch_request(payload)
+        else:
+            request_kwargs = provider.get_request_kwargs() if hasattr(provider, 'get_request_kwargs') else dict()
+            response = requests.post(endpoint_uri, json=payload, **request_kwargs)
+            response.raise_for_status()
+            responses = response.json()
+
+        # Batched requests bypass the web3 middlewares
+        responses = sorted(responses, key=lambda r: r['id'])
+        errors = [r['error'] for r in responses if 'error' in r]
+        self.rpc_stats.record('eth_call', time.monotonic() - start,
+                              bytes_sent=len(json.dumps(payload)),
+                              bytes_received=len(json.dumps(responses)),
+                              error=bool(errors), calls=len(payload))
+        if errors:
+            raise self.BatchRequestError('{} of {} batched calls failed: {}'.format(len(errors), len(payload), errors[0]))
+
+        return [bytes(web3.toBytes(hexstr=r['result'])) for r in responses]
+
+
+class ReceiptTracker:
+    """
+    Resolves transaction receipts by following new blocks,
+    instead of polling the node for every outstanding transaction hash.
+
+    A single block filter is read at most once per poll interval, however many callers are
+    waiting; The receipts of tracked transactions are fetched only for blocks that include them.
+    If the node forgets the filter, it is installed again and the missed blocks are read by number.
+    """
+
+    _poll_interval = 0.1    # Seconds
+
+    class ReceiptTimeout(RuntimeError):
+        pass
+
+    def __init__(self, blockchain: 'TheBlockchain'):
+        self.blockchain = blockchain
+
+        self.__tracked = set()
+        self.__receipts = dict()
+        self.__filter = None
+        self.__last_block = None
+        self.__last_poll = 0
+        self.__lock = threading.RLock()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(tracked={}, last_block={})"
+        return r.format(class_name, len(self.__tracked), self.__last_block)
+
+    @staticmethod
+    def _normalize(txhash) -> str:
+        if isinstance(txhash, (bytes, bytearray)):
+            return '0x' + bytes(txhash).hex()
+        return txhash.lower()
+
+    def track(self, txhash) -> None:
+        """Start following a transaction; Its receipt is read at once in case it was already mined"""
+
+        web3 = self.blockchain._chain.web3
+        txhash = self._normalize(txhash)
+        with self.__lock:
+            if txhash in self.__tracked or txhash in self.__receipts:
+                return
+            if self.__filter is None:
+                self.__filter = web3.eth.filter('latest')
+                self.__last_block = web3.eth.blockNumber
+
+            receipt = web3.eth.getTransactionReceipt(txhash)
+            if receipt is not None:
+                self.__receipts[txhash] = receipt
+            else:
+                self.__tracked.add(txhash)
+
+    def receipt(self, txhash):
+        """Return the receipt of a tracked transaction if it has been mined, otherwise None"""
+        with self.__lock:
+            return self.__receipts.get(self._normalize(txhash))
+
+    def forget(self, txhash) -> None:
+        with self.__lock:
+            txhash = self._normalize(txhash)
+            self.__tracked.discard(txhash)
+            self.__receipts.pop(txhash, None)
+
+    def _new_blocks(self) -> list:
+        web3 = self.blockchain._chain.web3
+        try:
+            return web3.eth.getFilterChanges(self.__filter.filter_id)
+        except ValueError:    # The node dropped the filter
+            self.__filter = web3.eth.filter('latest')
+            latest = web3.eth.blockNumber
+            return list(range(self.__last_block + 1, latest + 1))
+
+    def poll(self, force: bool=False) -> None:
+        """Read the blocks mined since the last poll and collect the receipts of tracked transactions in them"""
+
+        web3 = self.blockchain._chain.web3
+        with self.__lock:
+            if not self.__tracked:
+                return
+            if not force and time.monotonic() - self.__last_poll < self._poll_interval:
+                return
+            self.__last_poll = time.monotonic()
+
+            for block_identifier in self._new_blocks():
+                block = web3.eth.getBlock(block_identifier)
+                self.__last_block = max(self.__last_block, block['number'])
+                for txhash in map(self._normalize, block['transactions']):
+                    if txhash in self.__tracked:
+                        self.__receipts[txhash] = web3.eth.getTransactionReceipt(txhash)
+                        self.__tracked.discard(txhash)
+
+    def _deadline(self, timeout: float=None):
         if timeout is None:
-            timeout = self._default_timeout
+            timeout = self.blockchain._default_timeout
+        return time.monotonic() + timeout if isinstance(timeout, (int, float)) else None
+
+    def _timeout(self, txhash, timeout: float) -> 'ReceiptTracker.ReceiptTimeout':
+        if timeout is None:
+            timeout = self.blockchain._default_timeout
+        return self.ReceiptTimeout('Transaction {} was not mined within {}s'.format(txhash, timeout))
+
+    def wait(self, txhash, timeout: float=None):
+        """Block until the transaction is mined and return its receipt"""
+
+        self.track(txhash)
+        deadline = self._deadline(timeout)
+        while True:
+            receipt = self.receipt(txhash)
+            if receipt is not None:
+                self.forget(txhash)
+                return receipt
+            if deadline is not None and time.monotonic() > deadline:
+                raise self._timeout(txhash, timeout)
+            time.sleep(self._poll_interval)
+            self.poll()
+
+    async def wait_async(self, txhash, timeout: float=None, loop=None):
+        """Coroutine version of wait; The node is only queried from the loop's executor"""
+
+        loop = loop if loop is not None else asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.track, txhash)
+        deadline = self._deadline(timeout)
+        while True:
+            receipt = self.receipt(txhash)
+            if receipt is not None:
+                self.forget(txhash)
+                return receipt
+            if deadline is not None and time.monotonic() > deadline:
+                raise self._timeout(txhash, timeout)
+            await asyncio.sleep(self._poll_interval)
+            await loop.run_in_executor(None, self.poll)
+
+
+class ViewCache:
+    """
+    LRU cache of contract view call results, shared by all agents.
+
+    Results are cached for the block they were read in; When the node reports a new block,
+    the whole cache is dropped, so that a result is never served in a later block.
+    """
+
+    _max_size = 1024
+
+    def __init__(self, blockchain: 'TheBlockchain', max_size: int=None):
+        self.blockchain = blockchain
+        self.max_size = max_size if max_size is not None else self._max_size
+
+        self.__block_number = None
+        self.__results = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits, self.misses = 0, 0
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(block={}, size={}, hits={}, misses={})"
+        return r.format(class_name, self.__block_number, len(self.__results), self.hits, self.misses)
+
+    def __len__(self):
+        return len(self.__results)
+
+    def block_number(self) -> int:
+        """Read the latest block number, and drop the cached results if it changed"""
+
+        block_number = self.blockchain._chain.web3.eth.blockNumber
+        with self.__lock:
+            if block_number != self.__block_number:
+                self.__results.clear()
+                self.__block_number = block_number
+        return block_number
+
+    def get(self, block_number: int, key: tuple):
+        """Return the result cached for the key in the block, or raise KeyError"""
+
+        with self.__lock:
+            if block_number != self.__block_number or key not in self.__results:
+                self.misses += 1
+                raise KeyError(key)
+            self.__results.move_to_end(key)
+            self.hits += 1
+            return self.__results[key]
+
+    def put(self, block_number: int, key: tuple, result) -> None:
+        with self.__lock:
+            if block_number != self.__block_number:
+                return    # A newer block arrived while the call was made
+            self.__results[key] = result
+            self.__results.move_to_end(key)
+            while len(self.__results) > self.max_size:
+                self.__results.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the cached results and reset the hit counters"""
+        with self.__lock:
+            self.__results.clear()
+            self.__block_number = None
+            self.hits, self.misses = 0, 0
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces per sender address,
+    so that many transactions can be submitted without waiting for the node to mine the previous one.
+
+    The first nonce of an address is the node's pending transaction count. Once every nonce
+    handed out has been released (or after a failed submission) the address is forgotten,
+    so that transactions sent around the manager don't leave it behind.
+    """
+
+    def __init__(self, blockchain: 'TheBlockchain'):
+        self.blockchain = blockchain
+        self.__nonces = dict()
+        self.__in_flight = dict()
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(senders={})"
+        return r.format(class_name, len(self.__nonces))
+
+    def next(self, address: str) -> int:
+        with self.__lock:
+            if address not in self.__nonces:
+                web3 = self.blockchain._chain.web3
+                self.__nonces[address] = web3.eth.getTransactionCount(address, 'pending')
+                self.__in_flight[address] = 0
+            nonce = self.__nonces[address]
+            self.__nonces[address] += 1
+            self.__in_flight[address] += 1
+        return nonce
+
+    def release(self, address: str, count: int=1) -> None:
+        """Mark count transactions of the address as mined or dropped"""
+
+        with self.__lock:
+            if address not in self.__in_flight:
+                return
+            self.__in_flight[address] -= count
+            if self.__in_flight[address] <= 0:
+                del self.__nonces[address], self.__in_flight[address]
+
+    def reset(self, address: str) -> None:
+        with self.__lock:
+            self.__nonces.pop(address, None)
+            self.__in_flight.pop(address, None)
+
+
+class QueuedTransaction:
+    """A transaction submitted through the TransactionQueue and all of its broadcasts"""
+
+    PENDING = 'pending'
+    MINED = 'mined'
+    DROPPED = 'dropped'    # Another transaction with the same nonce was mined
+
+    def __init__(self, sender: str, nonce: int, send: Callable[[dict], str], payload: dict):
+        self.sender = sender
+        self.nonce = nonce
+        self.payload = payload
+        self._send = send
+
+        self.state = self.PENDING
+        self.txhashes = list()    # Every broadcast, the latest last
+        self.receipt = None
+        self.broadcast_at = None
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(sender={}, nonce={}, state={})"
+        return r.format(class_name, self.sender, self.nonce, self.state)
+
+    @property
+    def txhash(self) -> str:
+        return self.txhashes[-1] if self.txhashes else None
+
+    def broadcast(self, payload: dict=None) -> str:
+        if payload is not None:
+            self.payload = payload
+        txhash = self._send(dict(self.payload))
+        self.txhashes.append(txhash)
+        self.broadcast_at = time.monotonic()
+        return txhash
+
+
+class TransactionQueue:
+    """
+    Outbound transaction queue keeping up to max_in_flight transactions pending per sender.
+
+    Nonces are assigned locally by the blockchain's NonceManager. Pending transactions are
+    polled for receipts; A transaction whose nonce was consumed by another transaction is
+    marked as dropped, and a transaction still pending after rebroadcast_after seconds
+    is replaced by a copy with the same nonce and a gas price bumped by gas_price_bump.
+    """
+
+    _poll_interval = 0.1    # Seconds
+
+    class TransactionTimeout(RuntimeError):
+        pass
+
+    def __init__(self, blockchain: 'TheBlockchain', max_in_flight: int=16,
+                 rebroadcast_after: float=None, gas_price_bump: float=1.125):
+
+        self.blockchain = blockchain
+        self.max_in_flight = max_in_flight
+        self.rebroadcast_after = rebroadcast_after
+        self.gas_price_bump = gas_price_bump
+
+        self.__in_flight = dict()    # Sender address -> deque of pending QueuedTransactions
+        self.__lock = threading.RLock()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(max_in_flight={}, pending={})"
+        return r.format(class_name, self.max_in_flight, len(self.pending()))
+
+    def pending(self, sender: str=None) -> List[QueuedTransaction]:
+        with self.__lock:
+            if sender is not None:
+                return list(self.__in_flight.get(sender, ()))
+            return [transaction for queue in self.__in_flight.values() for transaction in queue]
+
+    def submit(self, contract, function_name: str, *args, payload: dict) -> QueuedTransaction:
+        """
+        Broadcast contract.transact(payload).<function_name>(*args) with the sender's next nonce,
+        first waiting for room if the sender already has max_in_flight transactions pending.
+        """
+
+        sender = payload['from']
+        while len(self.pending(sender)) >= self.max_in_flight:
+            self.poll()
+            if len(self.pending(sender)) >= self.max_in_flight:
+                time.sleep(self._poll_interval)
+
+        def send(transaction: dict) -> str:
+            return getattr(contract.transact(transaction), function_name)(*args)
+
+        with self.__lock:
+            payload = dict(payload, nonce=self.blockchain.nonce_manager.next(sender))
+            transaction = QueuedTransaction(sender=sender, nonce=payload['nonce'], send=send, payload=payload)
+            try:
+                txhash = transaction.broadcast()
+            except Exception:
+                self.blockchain.nonce_manager.reset(sender)
+                raise
+            self.blockchain.receipt_tracker.track(txhash)
+            self.__in_flight.setdefault(sender, deque()).append(transaction)
+
+        return transaction
+
+    def _rebroadcast(self, transaction: QueuedTransaction) -> None:
+        web3 = self.blockchain._chain.web3
+        gas_price = transaction.payload.get('gasPrice') or web3.eth.gasPrice
+        payload = dict(transaction.payload, gasPrice=int(gas_price * self.gas_price_bump) + 1)
+        txhash = transaction.broadcast(payload=payload)
+        self.blockchain.receipt_tracker.track(txhash)
+
+    def _settle(self, transaction: QueuedTransaction) -> None:
+        """Mark a transaction whose nonce was consumed as mined if one of its broadcasts has a receipt, else dropped"""
+
+        get_receipt = self.blockchain._chain.web3.eth.getTransactionReceipt
+        for txhash in reversed(transaction.txhashes):
+            receipt = get_receipt(txhash)
+            if receipt is not None:
+                transaction.receipt = receipt
+                transaction.state = QueuedTransaction.MINED
+                return
+        transaction.state = QueuedTransaction.DROPPED
+
+    def poll(self) -> List[QueuedTransaction]:
+        """Update the state of every pending transaction and return those that settled"""
+
+        web3 = self.blockchain._chain.web3
+        tracker = self.blockchain.receipt_tracker
+        tracker.poll(force=True)
+
+        settled = list()
+        with self.__lock:
+            for sender, queue in self.__in_flight.items():
+                confirmed_nonce = None
+                for transaction in list(queue):
+                    for txhash in reversed(transaction.txhashes):
+                        receipt = tracker.receipt(txhash)
+                        if receipt is not None:
+                            transaction.receipt = receipt
+                            transaction.state = QueuedTransaction.MINED
+                            break
+                    else:
+                        if confirmed_nonce is None:
+                            confirmed_nonce = web3.eth.getTransactionCount(sender, 'latest')
+                        if transaction.nonce < confirmed_nonce:
+                            # Mined since the tracker polled, or replaced by another transaction
+                            self._settle(transaction)
+                        elif self.rebroadcast_after is not None and \
+                                time.monotonic() - transaction.broadcast_at > self.rebroadcast_after:
+                            self._rebroadcast(transaction)
+
+                    if transaction.state != QueuedTransaction.PENDING:
+                        queue.remove(transaction)
+                        settled.append(transaction)
+                        self.blockchain.nonce_manager.release(sender)
+                        for txhash in transaction.txhashes:
+                            tracker.forget(txhash)
+
+            for sender in [sender for sender, queue in self.__in_flight.items() if not queue]:
+                del self.__in_flight[sender]
+
+        return settled
+
+    def wait(self, transactions: Iterable[QueuedTransaction]=None, timeout: float=None) -> List[QueuedTransaction]:
+        """Poll until the given transactions (default: all pending) are mined or dropped"""
+
+        transactions = list(transactions) if transactions is not None else self.pending()
+        if timeout is None:
+            timeout = self.blockchain._default_timeout
+        deadline = time.monotonic() + timeout if isinstance(timeout, (int, float)) else None
+
+        while any(transaction.state == QueuedTransaction.PENDING for transaction in transactions):
+            self.poll()
+            if all(transaction.state != QueuedTransaction.PENDING for transaction in transactions):
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                pending = sum(transaction.state == QueuedTransaction.PENDING for transaction in transactions)
+                raise self.TransactionTimeout('{} transactions still pending after {}s'.format(pending, timeout))
+            time.sleep(self._poll_interval)
+
+        return transactions
 
-        result = self._chain.wait.for_receipt(txhash, timeout=timeout)
-        return result
 
 # class TestRpcBlockchain:
 #
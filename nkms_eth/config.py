@@ -60,20 +60,32 @@ class EthereumConfig:
     __python_project_name = 'nucypher-kms'
     # __default_solidity_dir = os.path.join()    # TODO: NKMSConfig Classes
 
-    def __init__(self, provider, registrar_path=None):
-
-        self.provider = provider
+    def __init__(self, registrar_path=None, snapshot_path=None, rpc_endpoints=None):
 
         # This config is persistent and is created in user's .local directory
+        data_dir = appdirs.user_data_dir(self.__python_project_name)
         if registrar_path is None:
-            registrar_path = join(appdirs.user_data_dir(self.__python_project_name), 'registrar.json')
+            registrar_path = join(data_dir, 'registrar.json')
         self._registrar_path = registrar_path
 
+        # Chain-derived staker state persisted between runs
+        if snapshot_path is None:
+            snapshot_path = join(data_dir, 'stakers.sqlite')
+        self._snapshot_path = snapshot_path
+
         # Populus project config
         self._project_dir = join(dirname(abspath(nkms_eth.__file__)), 'project')
         self._populus_project = populus.Project(self._project_dir)
         self.project.config['chains.mainnetrpc.contracts.backends.JSONFile.settings.file_path'] = self._registrar_path
 
+        # Nodes pooled by the mainnetrpc provider (see nkms_eth.providers.PooledHTTPProvider)
+        if rpc_endpoints is not None:
+            self.project.config['chains.mainnetrpc.web3.provider.settings.endpoint_uris'] = list(rpc_endpoints)
+
     @property
     def project(self):
         return self._populus_project
+
+    @property
+    def snapshot_path(self):
+        return self._snapshot_path
@@ -1,4 +1,4 @@
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from populus.contracts.contract import PopulusContract
 from web3.contract import Contract
@@ -155,9 +155,13 @@ class NuCypherKMSTokenDeployer(ContractDeployer, NuCypherTokenConfig):
 
     _contract_name = 'NuCypherKMSToken'
 
+    _distribution_probe_size = 10      # Recipients in the call used to estimate the per-recipient gas
+    _distribution_gas_share = 0.5      # Share of the block gas limit one distribution transaction may use
+    _distribution_gas_margin = 1.25    # Probed recipients that already hold tokens are cheaper to credit
+
     def __init__(self, blockchain):
         super().__init__(blockchain=blockchain)
-        self._creator = self.blockchain._eth_config.provider.get_accounts()[0]    # TODO: make swappable
+        self._creator = self.blockchain._chain.web3.eth.accounts[0]    # TODO: make swappable
 
     def deploy(self) -> str:
         """
@@ -181,6 +185,92 @@ class NuCypherKMSTokenDeployer(ContractDeployer, NuCypherTokenConfig):
 
         return self.deployment_receipt
 
+    def _estimate_distribution_chunk(self, batch_transfer: Contract, recipients: List[str],
+                                     values: List[int]) -> Tuple[int, int, int]:
+        """
+        Estimate the fixed and per-recipient gas of BatchTransfer.batchTransfer from two probe calls,
+        and return how many recipients fit in one transaction along with both costs.
+        """
+
+        def estimate(n: int) -> int:
+            gas_estimator = batch_transfer.estimateGas({'from': self._creator})
+            return gas_estimator.batchTransfer(self.contract_address, recipients[:n], values[:n])
+
+        single_gas = estimate(1)
+        probe_size = min(len(recipients), self._distribution_probe_size)
+        if probe_size > 1:
+            recipient_gas = -(-(estimate(probe_size) - single_gas) // (probe_size - 1))    # Round up
+        else:
+            recipient_gas = single_gas
+        base_gas = max(single_gas - recipient_gas, 0)
+
+        gas_limit = self.blockchain._chain.web3.eth.getBlock('latest')['gasLimit']
+        gas_budget = gas_limit * self._distribution_gas_share / self._distribution_gas_margin
+        chunk_size = max(1, int((gas_budget - base_gas) // recipient_gas))
+
+        return chunk_size, base_gas, recipient_gas
+
+    def distribute(self, batch_transfer_deployer: 'BatchTransferDeployer', recipients: List[str],
+                   values: List[int]) -> list:
+        """
+        Transfer tokens from the creator to many recipients through the BatchTransfer helper contract,
+        packing as many recipients into each transaction as the gas estimate allows.
+        All chunks are in flight together; Returns the receipts, one per chunk.
+        """
+
+        self._ensure_contract_deployment()
+        if len(recipients) != len(values):
+            raise ValueError('Got {} recipients but {} values.'.format(len(recipients), len(values)))
+        if not recipients:
+            return list()
+
+        batch_transfer = batch_transfer_deployer._contract
+        origin_args = {'from': self._creator}
+
+        approve_txhash = self._contract.transact(origin_args).approve(batch_transfer.address, sum(values))
+        self.blockchain.wait_for_receipt(approve_txhash)
+
+        chunk_size, base_gas, recipient_gas = self._estimate_distribution_chunk(batch_transfer, recipients, values)
+
+        queue = self.blockchain.transaction_queue
+        transactions = list()
+        for start in range(0, len(recipients), chunk_size):
+            chunk_recipients, chunk_values = recipients[start:start+chunk_size], values[start:start+chunk_size]
+            gas = int((base_gas + recipient_gas * len(chunk_recipients)) * self._distribution_gas_margin)
+
+            transaction = queue.submit(batch_transfer, 'batchTransfer',
+                                       self.contract_address, chunk_recipients, chunk_values,
+                                       payload=dict(origin_args, gas=gas))
+            transactions.append(transaction)
+
+        queue.wait(transactions)
+        return [transaction.receipt for transaction in transactions]
+
+
+class BatchTransferDeployer(ContractDeployer):
+    """
+    Stateless helper contract used by NuCypherKMSTokenDeployer.distribute
+    to send tokens to many recipients per transaction
+    """
+
+    _contract_name = 'BatchTransfer'
+
+    def __init__(self, token_deployer: NuCypherKMSTokenDeployer):
+        self.token_deployer = token_deployer
+        super().__init__(blockchain=token_deployer.blockchain)
+
+    def deploy(self) -> str:
+        self.check_ready_to_deploy(fail=True)
+
+        batch_transfer_contract, txhash = self.blockchain._chain.provider.deploy_contract(
+            self._contract_name, deploy_transaction={'from': self.token_deployer._creator})
+
+        self.blockchain.wait_for_receipt(txhash)
+        self._contract = batch_transfer_contract
+        self.deployment_receipt = txhash
+
+        return txhash
+
 
 class DispatcherDeployer(ContractDeployer):
     """
@@ -0,0 +1,252 @@
+import asyncio
+import functools
+import inspect
+import json
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable
+
+
+UNTAGGED = 'untagged'
+
+# asyncio.current_task is new in Python 3.7
+_task_of = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+
+
+class _Tags(threading.local):
+    """The outermost instrumented action of the thread, and of each asyncio task running in it"""
+
+    def __init__(self):
+        self.thread = None
+        self.tasks = weakref.WeakKeyDictionary()
+
+
+_tags = _Tags()
+
+
+def _current_task():
+    loop = asyncio._get_running_loop()
+    return _task_of(loop=loop) if loop is not None else None
+
+
+def current_tag():
+    task = _current_task()
+    return _tags.tasks.get(task) if task is not None else _tags.thread
+
+
+def _set_tag(tag):
+    task = _current_task()
+    if task is None:
+        _tags.thread = tag
+    elif tag is None:
+        del _tags.tasks[task]
+    else:
+        _tags.tasks[task] = tag
+
+
+@contextmanager
+def rpc_tag(tag: str):
+    """
+    Attribute the RPC requests made in the block to the tag,
+    unless an enclosing action is already tagged; Nested actions are counted as part of the outer one.
+    """
+
+    if current_tag() is not None:
+        yield
+        return
+
+    _set_tag(tag)
+    try:
+        yield
+    finally:
+        _set_tag(None)
+
+
+def bind_tag(func: Callable) -> Callable:
+    """Bind func to the tag of the calling thread or task, to run it in another thread"""
+
+    tag = current_tag()
+
+    @functools.wraps(func)
+    def bound(*args, **kwargs):
+        if tag is None:
+            return func(*args, **kwargs)
+        with rpc_tag(tag):
+            return func(*args, **kwargs)
+    return bound
+
+
+def instrumented(method: Callable) -> Callable:
+    """
+    Tag the RPC requests made by an agent or actor method with ClassName.method_name;
+    Generators are tagged while they produce each item, and coroutines while they run.
+    """
+
+    def get_tag(instance) -> str:
+        return '{}.{}'.format(instance.__class__.__name__, method.__name__)
+
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def wrapped_generator(self, *args, **kwargs):
+            generator = method(self, *args, **kwargs)
+            while True:
+                with rpc_tag(get_tag(self)):
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                yield item
+        return wrapped_generator
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapped_coroutine(self, *args, **kwargs):
+            with rpc_tag(get_tag(self)):
+                return await method(self, *args, **kwargs)
+        return wrapped_coroutine
+
+    @functools.wraps(method)
+    def wrapped(self, *args, **kwargs):
+        with rpc_tag(get_tag(self)):
+            return method(self, *args, **kwargs)
+    return wrapped
+
+
+class MethodStats:
+    """Counters of one JSON-RPC method under one tag"""
+
+    def __init__(self, buckets: tuple):
+        self.calls = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.latency_buckets = [0] * (len(buckets) + 1)    # The last one is +Inf
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(calls={}, errors={}, latency={:.3f})"
+        return r.format(class_name, self.calls, self.errors, self.latency)
+
+    def as_dict(self) -> dict:
+        return {'calls': self.calls,
+                'errors': self.errors,
+                'latency': self.latency,
+                'latency_buckets': list(self.latency_buckets),
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received}
+
+
+class RPCStats:
+    """
+    Web3 middleware recording JSON-RPC call counts, latency histograms and payload sizes
+    by the agent or actor action that made them (see instrumented) and by method.
+    """
+
+    _latency_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)    # Seconds, upper bounds
+
+    def __init__(self, latency_buckets: tuple=None):
+        self.latency_buckets = tuple(latency_buckets) if latency_buckets is not None else self._latency_buckets
+        self.__stats = OrderedDict()    # (tag, method) -> MethodStats
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(calls={})"
+        return r.format(class_name, sum(stats['calls'] for stats in self.stats().values()))
+
+    @staticmethod
+    def _size(value) -> int:
+        return len(json.dumps(value, default=lambda o: o.hex() if isinstance(o, bytes) else str(o)))
+
+    def record(self, method: str, latency: float, bytes_sent: int=0, bytes_received: int=0,
+               error: bool=False, calls: int=1) -> None:
+        """Record calls of a method made under the current tag; A batch of calls shares the latency"""
+
+        tag = current_tag() or UNTAGGED
+        bucket = bisect_left(self.latency_buckets, latency)
+        with self.__lock:
+            stats = self.__stats.get((tag, method))
+            if stats is None:
+                stats = self.__stats[(tag, method)] = MethodStats(buckets=self.latency_buckets)
+            stats.calls += calls
+            stats.errors += calls if error else 0
+            stats.latency += latency
+            stats.latency_buckets[bucket] += 1
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+
+    def middleware(self, make_request, web3):
+        def record(method, params):
+            start = time.monotonic()
+            try:
+                response = make_request(method, params)
+            except Exception:
+                self.record(method, time.monotonic() - start, bytes_sent=self._size(params), error=True)
+                raise
+            self.record(method, time.monotonic() - start,
+                        bytes_sent=self._size(params),
+                        bytes_received=self._size(response.get('result')),
+                        error='error' in response)
+            return response
+        return record
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__stats.clear()
+
+    def stats(self, tag: str=None) -> OrderedDict:
+        """Counters by (tag, method), or by method for a single tag"""
+
+        with self.__lock:
+            items = [(key, stats.as_dict()) for key, stats in self.__stats.items()]
+        if tag is None:
+            return OrderedDict(items)
+        return OrderedDict((method, stats) for (stats_tag, method), stats in items if stats_tag == tag)
+
+    def totals(self) -> OrderedDict:
+        """Calls, errors, latency and bytes by tag, over all methods"""
+
+        totals = OrderedDict()
+        for (tag, _method), stats in self.stats().items():
+            total = totals.setdefault(tag, {'calls': 0, 'errors': 0, 'latency': 0.0, 'bytes_sent': 0, 'bytes_received': 0})
+            for name in total:
+                total[name] += stats[name]
+        return totals
+
+    def prometheus(self, prefix: str='nkms_rpc') -> str:
+        """The counters in the Prometheus text exposition format"""
+
+        lines = list()
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+
+        def labels(tag: str, method: str, **extra) -> str:
+            pairs = [('tag', tag), ('method', method)] + sorted(extra.items())
+            return ','.join('{}="{}"'.format(key, value) for key, value in pairs)
+
+        stats = self.stats()
+        for name, help_text in (('calls', 'JSON-RPC calls'), ('errors', 'Failed JSON-RPC calls'),
+                                ('bytes_sent', 'JSON encoded request params'),
+                                ('bytes_received', 'JSON encoded response results')):
+            metric('{}_total'.format(name), 'counter', help_text)
+            for (tag, method), method_stats in stats.items():
+                lines.append('{}_{}_total{{{}}} {}'.format(prefix, name, labels(tag, method), method_stats[name]))
+
+        metric('latency_seconds', 'histogram', 'JSON-RPC request latency')
+        for (tag, method), method_stats in stats.items():
+            cumulative = 0
+            bounds = [str(bound) for bound in self.latency_buckets] + ['+Inf']
+            for bound, count in zip(bounds, method_stats['latency_buckets']):
+                cumulative += count
+                lines.append('{}_latency_seconds_bucket{{{}}} {}'.format(prefix, labels(tag, method, le=bound), cumulative))
+            lines.append('{}_latency_seconds_sum{{{}}} {}'.format(prefix, labels(tag, method), method_stats['latency']))
+            lines.append('{}_latency_seconds_count{{{}}} {}'.format(prefix, labels(tag, method), cumulative))
+
+        return '\n'.join(lines) + '\n'
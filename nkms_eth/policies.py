@@ -1,4 +1,9 @@
+import os
+from collections import OrderedDict
+from typing import List, Iterable
+
 from nkms_eth.actors import Miner
+from nkms_eth.blockchain import QueuedTransaction
 
 
 class BlockchainArrangement:
@@ -6,9 +11,11 @@ class BlockchainArrangement:
     A relationship between Alice and a single Ursula as part of Blockchain Policy
     """
 
-    def __init__(self, author: str, miner: str, value: int, periods: int, arrangement_id: bytes=None):
+    def __init__(self, author: str, miner: str, rate: int, periods: int, policy: 'BlockchainPolicy'=None,
+                 arrangement_id: bytes=None):
 
-        self.id = arrangement_id
+        self.id = arrangement_id    # The id of the policy on the blockchain
+        self.policy = policy
 
         # The relationship exists between two addresses
         self.author = author
@@ -16,11 +23,9 @@ class BlockchainArrangement:
 
         self.miner = miner
 
-        # Arrangement value, rate, and duration
-        rate = value // periods
+        # Arrangement rate (per period), value, and duration
         self._rate = rate
-
-        self.value = value
+        self.value = rate * periods
         self.periods = periods  # TODO: datetime -> duration in blocks
 
         self.is_published = False
@@ -31,63 +36,154 @@ class BlockchainArrangement:
         r = r.format(class_name, self.author, self.miner)
         return r
 
-    def publish(self, gas_price: int) -> str:
-
-        payload = {'from': self.author.address,
-                   'value': self.value,
-                   'gas_price': gas_price}
-
-
-        txhash = self.policy_agent.transact(payload).createPolicy(self.id,
-                                                                  self.miner.address,
-                                                                  self.periods)
+    def publish(self, gas_price: int=None) -> str:
+        """Publish the policy of this arrangement, with all of its arrangements, in one transaction"""
+        return self.policy.publish(gas_price=gas_price)
 
-        self.policy_agent._blockchain._chain.wait.for_receipt(txhash)
-
-        self.publish_transaction = txhash
-        self.is_published = True
-        return txhash
-
-    def revoke(self, gas_price: int) -> str:
+    def revoke(self, gas_price: int=None) -> str:
         """Revoke this arrangement and return the transaction hash as hex."""
-        txhash = self.policy_agent.revoke_arrangement(self.id, author=self.author, gas_price=gas_price)
+        txhash = self.policy_agent.revoke_arrangement(self.id, author=self.author, gas_price=gas_price,
+                                                      node=self.miner.address)
         self.revoke_transaction = txhash
         return txhash
 
 
 class BlockchainPolicy:
-    """TODO: A collection of n BlockchainArrangements representing a single Policy"""
+    """
+    A collection of n BlockchainArrangements representing a single Policy,
+    published with one createPolicy transaction for all of its nodes.
+
+    The policy is paid at the same rate per period to every node; If only the total value is given,
+    it is split evenly (msg.value % periods % nodes == 0) and the remainder is not spent.
+    """
 
     class NoSuchPolicy(Exception):
         pass
 
-    def __init__(self):
-        self._arrangements = list()
+    class PolicyError(Exception):
+        pass
 
-    def publish_arrangement(self, miner, periods: int, rate: int, arrangement_id: bytes=None) -> 'BlockchainArrangement':
-        """
-        Create a new arrangement to carry out a blockchain policy for the specified rate and time.
-        """
+    def __init__(self, author, periods: int, rate: int=None, value: int=None, policy_id: bytes=None):
+        if (rate is None) == (value is None):
+            raise ValueError('Either the rate or the total value of the policy is required')
 
-        value = rate * periods
-        arrangement = BlockchainArrangement(author=self,
-                                            miner=miner,
-                                            value=value,
-                                            periods=periods)
+        self.author = author
+        self.policy_agent = author.policy_agent
+        self.id = policy_id if policy_id is not None else os.urandom(20)
+        self.periods = periods
 
-        self._arrangements[arrangement.id] = {arrangement_id: arrangement}
+        self.__rate = rate
+        self.__value = value
+        self._arrangements = OrderedDict()    # Miner address -> BlockchainArrangement
+
+        self.is_published = False
+        self.publish_transaction = None
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(id={}, nodes={}, periods={})"
+        return r.format(class_name, self.id.hex(), len(self), self.periods)
+
+    def __len__(self):
+        return len(self._arrangements)
+
+    def __iter__(self):
+        return iter(self._arrangements.values())
+
+    @property
+    def rate(self) -> int:
+        """Wei paid to each node per period"""
+        if self.__rate is not None:
+            return self.__rate
+        return self.__value // self.periods // len(self) if self._arrangements else 0
+
+    @property
+    def value(self) -> int:
+        """The value sent with createPolicy"""
+        return self.rate * self.periods * len(self)
+
+    def add_arrangement(self, miner: Miner) -> BlockchainArrangement:
+        """Add a node to the policy; All arrangements are published together"""
+
+        if self.is_published:
+            raise self.PolicyError('Policy {} is already published'.format(self.id.hex()))
+        if miner.address in self._arrangements:
+            raise self.PolicyError('{} is already a node of the policy'.format(miner.address))
+
+        arrangement = BlockchainArrangement(author=self.author, miner=miner, rate=self.__rate or 0,
+                                            periods=self.periods, policy=self, arrangement_id=self.id)
+        self._arrangements[miner.address] = arrangement
         return arrangement
 
-    def get_arrangement(self, arrangement_id: bytes) -> BlockchainArrangement:
-        """Fetch a published arrangement from the blockchain"""
+    def get_arrangement(self, miner_address: str) -> BlockchainArrangement:
+        try:
+            return self._arrangements[miner_address]
+        except KeyError:
+            raise self.NoSuchPolicy('{} is not a node of policy {}'.format(miner_address, self.id.hex()))
 
-        blockchain_record = self.policy_agent.read().policies(arrangement_id)
-        author_address, miner_address, rate, start_block, end_block, downtime_index = blockchain_record
+    def submit(self, gas_price: int=None) -> QueuedTransaction:
+        """Broadcast the createPolicy transaction through the transaction queue, without waiting for it"""
 
-        duration = end_block - start_block
+        if not self._arrangements:
+            raise self.PolicyError('Policy {} has no arrangements'.format(self.id.hex()))
+        if self.rate == 0:
+            raise self.PolicyError('The value of policy {} is too low for {} nodes and {} periods'
+                                   .format(self.id.hex(), len(self), self.periods))
 
-        miner = Miner(address=miner_address, miner_agent=self.policy_agent.miner_agent)
-        arrangement = BlockchainArrangement(author=self, miner=miner, periods=duration)
+        payload = {'from': self.author.address, 'value': self.value}
+        if gas_price is not None:
+            payload['gasPrice'] = gas_price
 
-        arrangement.is_published = True
-        return arrangement
+        nodes = list(self._arrangements)
+        queue = self.policy_agent.blockchain.transaction_queue
+        return queue.submit(self.policy_agent._contract, 'createPolicy', self.id, self.periods, nodes, payload=payload)
+
+    def _published(self, transaction: QueuedTransaction) -> str:
+        if transaction.state != QueuedTransaction.MINED or transaction.receipt.get('status', 1) == 0:
+            raise self.PolicyError('Policy {} was not created ({})'.format(self.id.hex(), transaction.state))
+
+        self.publish_transaction = transaction.txhash
+        self.is_published = True
+        for arrangement in self._arrangements.values():
+            arrangement._rate, arrangement.value = self.rate, self.rate * self.periods
+            arrangement.is_published = True
+        return transaction.txhash
+
+    def publish(self, gas_price: int=None) -> str:
+        """Create the policy with all of its arrangements in one transaction and return its hash"""
+
+        transaction = self.submit(gas_price=gas_price)
+        self.policy_agent.blockchain.transaction_queue.wait([transaction])
+        return self._published(transaction)
+
+    @classmethod
+    def publish_many(cls, policies: Iterable['BlockchainPolicy'], gas_price: int=None) -> List[str]:
+        """
+        Broadcast the createPolicy transactions of several policies before waiting for any of them,
+        so that they are mined together instead of one after another.
+        """
+
+        policies = list(policies)
+        if not policies:
+            return list()
+
+        transactions = [policy.submit(gas_price=gas_price) for policy in policies]
+        policies[0].policy_agent.blockchain.transaction_queue.wait(transactions)
+        return [policy._published(transaction) for policy, transaction in zip(policies, transactions)]
+
+    @classmethod
+    def from_blockchain(cls, author, policy_id: bytes) -> 'BlockchainPolicy':
+        """Fetch a published policy and its arrangements from the blockchain"""
+
+        policy_agent = author.policy_agent
+        client, rate, start_period, last_period, disabled = policy_agent.fetch_arrangement_data(policy_id)
+        if rate == 0:
+            raise cls.NoSuchPolicy('Policy {} does not exist'.format(policy_id.hex()))
+
+        policy = cls(author=author, periods=last_period - start_period + 1, rate=rate, policy_id=policy_id)
+        for miner_address in policy_agent.fetch_policy_nodes(policy_id):
+            miner = Miner(address=miner_address, miner_agent=policy_agent.miner_agent)
+            policy.add_arrangement(miner).is_published = True
+
+        policy.is_published = True
+        return policy
@@ -0,0 +1,27 @@
+pragma solidity ^0.4.18;
+
+
+import "./zeppelin/token/ERC20/ERC20.sol";
+
+
+/**
+* @notice Sends tokens to many recipients in one transaction
+* @dev Tokens are moved from the sender with transferFrom,
+* so the sender must first approve this contract for the sum of the values
+**/
+contract BatchTransfer {
+
+    /**
+    * @notice Transfer tokens from the sender to each of the recipients
+    * @param _token Token contract
+    * @param _recipients Recipient addresses
+    * @param _values Amount of tokens for each recipient
+    **/
+    function batchTransfer(ERC20 _token, address[] _recipients, uint256[] _values) public {
+        require(_recipients.length == _values.length);
+        for (uint256 i = 0; i < _recipients.length; i++) {
+            require(_token.transferFrom(msg.sender, _recipients[i], _values[i]));
+        }
+    }
+
+}
@@ -1,4 +1,4 @@
-pragma solidity ^0.4.18;
+pragma solidity ^0.4.19;
 
 
 import "./zeppelin/token/ERC20/SafeERC20.sol";
@@ -6,13 +6,14 @@ import "./zeppelin/math/Math.sol";
 import "./lib/AdditionalMath.sol";
 import "./Issuer.sol";
 import "./PolicyManager.sol";
+import "./NodesInfo.sol";
 
 
 /**
 * @notice Contract holds and locks nodes tokens.
 Each node that lock its tokens will receive some compensation
 **/
-contract MinersEscrow is Issuer {
+contract MinersEscrow is Issuer, NodesInfo {
     using SafeERC20 for NuCypherKMSToken;
     using AdditionalMath for uint256;
 
@@ -40,7 +41,8 @@ contract MinersEscrow is Issuer {
         DowntimeStartPeriod,
         DowntimeEndPeriod,
         MinerIdsLength,
-        MinerId
+        MinerId,
+        DowntimeCumSum
     }
 
     struct ConfirmedPeriodInfo {
@@ -60,17 +62,26 @@ contract MinersEscrow is Issuer {
         bool release;
         uint256 maxReleasePeriods;
         uint256 releaseRate;
-        // periods that confirmed but not yet mined
+        // periods that confirmed but not yet mined, a ring starting from confirmedPeriodsOffset
         ConfirmedPeriodInfo[] confirmedPeriods;
         // downtime
         uint256 lastActivePeriod;
         Downtime[] downtime;
         bytes32[] minerIds;
+        uint256 confirmedPeriodsOffset;
+        // total number of downtime periods up to and including each downtime,
+        // kept only if all downtime was added after the field had been introduced
+        uint256[] downtimeCumSum;
+        // slots of confirmedPeriods after the newest period which hold dropped periods and are reused by new ones
+        uint256 droppedConfirmedPeriods;
     }
 
     uint256 constant MAX_PERIODS = 3;
     uint256 constant MAX_OWNERS = 50000;
     uint256 constant RESERVED_PERIOD = 0;
+    uint256 constant MINER_SNAPSHOT_FIELDS = 7 + 2 * MAX_PERIODS;
+    // miners in the result of getMinersInfo, fixed so that a page fits in Dispatcher.RETURN_SIZE
+    uint256 constant MINERS_INFO_PAGE = 4;
 
     mapping (address => MinerInfo) minerInfo;
     address[] miners;
@@ -81,6 +92,12 @@ contract MinersEscrow is Issuer {
     uint256 public maxAllowableLockedTokens;
     PolicyManager public policyManager;
 
+    // Fenwick tree of stakes confirmed for each period, keyed by position of the miner (index + 1)
+    mapping (uint256 => mapping (uint256 => uint256)) stakeTree;
+    mapping (address => uint256) minerPositions;
+    // size of the tree of each period, a power of two not less than the number of miners in it
+    mapping (uint256 => uint256) stakeTreeSizes;
+
     /**
     * @notice Constructor sets address of token contract and coefficients for mining
     * @param _token Token contract
@@ -126,6 +143,73 @@ contract MinersEscrow is Issuer {
         _;
     }
 
+    /**
+    * @notice Get number of confirmed but not yet mined periods
+    * @param _info Miner info
+    **/
+    function getConfirmedPeriodsLength(MinerInfo storage _info) internal view returns (uint256) {
+        return _info.confirmedPeriods.length - _info.droppedConfirmedPeriods;
+    }
+
+    /**
+    * @notice Get confirmed but not yet mined period
+    * @param _info Miner info
+    * @param _index Index of the period, the oldest one is 0
+    **/
+    function getConfirmedPeriod(MinerInfo storage _info, uint256 _index)
+        internal view returns (ConfirmedPeriodInfo storage)
+    {
+        require(_index < getConfirmedPeriodsLength(_info));
+        return _info.confirmedPeriods[
+            _info.confirmedPeriodsOffset.add(_index) % _info.confirmedPeriods.length];
+    }
+
+    /**
+    * @notice Drop the oldest confirmed periods
+    * @dev Slots of dropped periods are not deleted, new periods are written to them
+    * @param _info Miner info
+    * @param _number Number of periods to drop
+    **/
+    function dropConfirmedPeriods(MinerInfo storage _info, uint256 _number) internal {
+        if (_number == 0) {
+            return;
+        }
+        require(_number <= getConfirmedPeriodsLength(_info));
+        _info.confirmedPeriodsOffset =
+            _info.confirmedPeriodsOffset.add(_number) % _info.confirmedPeriods.length;
+        _info.droppedConfirmedPeriods = _info.droppedConfirmedPeriods.add(_number);
+    }
+
+    /**
+    * @notice Add the newest confirmed period
+    * @dev The period overwrites the oldest dropped one if there is such a slot.
+    Otherwise the array grows and the periods from the offset are moved by one slot to free it
+    * @param _info Miner info
+    * @param _period Confirmed period
+    * @param _lockedValue Locked tokens in the period
+    **/
+    function pushConfirmedPeriod(MinerInfo storage _info, uint256 _period, uint256 _lockedValue) internal {
+        uint256 length = _info.confirmedPeriods.length;
+        uint256 offset = _info.confirmedPeriodsOffset;
+        if (_info.droppedConfirmedPeriods > 0) {
+            uint256 index = offset.add(length - _info.droppedConfirmedPeriods) % length;
+            _info.confirmedPeriods[index] = ConfirmedPeriodInfo(_period, _lockedValue);
+            _info.droppedConfirmedPeriods--;
+            return;
+        }
+
+        _info.confirmedPeriods.push(ConfirmedPeriodInfo(_period, _lockedValue));
+        if (offset == 0) {
+            return;
+        }
+        // the newest period is just before the offset, so the new one takes the offset slot
+        for (uint256 i = length; i > offset; i--) {
+            _info.confirmedPeriods[i] = _info.confirmedPeriods[i - 1];
+        }
+        _info.confirmedPeriods[offset] = ConfirmedPeriodInfo(_period, _lockedValue);
+        _info.confirmedPeriodsOffset = offset + 1;
+    }
+
     /**
     * @notice Get locked tokens value for owner in current period
     * @param _owner Tokens owner
@@ -137,11 +221,11 @@ contract MinersEscrow is Issuer {
         MinerInfo storage info = minerInfo[_owner];
 
         // no confirmed periods, so current period may be release period
-        if (info.confirmedPeriods.length == 0) {
+        if (getConfirmedPeriodsLength(info) == 0) {
             uint256 lockedValue = info.lockedValue;
         } else {
-            uint256 i = info.confirmedPeriods.length - 1;
-            ConfirmedPeriodInfo storage confirmedPeriod = info.confirmedPeriods[i];
+            uint256 i = getConfirmedPeriodsLength(info) - 1;
+            ConfirmedPeriodInfo storage confirmedPeriod = getConfirmedPeriod(info, i);
             // last confirmed period is current period
             if (confirmedPeriod.period == currentPeriod) {
                 return confirmedPeriod.lockedValue;
@@ -149,8 +233,8 @@ contract MinersEscrow is Issuer {
             } else if (confirmedPeriod.period < currentPeriod) {
                 lockedValue = confirmedPeriod.lockedValue;
             // penultimate confirmed period is previous or current period, so get its lockedValue
-            } else if (info.confirmedPeriods.length > 1) {
-                return info.confirmedPeriods[info.confirmedPeriods.length - 2].lockedValue;
+            } else if (getConfirmedPeriodsLength(info) > 1) {
+                return getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 2).lockedValue;
             // no previous periods, so return saved lockedValue
             } else {
                 return info.lockedValue;
@@ -210,10 +294,10 @@ contract MinersEscrow is Issuer {
         uint256 nextPeriod = currentPeriod.add(_periods);
 
         MinerInfo storage info = minerInfo[_owner];
-        if (info.confirmedPeriods.length > 0 &&
-            info.confirmedPeriods[info.confirmedPeriods.length - 1].period >= currentPeriod) {
+        if (getConfirmedPeriodsLength(info) > 0 &&
+            getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 1).period >= currentPeriod) {
             ConfirmedPeriodInfo storage confirmedPeriod =
-                info.confirmedPeriods[info.confirmedPeriods.length - 1];
+                getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 1);
             uint256 lockedTokens = confirmedPeriod.lockedValue;
             uint256 period = confirmedPeriod.period;
         } else {
@@ -269,6 +353,7 @@ contract MinersEscrow is Issuer {
                 periods >= minReleasePeriods);
             // TODO optimize
             miners.push(owner);
+            minerPositions[owner] = miners.length;
             info.lastActivePeriod = currentPeriod;
             info.value = value;
             info.lockedValue = value;
@@ -293,6 +378,7 @@ contract MinersEscrow is Issuer {
         if (minerInfo[msg.sender].value == 0) {
             require(miners.length < MAX_OWNERS);
             miners.push(msg.sender);
+            minerPositions[msg.sender] = miners.length;
             info.lastActivePeriod = getCurrentPeriod();
         }
         info.value = info.value.add(_value);
@@ -367,30 +453,113 @@ contract MinersEscrow is Issuer {
         MinerInfo storage info = minerInfo[msg.sender];
         uint256 nextPeriod = getCurrentPeriod() + 1;
 
-        if (info.confirmedPeriods.length > 0 &&
-            info.confirmedPeriods[info.confirmedPeriods.length - 1].period == nextPeriod) {
+        if (getConfirmedPeriodsLength(info) > 0 &&
+            getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 1).period == nextPeriod) {
             ConfirmedPeriodInfo storage confirmedPeriod =
-                info.confirmedPeriods[info.confirmedPeriods.length - 1];
+                getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 1);
             lockedPerPeriod[nextPeriod] = lockedPerPeriod[nextPeriod]
                 .add(_lockedValue.sub(confirmedPeriod.lockedValue));
+            addToStakeTree(msg.sender, nextPeriod, _lockedValue - confirmedPeriod.lockedValue);
             confirmedPeriod.lockedValue = _lockedValue;
             ActivityConfirmed(msg.sender, nextPeriod, _lockedValue);
             return;
         }
 
-//        require(info.confirmedPeriods.length < MAX_PERIODS);
+//        require(getConfirmedPeriodsLength(info) < MAX_PERIODS);
         lockedPerPeriod[nextPeriod] = lockedPerPeriod[nextPeriod]
             .add(_lockedValue);
-        info.confirmedPeriods.push(ConfirmedPeriodInfo(nextPeriod, _lockedValue));
+        addToStakeTree(msg.sender, nextPeriod, _lockedValue);
+        pushConfirmedPeriod(info, nextPeriod, _lockedValue);
 
         uint256 currentPeriod = nextPeriod - 1;
         if (info.lastActivePeriod < currentPeriod) {
-            info.downtime.push(Downtime(info.lastActivePeriod + 1, currentPeriod));
+            addDowntime(info, info.lastActivePeriod + 1, currentPeriod);
         }
         info.lastActivePeriod = nextPeriod;
         ActivityConfirmed(msg.sender, nextPeriod, _lockedValue);
     }
 
+    /**
+    * @notice Add downtime of the miner and the total number of its downtime periods
+    * @param _info Miner info
+    * @param _startPeriod First period of the downtime
+    * @param _endPeriod Last period of the downtime
+    **/
+    function addDowntime(MinerInfo storage _info, uint256 _startPeriod, uint256 _endPeriod) internal {
+        uint256 length = _info.downtime.length;
+        _info.downtime.push(Downtime(_startPeriod, _endPeriod));
+        // downtime added before the total was introduced is not counted
+        if (_info.downtimeCumSum.length != length) {
+            return;
+        }
+        uint256 cumSum = length > 0 ? _info.downtimeCumSum[length - 1] : 0;
+        _info.downtimeCumSum.push(cumSum.add(_endPeriod.sub(_startPeriod)).add(uint(1)));
+    }
+
+    /**
+    * @notice Add stake confirmed for the period to the cumulative index
+    * @param _owner Tokens owner
+    * @param _period Confirmed period
+    * @param _value Added stake
+    **/
+    function addToStakeTree(address _owner, uint256 _period, uint256 _value) internal {
+        uint256 position = minerPositions[_owner];
+        // miners who deposited before the index was added are not in the tree
+        if (position == 0 || _value == 0) {
+            return;
+        }
+        // the tree of the period before the current one is not searched anymore
+        if (_period >= 2) {
+            clearStakeTree(position, _period - 2);
+        }
+        uint256 size = growStakeTree(_period, position);
+        for (; position <= size; position += position & (~position + 1)) {
+            stakeTree[_period][position] = stakeTree[_period][position].add(_value);
+        }
+    }
+
+    /**
+    * @notice Grow the tree of the period to cover the position
+    * @dev The first tree node of each power of two is the total of all positions before it,
+    and the nodes between the old and the new size cover only positions not added yet
+    * @param _period Confirmed period
+    * @param _position Position of the miner
+    * @return size New size of the tree
+    **/
+    function growStakeTree(uint256 _period, uint256 _position) internal returns (uint256 size) {
+        size = stakeTreeSizes[_period];
+        if (size >= _position) {
+            return;
+        }
+        uint256 total = size > 0 ? stakeTree[_period][size] : 0;
+        uint256 minSize = Math.max256(_position, miners.length);
+        if (size == 0) {
+            size = 1;
+        }
+        while (size < minSize) {
+            size <<= 1;
+            if (total > 0) {
+                stakeTree[_period][size] = total;
+            }
+        }
+        stakeTreeSizes[_period] = size;
+    }
+
+    /**
+    * @notice Delete the nodes of the tree of the period that include the position
+    * @dev Deleted nodes refund most of the gas of reading them
+    * @param _position Position of the miner
+    * @param _period Period that is not searched anymore
+    **/
+    function clearStakeTree(uint256 _position, uint256 _period) internal {
+        uint256 size = stakeTreeSizes[_period];
+        for (; _position <= size; _position += _position & (~_position + 1)) {
+            if (stakeTree[_period][_position] != 0) {
+                delete stakeTree[_period][_position];
+            }
+        }
+    }
+
     /**
     * @notice Confirm activity for future period and mine for previous period
     **/
@@ -400,8 +569,8 @@ contract MinersEscrow is Issuer {
         uint256 currentPeriod = getCurrentPeriod();
         uint256 nextPeriod = currentPeriod + 1;
 
-        if (info.confirmedPeriods.length > 0 &&
-            info.confirmedPeriods[info.confirmedPeriods.length - 1].period >= nextPeriod) {
+        if (getConfirmedPeriodsLength(info) > 0 &&
+            getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 1).period >= nextPeriod) {
            return;
         }
 
@@ -416,13 +585,13 @@ contract MinersEscrow is Issuer {
     function mint() public onlyTokenOwner {
         uint256 previousPeriod = getCurrentPeriod().sub(uint(1));
         MinerInfo storage info = minerInfo[msg.sender];
-        uint256 numberPeriodsForMinting = info.confirmedPeriods.length;
-        if (numberPeriodsForMinting == 0 || info.confirmedPeriods[0].period > previousPeriod) {
+        uint256 numberPeriodsForMinting = getConfirmedPeriodsLength(info);
+        if (numberPeriodsForMinting == 0 || getConfirmedPeriod(info, 0).period > previousPeriod) {
             return;
         }
 
         uint256 currentLockedValue = getLockedTokens(msg.sender);
-        ConfirmedPeriodInfo storage last = info.confirmedPeriods[numberPeriodsForMinting - 1];
+        ConfirmedPeriodInfo storage last = getConfirmedPeriod(info, numberPeriodsForMinting - 1);
         uint256 allLockedPeriods = last.lockedValue
             .divCeil(info.releaseRate)
             .sub(uint(1))
@@ -431,40 +600,70 @@ contract MinersEscrow is Issuer {
         if (last.period > previousPeriod) {
             numberPeriodsForMinting--;
         }
-        if (info.confirmedPeriods[numberPeriodsForMinting - 1].period > previousPeriod) {
+        if (getConfirmedPeriod(info, numberPeriodsForMinting - 1).period > previousPeriod) {
             numberPeriodsForMinting--;
         }
 
         uint256 reward = 0;
+        uint256[] memory mintedPeriods = new uint256[](numberPeriodsForMinting);
         for(uint i = 0; i < numberPeriodsForMinting; ++i) {
             uint256 amount;
-            uint256 period = info.confirmedPeriods[i].period;
-            uint256 lockedValue = info.confirmedPeriods[i].lockedValue;
+            ConfirmedPeriodInfo storage confirmedPeriod = getConfirmedPeriod(info, i);
+            uint256 period = confirmedPeriod.period;
             allLockedPeriods--;
             (amount, info.decimals) = mint(
                 previousPeriod,
-                lockedValue,
+                confirmedPeriod.lockedValue,
                 lockedPerPeriod[period],
                 allLockedPeriods,
                 info.decimals);
             reward = reward.add(amount);
-            // TODO remove if
-            if (address(policyManager) != 0x0) {
-                policyManager.updateReward(msg.sender, period);
-            }
+            mintedPeriods[i] = period;
         }
         info.value = info.value.add(reward);
-        // Copy not minted periods
-        for (i = 0; i < info.confirmedPeriods.length - numberPeriodsForMinting; i++) {
-            info.confirmedPeriods[i] = info.confirmedPeriods[numberPeriodsForMinting + i];
+        dropConfirmedPeriods(info, numberPeriodsForMinting);
+        // TODO remove if
+        if (address(policyManager) != 0x0) {
+            policyManager.updateRewards(msg.sender, mintedPeriods);
         }
-        info.confirmedPeriods.length -= numberPeriodsForMinting;
 
         // Update lockedValue for current period
         info.lockedValue = currentLockedValue;
         Mined(msg.sender, previousPeriod, reward);
     }
 
+    /**
+    * @notice Get stake of owner used for sampling
+    * @param _owner Tokens owner
+    * @param _currentPeriod Current period
+    * @param _periods Amount of periods to get locked tokens
+    **/
+    function getSamplingStake(address _owner, uint256 _currentPeriod, uint256 _periods)
+        internal view returns (uint256)
+    {
+        MinerInfo storage info = minerInfo[_owner];
+        if (getConfirmedPeriodsLength(info) == 0) {
+            return 0;
+        }
+        ConfirmedPeriodInfo storage confirmedPeriod =
+            getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 1);
+        if (confirmedPeriod.period == _currentPeriod) {
+            return calculateLockedTokens(
+                _owner,
+                true,
+                confirmedPeriod.lockedValue,
+                _periods);
+        } else if (getConfirmedPeriodsLength(info) > 1 &&
+            getConfirmedPeriod(info, getConfirmedPeriodsLength(info) - 2).period == _currentPeriod) {
+            return calculateLockedTokens(
+                _owner,
+                true,
+                confirmedPeriod.lockedValue,
+                _periods - 1);
+        }
+        return 0;
+    }
+
     /**
     * @notice Fixed-step in cumulative sum
     * @param _startIndex Starting point
@@ -492,26 +691,8 @@ contract MinersEscrow is Issuer {
 
         for (uint256 i = _startIndex; i < miners.length; i++) {
             address current = miners[i];
-            MinerInfo storage info = minerInfo[current];
-            if (info.confirmedPeriods.length == 0) {
-                continue;
-            }
-            ConfirmedPeriodInfo storage confirmedPeriod =
-                info.confirmedPeriods[info.confirmedPeriods.length - 1];
-            if (confirmedPeriod.period == currentPeriod) {
-                uint256 lockedTokens = calculateLockedTokens(
-                    current,
-                    true,
-                    confirmedPeriod.lockedValue,
-                    _periods);
-            } else if (info.confirmedPeriods.length > 1 &&
-                info.confirmedPeriods[info.confirmedPeriods.length - 2].period == currentPeriod) {
-                lockedTokens = calculateLockedTokens(
-                    current,
-                    true,
-                    confirmedPeriod.lockedValue,
-                    _periods - 1);
-            } else {
+            uint256 lockedTokens = getSamplingStake(current, currentPeriod, _periods);
+            if (lockedTokens == 0) {
                 continue;
             }
 
@@ -526,6 +707,51 @@ contract MinersEscrow is Issuer {
         }
     }
 
+    /**
+    * @notice Find point in cumulative sum of stakes confirmed for the current period
+    * @param _delta Point in cumulative sum, counting from the first miner
+    * @param _periods Amount of periods during which selected miner must have locked tokens
+    * @return stop Selected miner or 0x0 if the point is out of range
+    or the miner will not have locked tokens for _periods
+    * @return stopIndex Index of the selected miner
+    * @return shift Distance from the beginning of the miner's stake to the point
+    * @dev Unlike findCumSum, miners are weighted by the value confirmed for the current period,
+    not by the tokens they will have locked for _periods, so the cost is logarithmic in the number of miners.
+    Miners who deposited before the index was added are not sampled
+    **/
+    function findConfirmedCumSum(uint256 _delta, uint256 _periods)
+        external view returns (address stop, uint256 stopIndex, uint256 shift)
+    {
+        require(_periods > 0);
+        uint256 currentPeriod = getCurrentPeriod();
+        uint256 size = stakeTreeSizes[currentPeriod];
+
+        uint256 position = 0;
+        for (uint256 step = size; step > 0; step >>= 1) {
+            uint256 next = position + step;
+            if (next > size) {
+                continue;
+            }
+            uint256 stake = stakeTree[currentPeriod][next];
+            if (stake <= _delta) {
+                position = next;
+                _delta -= stake;
+            }
+        }
+
+        // position is the number of miners before the point
+        if (position >= miners.length) {
+            return;
+        }
+        address current = miners[position];
+        if (getSamplingStake(current, currentPeriod, _periods) == 0) {
+            return;
+        }
+        stop = current;
+        stopIndex = position;
+        shift = _delta;
+    }
+
     /**
     * @notice Set policy manager address
     **/
@@ -572,11 +798,11 @@ contract MinersEscrow is Issuer {
         } else if (_field == MinerInfoField.ReleaseRate) {
             return bytes32(info.releaseRate);
         } else if (_field == MinerInfoField.ConfirmedPeriodsLength) {
-            return bytes32(info.confirmedPeriods.length);
+            return bytes32(getConfirmedPeriodsLength(info));
         } else if (_field == MinerInfoField.ConfirmedPeriod) {
-            return bytes32(info.confirmedPeriods[_index].period);
+            return bytes32(getConfirmedPeriod(info, _index).period);
         } else if (_field == MinerInfoField.ConfirmedPeriodLockedValue) {
-            return bytes32(info.confirmedPeriods[_index].lockedValue);
+            return bytes32(getConfirmedPeriod(info, _index).lockedValue);
         } else if (_field == MinerInfoField.LastActivePeriod) {
             return bytes32(info.lastActivePeriod);
         } else if (_field == MinerInfoField.DowntimeLength) {
@@ -589,6 +815,136 @@ contract MinersEscrow is Issuer {
             return bytes32(info.minerIds.length);
         } else if (_field == MinerInfoField.MinerId) {
             return bytes32(info.minerIds[_index]);
+        } else if (_field == MinerInfoField.DowntimeCumSum) {
+            return bytes32(info.downtimeCumSum[_index]);
+        }
+    }
+
+    /**
+    * @notice Get the number of the miner's downtime periods between two periods (inclusive)
+    * @dev Only downtime starting from _startIndex is counted. The result is the same as counting
+    downtime one by one from _startIndex, and stopping at the first downtime that ends after _maxPeriod
+    or contains it. Downtime is found by binary search, and counted by the total number of downtime periods
+    * @param _miner Miner
+    * @param _startIndex Index of the first downtime to count
+    * @param _minPeriod First period
+    * @param _maxPeriod Last period
+    * @return downtimePeriods Number of downtime periods
+    * @return stopIndex Index of the downtime that contains or follows _maxPeriod,
+    or the number of downtime if there is no such downtime
+    **/
+    function getDowntimePeriods(address _miner, uint256 _startIndex, uint256 _minPeriod, uint256 _maxPeriod)
+        public view returns (uint256 downtimePeriods, uint256 stopIndex)
+    {
+        MinerInfo storage info = minerInfo[_miner];
+        uint256 firstIndex = findDowntime(info, _startIndex, _minPeriod);
+        stopIndex = findDowntime(info, firstIndex, Math.max256(_minPeriod, _maxPeriod));
+        if (firstIndex < stopIndex) {
+            downtimePeriods = getDowntimeCumSum(info, stopIndex)
+                .sub(getDowntimeCumSum(info, firstIndex))
+                .sub(Math.max256(_minPeriod, info.downtime[firstIndex].startPeriod)
+                    .sub(info.downtime[firstIndex].startPeriod));
+        }
+        if (_minPeriod <= _maxPeriod && stopIndex < info.downtime.length &&
+            info.downtime[stopIndex].startPeriod <= _maxPeriod) {
+            downtimePeriods = downtimePeriods.add(_maxPeriod
+                .sub(Math.max256(_minPeriod, info.downtime[stopIndex].startPeriod))
+                .add(uint(1)));
+        }
+    }
+
+    /**
+    * @notice Find the first downtime starting from the index that ends in or after the period
+    * @return Index of the downtime or the number of downtime if there is no such downtime
+    **/
+    function findDowntime(MinerInfo storage _info, uint256 _startIndex, uint256 _period)
+        internal view returns (uint256)
+    {
+        uint256 low = _startIndex;
+        uint256 high = _info.downtime.length;
+        while (low < high) {
+            uint256 middle = (low + high) / 2;
+            if (_info.downtime[middle].endPeriod < _period) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    /**
+    * @notice Get the total number of downtime periods before the downtime with the index
+    * @dev Downtime added before the total was introduced is summed one by one
+    **/
+    function getDowntimeCumSum(MinerInfo storage _info, uint256 _index)
+        internal view returns (uint256 cumSum)
+    {
+        if (_index == 0) {
+            return 0;
+        }
+        if (_info.downtimeCumSum.length == _info.downtime.length) {
+            return _info.downtimeCumSum[_index - 1];
+        }
+        for (uint256 i = 0; i < _index; i++) {
+            cumSum = cumSum.add(_info.downtime[i].endPeriod.sub(_info.downtime[i].startPeriod)).add(uint(1));
+        }
+    }
+
+    /**
+    * @notice Get stake information for a page of miners
+    * @dev Each miner takes MINER_SNAPSHOT_FIELDS consecutive values in the result:
+    address, value, lockedValue, releaseRate, release, lastActivePeriod, number of confirmed periods
+    and then period and lockedValue for each of the last MAX_PERIODS confirmed periods.
+    The page has a fixed size, so that it can be returned through the Dispatcher;
+    Records after the last miner are zeros
+    * @param _startIndex Index of the first miner in the page, up to MINERS_INFO_PAGE miners are in the page
+    **/
+    function getMinersInfo(uint256 _startIndex)
+        public view returns (uint256[MINERS_INFO_PAGE * MINER_SNAPSHOT_FIELDS] result)
+    {
+        uint256 endIndex = Math.min256(_startIndex.add(MINERS_INFO_PAGE), miners.length);
+        uint256 position = 0;
+        for (uint256 i = _startIndex; i < endIndex; i++) {
+            address miner = miners[i];
+            MinerInfo storage info = minerInfo[miner];
+            result[position] = uint256(miner);
+            result[position + 1] = info.value;
+            result[position + 2] = info.lockedValue;
+            result[position + 3] = info.releaseRate;
+            result[position + 4] = info.release ? 1 : 0;
+            result[position + 5] = info.lastActivePeriod;
+            uint256 length = getConfirmedPeriodsLength(info);
+            result[position + 6] = length;
+
+            uint256 first = length > MAX_PERIODS ? length - MAX_PERIODS : 0;
+            for (uint256 j = first; j < length; j++) {
+                uint256 periodPosition = position + 7 + 2 * (j - first);
+                result[periodPosition] = getConfirmedPeriod(info, j).period;
+                result[periodPosition + 1] = getConfirmedPeriod(info, j).lockedValue;
+            }
+            position += MINER_SNAPSHOT_FIELDS;
+        }
+    }
+
+    /**
+    * @notice Get information used by the policy manager for a batch of nodes
+    * @dev Each node takes NODE_INFO_FIELDS consecutive values in the result:
+    locked tokens, downtime length and last active period.
+    The result has a fixed size, so that it can be returned to other contracts
+    * @param _nodes Addresses of nodes, up to NODES_INFO_BATCH
+    **/
+    function getNodesInfo(address[] _nodes)
+        public view returns (uint256[NODES_INFO_SIZE] result)
+    {
+        require(_nodes.length <= NODES_INFO_BATCH);
+        uint256 position = 0;
+        for (uint256 i = 0; i < _nodes.length; i++) {
+            MinerInfo storage info = minerInfo[_nodes[i]];
+            result[position + LOCKED_TOKENS_FIELD] = getLockedTokens(_nodes[i]);
+            result[position + DOWNTIME_LENGTH_FIELD] = info.downtime.length;
+            result[position + LAST_ACTIVE_PERIOD_FIELD] = info.lastActivePeriod;
+            position += NODE_INFO_FIELDS;
         }
     }
 
@@ -627,9 +983,9 @@ contract MinersEscrow is Issuer {
         require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
             bytes32(uint8(MinerInfoField.ReleaseRate)), miner, 0)) == info.releaseRate);
         require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
-            bytes32(uint8(MinerInfoField.ConfirmedPeriodsLength)), miner, 0)) == info.confirmedPeriods.length);
-        for (uint256 i = 0; i < info.confirmedPeriods.length; i++) {
-            ConfirmedPeriodInfo storage confirmedPeriod = info.confirmedPeriods[i];
+            bytes32(uint8(MinerInfoField.ConfirmedPeriodsLength)), miner, 0)) == getConfirmedPeriodsLength(info));
+        for (uint256 i = 0; i < getConfirmedPeriodsLength(info); i++) {
+            ConfirmedPeriodInfo storage confirmedPeriod = getConfirmedPeriod(info, i);
             require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
                 bytes32(uint8(MinerInfoField.ConfirmedPeriod)), miner, bytes32(i))) == confirmedPeriod.period);
             require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
@@ -647,6 +1003,10 @@ contract MinersEscrow is Issuer {
             require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
                 bytes32(uint8(MinerInfoField.DowntimeEndPeriod)), miner, bytes32(i))) == downtime.endPeriod);
         }
+        for (i = 0; i < info.downtimeCumSum.length && i < 10; i++) {
+            require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
+                bytes32(uint8(MinerInfoField.DowntimeCumSum)), miner, bytes32(i))) == info.downtimeCumSum[i]);
+        }
         require(uint256(delegateGet(_testTarget, "getMinerInfo(uint8,address,uint256)",
             bytes32(uint8(MinerInfoField.MinerIdsLength)), miner, 0)) == info.minerIds.length);
         for (i = 0; i < info.minerIds.length && i < 10; i++) {
@@ -0,0 +1,19 @@
+pragma solidity ^0.4.19;
+
+
+/**
+* @notice Layout of the information about nodes which MinersEscrow.getNodesInfo returns to PolicyManager
+* @dev Contains only constants, so inheriting it does not change the storage of upgradeable contracts
+**/
+contract NodesInfo {
+
+    // nodes in a batch and fields of each node,
+    // the result has a fixed size so that it can be returned to other contracts
+    uint256 constant NODES_INFO_BATCH = 16;
+    uint256 constant NODE_INFO_FIELDS = 3;
+    uint256 constant NODES_INFO_SIZE = NODES_INFO_BATCH * NODE_INFO_FIELDS;
+    uint256 constant LOCKED_TOKENS_FIELD = 0;
+    uint256 constant DOWNTIME_LENGTH_FIELD = 1;
+    uint256 constant LAST_ACTIVE_PERIOD_FIELD = 2;
+
+}
@@ -1,4 +1,4 @@
-pragma solidity ^0.4.18;
+pragma solidity ^0.4.19;
 
 
 import "./zeppelin/token/ERC20/SafeERC20.sol";
@@ -8,12 +8,13 @@ import "./lib/AdditionalMath.sol";
 import "./MinersEscrow.sol";
 import "./NuCypherKMSToken.sol";
 import "./proxy/Upgradeable.sol";
+import "./NodesInfo.sol";
 
 
 /**
 * @notice Contract holds policy data and locks fees
 **/
-contract PolicyManager is Upgradeable {
+contract PolicyManager is Upgradeable, NodesInfo {
     using SafeERC20 for NuCypherKMSToken;
     using SafeMath for uint256;
     using AdditionalMath for uint256;
@@ -63,7 +64,8 @@ contract PolicyManager is Upgradeable {
         Reward,
         RewardRate,
         LastMinedPeriod,
-        RewardDelta
+        RewardDelta,
+        RewardDeltaPeriods
     }
 
     struct ArrangementInfo {
@@ -89,10 +91,13 @@ contract PolicyManager is Upgradeable {
         uint256 rewardRate;
         uint256 lastMinedPeriod;
         mapping (uint256 => int256) rewardDelta;
+        // bitmap of periods with reward delta, DELTA_PERIODS_WORD periods in each word
+        mapping (uint256 => uint256) rewardDeltaPeriods;
     }
 
     bytes20 constant RESERVED_POLICY_ID = bytes20(0);
     address constant RESERVED_NODE = 0x0;
+    uint256 constant DELTA_PERIODS_WORD = 256;
 
     MinersEscrow public escrow;
     mapping (bytes20 => Policy) policies;
@@ -120,62 +125,248 @@ contract PolicyManager is Upgradeable {
         address[] _nodes
     )
         public payable
+    {
+        createPolicy(_policyId, _numberOfPeriods, _nodes, msg.value, escrow.getCurrentPeriod());
+    }
+
+    /**
+    * @notice Create many policies by client in one transaction
+    * @dev Nodes of all policies are concatenated, _nodesLengths[i] of them for the i-th policy.
+    * The value of each policy must satisfy the conditions of createPolicy, the sum of them is msg.value
+    * @param _policyIds Policy ids
+    * @param _numberOfPeriods Duration of each policy in periods
+    * @param _nodesLengths Number of nodes of each policy
+    * @param _nodes Nodes that will handle policies
+    * @param _values Value of each policy
+    **/
+    function createPolicies(
+        bytes20[] _policyIds,
+        uint256[] _numberOfPeriods,
+        uint256[] _nodesLengths,
+        address[] _nodes,
+        uint256[] _values
+    )
+        public payable
+    {
+        require(_policyIds.length != 0 &&
+            _policyIds.length == _numberOfPeriods.length &&
+            _policyIds.length == _nodesLengths.length &&
+            _policyIds.length == _values.length);
+        uint256 currentPeriod = escrow.getCurrentPeriod();
+        uint256 totalValue = 0;
+        uint256 nodesOffset = 0;
+        for (uint256 i = 0; i < _policyIds.length; i++) {
+            address[] memory policyNodes = new address[](_nodesLengths[i]);
+            for (uint256 j = 0; j < policyNodes.length; j++) {
+                policyNodes[j] = _nodes[nodesOffset.add(j)];
+            }
+            nodesOffset = nodesOffset.add(policyNodes.length);
+            totalValue = totalValue.add(_values[i]);
+            createPolicy(_policyIds[i], _numberOfPeriods[i], policyNodes, _values[i], currentPeriod);
+        }
+        require(nodesOffset == _nodes.length && totalValue == msg.value);
+    }
+
+    /**
+    * @notice Create policy with the specified value
+    * @param _policyId Policy id
+    * @param _numberOfPeriods Duration of the policy in periods
+    * @param _nodes Nodes that will handle policy
+    * @param _value Value of the policy
+    * @param _currentPeriod Current period
+    **/
+    function createPolicy(
+        bytes20 _policyId,
+        uint256 _numberOfPeriods,
+        address[] memory _nodes,
+        uint256 _value,
+        uint256 _currentPeriod
+    )
+        internal
     {
         require(
             policies[_policyId].rate == 0 &&
             _numberOfPeriods != 0 &&
-            msg.value > 0 &&
-            msg.value % _numberOfPeriods % _nodes.length == 0 &&
+            _nodes.length != 0 &&
+            _value > 0 &&
+            _value % _numberOfPeriods % _nodes.length == 0 &&
             _policyId != RESERVED_POLICY_ID
         );
         Policy storage policy = policies[_policyId];
         policy.client = msg.sender;
-        policy.nodes = _nodes;
-        uint256 currentPeriod = escrow.getCurrentPeriod();
-        policy.startPeriod = currentPeriod.add(uint(1));
-        policy.lastPeriod = currentPeriod.add(_numberOfPeriods);
-        uint256 feeByPeriod = msg.value.div(_numberOfPeriods).div(_nodes.length);
+        policy.startPeriod = _currentPeriod.add(uint(1));
+        policy.lastPeriod = _currentPeriod.add(_numberOfPeriods);
+        uint256 feeByPeriod = _value.div(_numberOfPeriods).div(_nodes.length);
         policy.rate = feeByPeriod;
         uint256 endPeriod = policy.lastPeriod.add(uint(1));
 
         policy.nodes = _nodes;
+        uint256[NODES_INFO_SIZE] memory nodesInfo;
         for (uint256 i = 0; i < _nodes.length; i++) {
-            require(escrow.getLockedTokens(_nodes[i]) != 0 &&
+            nodesInfo = fetchNodesInfo(_nodes, i, nodesInfo);
+            require(escrowInfo(nodesInfo, i, LOCKED_TOKENS_FIELD) != 0 &&
                 _nodes[i] != RESERVED_NODE);
-            NodeInfo storage node = nodes[_nodes[i]];
-            node.rewardDelta[policy.startPeriod] = node.rewardDelta[policy.startPeriod]
-                .add(feeByPeriod);
-            node.rewardDelta[endPeriod] = node.rewardDelta[endPeriod].sub(feeByPeriod);
-            // TODO node should pay for this
-            if (node.lastMinedPeriod == 0) {
-                node.lastMinedPeriod = currentPeriod;
-            }
-            ArrangementInfo storage arrangement = policy.arrangements[_nodes[i]];
-            arrangement.indexOfDowntimePeriods =
-                uint256(escrow.getMinerInfo(MinersEscrow.MinerInfoField.DowntimeLength, _nodes[i], 0));
-            arrangement.active = true;
+            addArrangement(policy, _nodes[i], feeByPeriod, endPeriod, _currentPeriod,
+                escrowInfo(nodesInfo, i, DOWNTIME_LENGTH_FIELD));
         }
 
         PolicyCreated(_policyId, msg.sender, _nodes);
     }
 
+    /**
+    * @notice Add node to the policy
+    * @param _policy Policy
+    * @param _node Node that will handle policy
+    * @param _feeByPeriod Fee of the node for one period
+    * @param _endPeriod Period after the last period of the policy
+    * @param _currentPeriod Current period
+    * @param _downtimeLength Number of the node's downtime periods in the escrow
+    **/
+    function addArrangement(
+        Policy storage _policy,
+        address _node,
+        uint256 _feeByPeriod,
+        uint256 _endPeriod,
+        uint256 _currentPeriod,
+        uint256 _downtimeLength
+    )
+        internal
+    {
+        NodeInfo storage node = nodes[_node];
+        uint256 startPeriod = _currentPeriod.add(uint(1));
+        node.rewardDelta[startPeriod] = node.rewardDelta[startPeriod].add(_feeByPeriod);
+        node.rewardDelta[_endPeriod] = node.rewardDelta[_endPeriod].sub(_feeByPeriod);
+        markRewardDelta(node, startPeriod);
+        markRewardDelta(node, _endPeriod);
+        // TODO node should pay for this
+        if (node.lastMinedPeriod == 0) {
+            node.lastMinedPeriod = _currentPeriod;
+        }
+        ArrangementInfo storage arrangement = _policy.arrangements[_node];
+        arrangement.indexOfDowntimePeriods = _downtimeLength;
+        arrangement.active = true;
+    }
+
+    /**
+    * @notice Get information about the batch of nodes that contains the node with the index
+    * @dev The batch is fetched from the escrow only for its first node, and only its nodes are sent
+    * @param _nodes Nodes
+    * @param _index Index of the node
+    * @param _nodesInfo Information about the previous batch
+    **/
+    function fetchNodesInfo(
+        address[] memory _nodes,
+        uint256 _index,
+        uint256[NODES_INFO_SIZE] memory _nodesInfo
+    )
+        internal view returns (uint256[NODES_INFO_SIZE] memory)
+    {
+        if (_index % NODES_INFO_BATCH != 0) {
+            return _nodesInfo;
+        }
+        address[] memory batch = new address[](Math.min256(NODES_INFO_BATCH, _nodes.length - _index));
+        for (uint256 i = 0; i < batch.length; i++) {
+            batch[i] = _nodes[_index + i];
+        }
+        return escrow.getNodesInfo(batch);
+    }
+
+    /**
+    * @notice Get information about one node from the escrow
+    * @param _node Node address
+    **/
+    function fetchNodeInfo(address _node) internal view returns (uint256[NODES_INFO_SIZE] memory) {
+        address[] memory singleNode = new address[](1);
+        singleNode[0] = _node;
+        return escrow.getNodesInfo(singleNode);
+    }
+
+    /**
+    * @notice Get field of the node with the index from the information about its batch
+    **/
+    function escrowInfo(uint256[NODES_INFO_SIZE] memory _nodesInfo, uint256 _index, uint256 _field)
+        internal pure returns (uint256)
+    {
+        return _nodesInfo[(_index % NODES_INFO_BATCH) * NODE_INFO_FIELDS + _field];
+    }
+
+    function markRewardDelta(NodeInfo storage _node, uint256 _period) internal {
+        uint256 word = _period / DELTA_PERIODS_WORD;
+        _node.rewardDeltaPeriods[word] = _node.rewardDeltaPeriods[word] |
+            (uint256(1) << (_period % DELTA_PERIODS_WORD));
+    }
+
+    /**
+    * @notice Get index of the lowest set bit
+    * @param _bits Bits, not zero
+    **/
+    function lowestBit(uint256 _bits) internal pure returns (uint256 bit) {
+        for (uint256 width = 128; width > 0; width >>= 1) {
+            if (_bits & ((uint256(1) << width) - 1) == 0) {
+                bit += width;
+                _bits >>= width;
+            }
+        }
+    }
+
+    /**
+    * @notice Update node reward
+    * @dev Only periods with reward delta are visited,
+    so the cost depends on the number of deltas rather than on the number of skipped periods
+    * @param _node Node info
+    * @param _period Processed period
+    **/
+    function updateNodeReward(NodeInfo storage _node, uint256 _period) internal {
+        if (_node.lastMinedPeriod == 0 || _period <= _node.lastMinedPeriod) {
+            return;
+        }
+        uint256 rewardRate = _node.rewardRate;
+        uint256 firstPeriod = _node.lastMinedPeriod + 1;
+        uint256 lastWord = _period / DELTA_PERIODS_WORD;
+        for (uint256 word = firstPeriod / DELTA_PERIODS_WORD; word <= lastWord; word++) {
+            uint256 bits = _node.rewardDeltaPeriods[word];
+            if (bits == 0) {
+                continue;
+            }
+            // skip periods before the first one and after the processed one
+            if (word == firstPeriod / DELTA_PERIODS_WORD) {
+                bits &= ~((uint256(1) << (firstPeriod % DELTA_PERIODS_WORD)) - 1);
+            }
+            if (word == lastWord && _period % DELTA_PERIODS_WORD != DELTA_PERIODS_WORD - 1) {
+                bits &= (uint256(1) << (_period % DELTA_PERIODS_WORD + 1)) - 1;
+            }
+            while (bits != 0) {
+                uint256 bit = lowestBit(bits);
+                rewardRate = rewardRate.add(_node.rewardDelta[word * DELTA_PERIODS_WORD + bit]);
+                bits &= bits - 1;
+            }
+        }
+        _node.rewardRate = rewardRate;
+        _node.lastMinedPeriod = _period;
+        _node.reward = _node.reward.add(_node.rewardRate);
+    }
+
     /**
     * @notice Update node reward
     * @param _node Node address
     * @param _period Processed period
     **/
     function updateReward(address _node, uint256 _period) external {
+        require(msg.sender == address(escrow));
+        updateNodeReward(nodes[_node], _period);
+    }
+
+    /**
+    * @notice Update node reward for several periods
+    * @param _node Node address
+    * @param _periods Processed periods in ascending order
+    **/
+    function updateRewards(address _node, uint256[] _periods) external {
         require(msg.sender == address(escrow));
         NodeInfo storage node = nodes[_node];
-        if (node.lastMinedPeriod == 0 || _period <= node.lastMinedPeriod) {
-            return;
+        for (uint256 i = 0; i < _periods.length; i++) {
+            updateNodeReward(node, _periods[i]);
         }
-        for (uint256 i = node.lastMinedPeriod + 1; i <= _period; i++) {
-            node.rewardRate = node.rewardRate.add(node.rewardDelta[i]);
-//            delete node.rewardDelta[i];
-        }
-        node.lastMinedPeriod = _period;
-        node.reward = node.reward.add(node.rewardRate);
     }
 
     /**
@@ -197,21 +388,57 @@ contract PolicyManager is Upgradeable {
     function revokePolicy(bytes20 _policyId) public {
         Policy storage policy = policies[_policyId];
         require(policy.client == msg.sender && !policy.disabled);
+        uint256 refundValue = revokePolicy(_policyId, policy);
+        if (refundValue > 0) {
+            msg.sender.transfer(refundValue);
+        }
+    }
+
+    /**
+    * @notice Revoke many policies by client in one transaction
+    * @dev The refund for all policies is sent by one transfer. Already disabled policies are skipped,
+    so that a partly revoked list can be sent again
+    * @param _policyIds Policy ids
+    **/
+    function revokePolicies(bytes20[] _policyIds) public {
+        require(_policyIds.length != 0);
         uint256 refundValue = 0;
-        uint256 endPeriod = policy.lastPeriod.add(uint(1));
-        for (uint256 i = 0; i < policy.nodes.length; i++) {
-            address node = policy.nodes[i];
-            if (!policy.arrangements[node].active) {
+        for (uint256 i = 0; i < _policyIds.length; i++) {
+            Policy storage policy = policies[_policyIds[i]];
+            require(policy.client == msg.sender);
+            if (policy.disabled) {
                 continue;
             }
-            uint256 nodeRefundValue = revokeArrangement(policy, node, endPeriod);
-            refundValue = refundValue.add(nodeRefundValue);
-            ArrangementRevoked(_policyId, msg.sender, node, nodeRefundValue);
+            refundValue = refundValue.add(revokePolicy(_policyIds[i], policy));
         }
-        policy.disabled = true;
         if (refundValue > 0) {
             msg.sender.transfer(refundValue);
         }
+    }
+
+    /**
+    * @notice Revoke all active arrangements of the policy without sending the refund
+    * @param _policyId Policy id
+    * @param _policy Policy
+    * @return refundValue Refund for the policy
+    **/
+    function revokePolicy(bytes20 _policyId, Policy storage _policy)
+        internal returns (uint256 refundValue)
+    {
+        uint256 endPeriod = _policy.lastPeriod.add(uint(1));
+        address[] memory policyNodes = _policy.nodes;
+        uint256[NODES_INFO_SIZE] memory nodesInfo;
+        for (uint256 i = 0; i < policyNodes.length; i++) {
+            nodesInfo = fetchNodesInfo(policyNodes, i, nodesInfo);
+            address node = policyNodes[i];
+            if (!_policy.arrangements[node].active) {
+                continue;
+            }
+            uint256 nodeRefundValue = revokeArrangement(_policy, node, endPeriod, nodesInfo, i);
+            refundValue = refundValue.add(nodeRefundValue);
+            ArrangementRevoked(_policyId, msg.sender, node, nodeRefundValue);
+        }
+        _policy.disabled = true;
         PolicyRevoked(_policyId, msg.sender, refundValue);
     }
 
@@ -228,7 +455,7 @@ contract PolicyManager is Upgradeable {
             !policy.disabled &&
             policy.arrangements[_node].active);
         uint256 endPeriod = policy.lastPeriod.add(uint(1));
-        refundValue = revokeArrangement(policy, _node, endPeriod);
+        refundValue = revokeArrangement(policy, _node, endPeriod, fetchNodeInfo(_node), 0);
         if (refundValue > 0) {
             msg.sender.transfer(refundValue);
         }
@@ -240,16 +467,28 @@ contract PolicyManager is Upgradeable {
     * @param _policy Policy
     * @param _node Node that will be excluded
     * @param _endPeriod Pre-calculated end of period value
+    * @param _nodesInfo Information about the batch of nodes from the escrow
+    * @param _index Index of the node in the batch
     **/
-    function revokeArrangement(Policy storage _policy, address _node, uint256 _endPeriod)
+    function revokeArrangement(
+        Policy storage _policy,
+        address _node,
+        uint256 _endPeriod,
+        uint256[NODES_INFO_SIZE] memory _nodesInfo,
+        uint256 _index
+    )
         internal returns (uint256 refundValue)
     {
-        refundValue = calculateRefund(_policy, _node);
+        refundValue = calculateRefund(_policy, _node,
+            escrowInfo(_nodesInfo, _index, DOWNTIME_LENGTH_FIELD),
+            escrowInfo(_nodesInfo, _index, LAST_ACTIVE_PERIOD_FIELD));
         NodeInfo storage node = nodes[_node];
         ArrangementInfo storage arrangement = _policy.arrangements[_node];
         node.rewardDelta[arrangement.lastRefundedPeriod] =
             node.rewardDelta[arrangement.lastRefundedPeriod].sub(_policy.rate);
         node.rewardDelta[_endPeriod] = node.rewardDelta[_endPeriod].add(_policy.rate);
+        markRewardDelta(node, arrangement.lastRefundedPeriod);
+        markRewardDelta(node, _endPeriod);
         refundValue = refundValue.add(
             _endPeriod.sub(arrangement.lastRefundedPeriod).mul(_policy.rate));
         _policy.arrangements[_node].active = false;
@@ -262,27 +501,64 @@ contract PolicyManager is Upgradeable {
     function refund(bytes20 _policyId) public {
         Policy storage policy = policies[_policyId];
         require(msg.sender == policy.client && !policy.disabled);
+        uint256 refundValue = refund(_policyId, policy);
+        if (refundValue > 0) {
+            msg.sender.transfer(refundValue);
+        }
+    }
+
+    /**
+    * @notice Refund part of fee of many policies by client in one transaction
+    * @dev The refund for all policies is sent by one transfer. Disabled policies are skipped
+    * @param _policyIds Policy ids
+    **/
+    function refundPolicies(bytes20[] _policyIds) public {
+        require(_policyIds.length != 0);
         uint256 refundValue = 0;
-        uint256 numberOfActive = policy.nodes.length;
-        for (uint256 i = 0; i < policy.nodes.length; i++) {
-            address node = policy.nodes[i];
-            if (!policy.arrangements[node].active) {
+        for (uint256 i = 0; i < _policyIds.length; i++) {
+            Policy storage policy = policies[_policyIds[i]];
+            require(msg.sender == policy.client);
+            if (policy.disabled) {
+                continue;
+            }
+            refundValue = refundValue.add(refund(_policyIds[i], policy));
+        }
+        if (refundValue > 0) {
+            msg.sender.transfer(refundValue);
+        }
+    }
+
+    /**
+    * @notice Calculate the refund for all active arrangements of the policy without sending it
+    * @param _policyId Policy id
+    * @param _policy Policy
+    * @return refundValue Refund for the policy
+    **/
+    function refund(bytes20 _policyId, Policy storage _policy)
+        internal returns (uint256 refundValue)
+    {
+        address[] memory policyNodes = _policy.nodes;
+        uint256 numberOfActive = policyNodes.length;
+        uint256[NODES_INFO_SIZE] memory nodesInfo;
+        for (uint256 i = 0; i < policyNodes.length; i++) {
+            nodesInfo = fetchNodesInfo(policyNodes, i, nodesInfo);
+            address node = policyNodes[i];
+            if (!_policy.arrangements[node].active) {
                 numberOfActive--;
                 continue;
             }
-            uint256 nodeRefundValue = calculateRefund(policy, node);
-            if (policy.arrangements[node].lastRefundedPeriod > policy.lastPeriod) {
-                policy.arrangements[node].active = false;
+            uint256 nodeRefundValue = calculateRefund(_policy, node,
+                escrowInfo(nodesInfo, i, DOWNTIME_LENGTH_FIELD),
+                escrowInfo(nodesInfo, i, LAST_ACTIVE_PERIOD_FIELD));
+            if (_policy.arrangements[node].lastRefundedPeriod > _policy.lastPeriod) {
+                _policy.arrangements[node].active = false;
                 numberOfActive--;
             }
             refundValue = refundValue.add(nodeRefundValue);
             RefundForArrangement(_policyId, msg.sender, node, nodeRefundValue);
         }
-        if (refundValue > 0) {
-            msg.sender.transfer(refundValue);
-        }
         if (numberOfActive == 0) {
-            policy.disabled = true;
+            _policy.disabled = true;
         }
         RefundForPolicy(_policyId, msg.sender, refundValue);
     }
@@ -299,7 +575,10 @@ contract PolicyManager is Upgradeable {
         require(msg.sender == policy.client &&
             !policy.disabled &&
             policy.arrangements[_node].active);
-        refundValue = calculateRefund(policy, _node);
+        uint256[NODES_INFO_SIZE] memory nodeInfo = fetchNodeInfo(_node);
+        refundValue = calculateRefund(policy, _node,
+            escrowInfo(nodeInfo, 0, DOWNTIME_LENGTH_FIELD),
+            escrowInfo(nodeInfo, 0, LAST_ACTIVE_PERIOD_FIELD));
         if (policy.arrangements[_node].lastRefundedPeriod > policy.lastPeriod) {
             policy.arrangements[_node].active = false;
         }
@@ -313,39 +592,31 @@ contract PolicyManager is Upgradeable {
     * @notice Calculate amount of refund
     * @param _policy Policy
     * @param _node Node for calculation
+    * @param _downtimeLength Number of the node's downtime periods in the escrow
+    * @param _lastActivePeriod Last active period of the node
     **/
     //TODO extract checkRefund method
-    function calculateRefund(Policy storage _policy, address _node) internal returns (uint256) {
+    function calculateRefund(
+        Policy storage _policy,
+        address _node,
+        uint256 _downtimeLength,
+        uint256 _lastActivePeriod
+    )
+        internal returns (uint256)
+    {
         ArrangementInfo storage arrangement = _policy.arrangements[_node];
         uint256 maxPeriod = Math.min256(escrow.getCurrentPeriod(), _policy.lastPeriod);
         uint256 minPeriod = Math.max256(_policy.startPeriod, arrangement.lastRefundedPeriod);
         uint256 downtimePeriods = 0;
-        uint256 length = uint256(escrow.getMinerInfo(MinersEscrow.MinerInfoField.DowntimeLength, _node, 0));
-        for (uint256 i = arrangement.indexOfDowntimePeriods; i < length; i++) {
-            uint256 startPeriod =
-                uint256(escrow.getMinerInfo(MinersEscrow.MinerInfoField.DowntimeStartPeriod, _node, i));
-            uint256 endPeriod =
-                uint256(escrow.getMinerInfo(MinersEscrow.MinerInfoField.DowntimeEndPeriod, _node, i));
-            if (startPeriod > maxPeriod) {
-                break;
-            } else if (endPeriod < minPeriod) {
-                continue;
-            }
-            downtimePeriods = downtimePeriods.add(
-                Math.min256(maxPeriod, endPeriod)
-                .sub(Math.max256(minPeriod, startPeriod))
-                .add(uint(1)));
-            if (maxPeriod <= endPeriod) {
-                break;
-            }
+        uint256 index = arrangement.indexOfDowntimePeriods;
+        if (index < _downtimeLength) {
+            (downtimePeriods, index) = escrow.getDowntimePeriods(_node, index, minPeriod, maxPeriod);
         }
-        arrangement.indexOfDowntimePeriods = i;
-        uint256 lastActivePeriod =
-            uint256(escrow.getMinerInfo(MinersEscrow.MinerInfoField.LastActivePeriod, _node, 0));
-        if (i == length && lastActivePeriod < maxPeriod) {
+        arrangement.indexOfDowntimePeriods = index;
+        if (index == _downtimeLength && _lastActivePeriod < maxPeriod) {
             downtimePeriods = downtimePeriods.add(
                 maxPeriod.sub(Math.max256(
-                    minPeriod.sub(uint(1)), lastActivePeriod)));
+                    minPeriod.sub(uint(1)), _lastActivePeriod)));
         }
         arrangement.lastRefundedPeriod = maxPeriod.add(uint(1));
 
@@ -420,6 +691,8 @@ contract PolicyManager is Upgradeable {
             return bytes32(nodeInfo.lastMinedPeriod);
         } else if (_field == NodeInfoField.RewardDelta) {
             return bytes32(nodeInfo.rewardDelta[_period]);
+        } else if (_field == NodeInfoField.RewardDeltaPeriods) {
+            return bytes32(nodeInfo.rewardDeltaPeriods[_period / DELTA_PERIODS_WORD]);
         }
     }
 
@@ -458,6 +731,9 @@ contract PolicyManager is Upgradeable {
             bytes32(uint8(NodeInfoField.LastMinedPeriod)), bytes32(RESERVED_NODE), 0)) == nodeInfo.lastMinedPeriod);
         require(int256(delegateGet(_testTarget, "getNodeInfo(uint8,address,uint256)",
             bytes32(uint8(NodeInfoField.RewardDelta)), bytes32(RESERVED_NODE), 11)) == nodeInfo.rewardDelta[11]);
+        require(uint256(delegateGet(_testTarget, "getNodeInfo(uint8,address,uint256)",
+            bytes32(uint8(NodeInfoField.RewardDeltaPeriods)), bytes32(RESERVED_NODE), 11)) ==
+                nodeInfo.rewardDeltaPeriods[0]);
     }
 
     function finishUpgrade(address _target) public onlyOwner {
@@ -479,5 +755,6 @@ contract PolicyManager is Upgradeable {
         nodeInfo.rewardRate = 33;
         nodeInfo.lastMinedPeriod = 44;
         nodeInfo.rewardDelta[11] = 55;
+        markRewardDelta(nodeInfo, 11);
     }
 }
\ No newline at end of file
@@ -15,6 +15,10 @@ contract Dispatcher is Upgradeable {
     event Upgraded(address indexed from, address indexed to, address owner);
     event RolledBack(address indexed from, address indexed to, address owner);
 
+    // Size of the result of every call, in bytes. Without returndatasize the size can't be known,
+    // so it covers the largest fixed-size result of the targets, a page of MinersEscrow.getMinersInfo
+    uint256 constant RETURN_SIZE = 1664;
+
     /**
     * @param _target Target contract address
     **/
@@ -73,22 +77,24 @@ contract Dispatcher is Upgradeable {
         assert(target != 0x0);
 
         address upgradableContractMem = target;
-        uint32 size = 96;
+        uint256 size = RETURN_SIZE;
 
         assembly {
             let freeMemAddress := mload(0x40)
             mstore(0x40, add(freeMemAddress, calldatasize))
             calldatacopy(freeMemAddress, 0x0, calldatasize)
+            // Shorter results are padded with zeros of the untouched memory after the calldata
+            let output := add(freeMemAddress, calldatasize)
 
 //            switch delegatecall(gas, upgradableContractMem, freeMemAddress, calldatasize, 0, 0)
-            switch delegatecall(gas, upgradableContractMem, freeMemAddress, calldatasize, 0, size)
+            switch delegatecall(gas, upgradableContractMem, freeMemAddress, calldatasize, output, size)
                 case 0 {
                     revert(0x0, 0)
                 }
                 default {
 //                    returndatacopy(0x0, 0x0, returndatasize)
 //                    return(0x0, returndatasize)
-                    return(0x0, size)
+                    return(output, size)
                 }
         }
     }
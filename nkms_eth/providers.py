@@ -0,0 +1,244 @@
+import itertools
+import json
+import threading
+import time
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3.providers.base import JSONBaseProvider
+
+
+class RPCEndpoint:
+    """
+    One node of a PooledHTTPProvider: a keep-alive HTTP session
+    and the latency and health observed on it.
+    """
+
+    _latency_weight = 0.2    # Of the latest request in the moving average
+
+    def __init__(self, uri: str, request_kwargs: dict=None, pool_size: int=10):
+        self.uri = uri
+        self.request_kwargs = dict(request_kwargs or dict())
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.latency = None         # Seconds, moving average
+        self.block_number = None    # As of the last health check
+        self.healthy = True
+        self.failures = 0
+        self.failed_at = None
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(uri={}, healthy={}, latency={})"
+        return r.format(class_name, self.uri, self.healthy, self.latency)
+
+    def post(self, payload: bytes) -> bytes:
+        start = time.monotonic()
+        try:
+            response = self.session.post(self.uri, data=payload, headers={'Content-Type': 'application/json'},
+                                         **self.request_kwargs)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.fail()
+            raise
+        self.succeed(time.monotonic() - start)
+        return response.content
+
+    def succeed(self, latency: float) -> None:
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self._latency_weight * (latency - self.latency)
+        self.healthy = True
+        self.failures = 0
+
+    def fail(self) -> None:
+        self.healthy = False
+        self.failures += 1
+        self.failed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """
+    Web3 provider spreading JSON-RPC requests over several nodes, with a keep-alive session per node.
+
+    Reads go to the healthy node with the least latency, and are retried on the next one if a node fails;
+    A sender's writes (and its pending nonce) stay on one node, which only changes when that node fails.
+    Filters are read from the node that installed them. A background thread checks every node
+    with eth_blockNumber, and nodes lagging behind the others are not read from.
+
+    Configured in project.json in place of web3.providers.rpc.HTTPProvider:
+
+        "class": "nkms_eth.providers.PooledHTTPProvider",
+        "settings": {"endpoint_uris": ["http://127.0.0.1:8545", "http://127.0.0.1:8546"]}
+    """
+
+    _write_methods = ('eth_sendTransaction', 'eth_sign', 'personal_sendTransaction',
+                      'personal_signAndSendTransaction', 'personal_unlockAccount', 'personal_lockAccount')
+    _new_filter_methods = ('eth_newFilter', 'eth_newBlockFilter', 'eth_newPendingTransactionFilter')
+    _filter_methods = ('eth_getFilterChanges', 'eth_getFilterLogs', 'eth_uninstallFilter')
+
+    _health_check_interval = 5.0    # Seconds
+    _max_block_lag = 2              # Blocks behind the most advanced node
+
+    class NoEndpointAvailable(RuntimeError):
+        pass
+
+    def __init__(self, endpoint_uris: List[str], request_kwargs: dict=None, pool_size: int=10,
+                 health_check_interval: float=None, max_block_lag: int=None):
+        if not endpoint_uris:
+            raise ValueError('At least one endpoint URI is required')
+
+        self.endpoints = [RPCEndpoint(uri, request_kwargs=request_kwargs, pool_size=pool_size)
+                          for uri in endpoint_uris]
+        if health_check_interval is None:
+            health_check_interval = self._health_check_interval
+        self.health_check_interval = health_check_interval
+        self.max_block_lag = max_block_lag if max_block_lag is not None else self._max_block_lag
+
+        self.__senders = dict()    # address -> RPCEndpoint
+        self.__filters = dict()    # filter id -> RPCEndpoint
+        self.__request_ids = itertools.count()
+        self.__lock = threading.Lock()
+
+        self.__closed = threading.Event()
+        self.__health_checker = None
+        super().__init__()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(endpoints={})"
+        return r.format(class_name, [endpoint.uri for endpoint in self.endpoints])
+
+    @property
+    def endpoint_uri(self) -> str:
+        """The node reads are currently sent to"""
+        return self._readers()[0].uri
+
+    #
+    # Health
+    #
+
+    def _start_health_checks(self) -> None:
+        with self.__lock:
+            if self.__health_checker is not None or not self.health_check_interval:
+                return
+            self.__health_checker = threading.Thread(target=self._check_health_forever, daemon=True)
+        self.__health_checker.start()
+
+    def _check_health_forever(self) -> None:
+        while not self.__closed.wait(self.health_check_interval):
+            self.check_health()
+
+    def check_health(self) -> None:
+        """Read the block number of every node, measuring its latency; Nodes that don't answer are unhealthy"""
+
+        for endpoint in self.endpoints:
+            payload = self.encode_rpc_request('eth_blockNumber', [])
+            try:
+                response = self.decode_rpc_response(endpoint.post(payload))
+                endpoint.block_number = int(response['result'], 16)
+            except requests.RequestException:
+                continue
+            except (ValueError, KeyError, TypeError):    # Not a JSON-RPC node, or an error response
+                endpoint.fail()
+
+    def close(self) -> None:
+        self.__closed.set()
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+    #
+    # Routing
+    #
+
+    def _readers(self) -> List[RPCEndpoint]:
+        """Nodes to read from, the fastest first; Unhealthy nodes are tried last, the longest failed first"""
+
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+        known = [endpoint.block_number for endpoint in healthy if endpoint.block_number is not None]
+        if known:
+            synced = [endpoint for endpoint in healthy
+                      if endpoint.block_number is None or max(known) - endpoint.block_number <= self.max_block_lag]
+            lagging = [endpoint for endpoint in healthy if endpoint not in synced]
+        else:
+            synced, lagging = healthy, list()
+
+        def by_latency(endpoint):
+            return endpoint.latency if endpoint.latency is not None else 0.0
+
+        unhealthy = sorted((endpoint for endpoint in self.endpoints if not endpoint.healthy),
+                           key=lambda endpoint: endpoint.failed_at)
+        return sorted(synced, key=by_latency) + sorted(lagging, key=by_latency) + unhealthy
+
+    def _writer(self, sender: str) -> RPCEndpoint:
+        """The node a sender's writes stay on; It is chosen again only if it failed"""
+
+        sender = sender.lower() if isinstance(sender, str) else sender
+        with self.__lock:
+            endpoint = self.__senders.get(sender)
+            if endpoint is None or not endpoint.healthy:
+                endpoint = self.__senders[sender] = self._readers()[0]
+        return endpoint
+
+    def _route(self, method: str, params) -> List[RPCEndpoint]:
+        """The nodes to try a request on, in order"""
+
+        if method in self._write_methods:
+            sender = params[0].get('from') if isinstance(params[0], dict) else params[0]
+            return [self._writer(sender)]
+        if method == 'eth_sendRawTransaction':
+            return [self._writer(None)]
+        if method == 'eth_getTransactionCount' and len(params) > 1 and params[1] == 'pending':
+            return [self._writer(params[0])]
+        if method in self._filter_methods:
+            endpoint = self.__filters.get(params[0])
+            return [endpoint] if endpoint is not None else list()
+        return self._readers()
+
+    def _send(self, endpoints: List[RPCEndpoint], payload: bytes):
+        """Post the payload to the first node that answers; Returns the decoded response and the node"""
+
+        if not endpoints:
+            raise self.NoEndpointAvailable('No node to send the request to')
+        for endpoint in endpoints[:-1]:
+            try:
+                return self.decode_rpc_response(endpoint.post(payload)), endpoint
+            except requests.RequestException:
+                continue
+        return self.decode_rpc_response(endpoints[-1].post(payload)), endpoints[-1]
+
+    def make_request(self, method, params):
+        self._start_health_checks()
+
+        endpoints = self._route(method, params)
+        if method in self._filter_methods and not endpoints:
+            # Unknown to every node; Callers install the filter again, as if the node dropped it
+            return {'jsonrpc': '2.0', 'id': next(self.__request_ids),
+                    'error': {'code': -32000, 'message': 'filter not found'}}
+        if method in self._write_methods or method == 'eth_sendRawTransaction':
+            # A write that timed out may have been sent; It is not repeated on another node
+            response = self.decode_rpc_response(endpoints[0].post(self.encode_rpc_request(method, params)))
+            return response
+
+        response, endpoint = self._send(endpoints, self.encode_rpc_request(method, params))
+        if method in self._new_filter_methods and 'result' in response:
+            self.__filters[response['result']] = endpoint
+        elif method == 'eth_uninstallFilter':
+            self.__filters.pop(params[0], None)
+        return response
+
+    def make_batch_request(self, payload: List[dict]) -> List[dict]:
+        """Send a JSON-RPC batch of reads to the fastest node that answers"""
+
+        self._start_health_checks()
+        response, _endpoint = self._send(self._readers(), json.dumps(payload).encode())
+        return response
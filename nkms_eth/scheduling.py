@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import List, Dict
+
+from nkms_eth.actors import AsyncMiner
+
+
+class PeriodReport:
+    """Outcome of the activity confirmations sent for one period"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.started = time.monotonic()
+
+        self.latencies = OrderedDict()    # Miner address -> seconds until the confirmation was mined
+        self.failures = OrderedDict()     # Miner address -> last exception
+        self.attempts = dict()            # Miner address -> number of attempts
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(period={}, confirmed={}, failed={}, max_latency={})"
+        return r.format(class_name, self.period, len(self.latencies), len(self.failures), self.max_latency)
+
+    @property
+    def max_latency(self) -> float:
+        return max(self.latencies.values()) if self.latencies else None
+
+    @property
+    def mean_latency(self) -> float:
+        return sum(self.latencies.values()) / len(self.latencies) if self.latencies else None
+
+
+class ActivityConfirmationScheduler:
+    """
+    Confirms activity once per period for many miners.
+
+    The current period is followed locally from the latest block timestamp and
+    MinersEscrow.secondsPerPeriod, as Issuer.getCurrentPeriod computes it. When a new period
+    starts, confirmActivity is fanned out to every managed miner concurrently; AsyncMiner keeps
+    each address's nonces in order, and failed confirmations are retried.
+    """
+
+    def __init__(self, miner_agent, miners: List[AsyncMiner], retries: int=3, retry_delay: float=5,
+                 poll_interval: float=15, loop=None):
+
+        self.miner_agent = miner_agent
+        self.miners = list(miners)
+
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.reports = OrderedDict()    # Period -> PeriodReport
+        self.__seconds_per_period = None
+        self.__running = False
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(miners={}, periods={})"
+        return r.format(class_name, len(self.miners), len(self.reports))
+
+    @property
+    def seconds_per_period(self) -> int:
+        if self.__seconds_per_period is None:
+            self.__seconds_per_period = self.miner_agent.read().secondsPerPeriod()
+        return self.__seconds_per_period
+
+    def _latest_timestamp(self) -> int:
+        return self.miner_agent.blockchain._chain.web3.eth.getBlock('latest')['timestamp']
+
+    def get_current_period(self) -> int:
+        """Compute Issuer.getCurrentPeriod from the latest block without an eth_call"""
+
+        return self._latest_timestamp() // self.seconds_per_period
+
+    async def _confirm(self, miner: AsyncMiner, report: PeriodReport) -> None:
+        for attempt in range(1, self.retries + 2):
+            report.attempts[miner.address] = attempt
+            try:
+                await miner.confirm_activity()
+            except Exception as e:
+                report.failures[miner.address] = e
+                if attempt <= self.retries:
+                    await asyncio.sleep(self.retry_delay)
+            else:
+                report.failures.pop(miner.address, None)
+                report.latencies[miner.address] = time.monotonic() - report.started
+                return
+
+    async def confirm_period(self, period: int) -> PeriodReport:
+        """Confirm activity for all miners concurrently and report per-miner latency"""
+
+        report = PeriodReport(period=period)
+        self.reports[period] = report
+
+        await asyncio.gather(*(self._confirm(miner, report) for miner in self.miners))
+        return report
+
+    async def run(self, periods: int=None) -> Dict[int, PeriodReport]:
+        """
+        Confirm activity at the start of each period until stopped,
+        or until the given number of periods has been handled.
+        """
+
+        self.__running = True
+        handled = 0
+        while self.__running and (periods is None or handled < periods):
+
+            timestamp = await self.loop.run_in_executor(None, self._latest_timestamp)
+            period = timestamp // self.seconds_per_period
+
+            if period not in self.reports:
+                await self.confirm_period(period)
+                handled += 1
+                continue
+
+            seconds_until_next_period = (period + 1) * self.seconds_per_period - timestamp
+            await asyncio.sleep(max(0, min(self.poll_interval, seconds_until_next_period)))
+
+        return self.reports
+
+    def stop(self) -> None:
+        self.__running = False
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from typing import Iterable
+
+import numpy as np
+
+from nkms_eth.config import NuCypherMinerConfig, NuCypherTokenConfig
+
+
+IssuanceProjection = namedtuple('IssuanceProjection', ('minted', 'supply', 'rewards'))
+
+
+def exact_array(values: Iterable[int]) -> np.ndarray:
+    """
+    Arrays of python integers; Token amounts multiplied by supplies overflow
+    every fixed-width numpy type, so all arithmetic is kept arbitrary-precision.
+
+    The supply times a locked value and its periods reaches about 2 ** 185 units,
+    while float64 keeps 53 significant bits; Rounded terms would not floor to the contract's results.
+    Object arrays trade the speed of native numpy loops for results equal to the contract's.
+    """
+    return np.array([int(value) for value in values], dtype=object)
+
+
+def mint_amounts(future_supply: int, current_supply: int, locked_values: np.ndarray, total_locked_value: int,
+                 all_locked_periods: np.ndarray, mining_coefficient: int, locked_periods_coefficient: int,
+                 awarded_periods: int) -> np.ndarray:
+    """
+    Vectorised Issuer.mint for many miners in the same period, with the contract's integer arithmetic:
+
+        futureSupply * lockedValue * (k1 + allLockedPeriods) / (totalLockedValue * k2) -
+        currentSupply * lockedValue * (k1 + allLockedPeriods) / (totalLockedValue * k2)
+    """
+
+    periods = np.minimum(all_locked_periods, awarded_periods) + locked_periods_coefficient
+    weights = locked_values * periods
+    denominator = total_locked_value * mining_coefficient
+    return future_supply * weights // denominator - current_supply * weights // denominator
+
+
+class IssuanceSimulation:
+    """
+    Projection of token issuance for miners who confirm activity and mint every period.
+
+    For each period, all miners are rewarded against the supply at the start of the period
+    (Issuer.totalSupply[currentIndex]), and their rewards are accumulated into the supply
+    used for the following period (Issuer.totalSupply[currentIndex ^ NEGATION]).
+
+    As in MinersEscrow.mint, the reward for a period weighs the value locked in that period
+    by the periods left to unlock the value locked in the next one. Miners with release
+    switched on unlock release_rate tokens every period.
+    """
+
+    def __init__(self, future_supply: int, current_supply: int, locked_values: Iterable[int],
+                 release_rates: Iterable[int], release: Iterable[bool], mining_coefficient: int,
+                 locked_periods_coefficient: int, awarded_periods: int):
+
+        self.future_supply = future_supply
+        self.current_supply = current_supply
+
+        self.locked_values = exact_array(locked_values)
+        self.release_rates = exact_array(release_rates)
+        self.release = np.array(list(release), dtype=bool)
+
+        self.mining_coefficient = mining_coefficient
+        self.locked_periods_coefficient = locked_periods_coefficient
+        self.awarded_periods = awarded_periods
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(miners={}, current_supply={})"
+        return r.format(class_name, len(self.locked_values), self.current_supply)
+
+    @classmethod
+    def from_config(cls, locked_values: Iterable[int], release_rates: Iterable[int], release: Iterable[bool],
+                    current_supply: int=None, miner_config: NuCypherMinerConfig=None) -> 'IssuanceSimulation':
+        """Simulate the deployed coefficients, starting from the premine unless another supply is given"""
+
+        if miner_config is None:
+            miner_config = NuCypherMinerConfig()
+        future_supply = NuCypherTokenConfig().saturation
+        if current_supply is None:
+            current_supply = future_supply - miner_config.reward
+
+        _hours_per_period, mining_coefficient, locked_periods_coefficient, awarded_periods, *_ = \
+            miner_config.mining_coefficient
+
+        return cls(future_supply=future_supply,
+                   current_supply=current_supply,
+                   locked_values=locked_values,
+                   release_rates=release_rates,
+                   release=release,
+                   mining_coefficient=mining_coefficient,
+                   locked_periods_coefficient=locked_periods_coefficient,
+                   awarded_periods=awarded_periods)
+
+    def _next_locked_values(self, locked_values: np.ndarray) -> np.ndarray:
+        released = np.maximum(locked_values - self.release_rates, 0)
+        return np.where(self.release, released, locked_values)
+
+    def run(self, periods: int) -> IssuanceProjection:
+        """
+        Advance the simulation by the number of periods and return the tokens minted
+        and the supply after each period, with every miner's accumulated reward.
+        """
+
+        minted = np.zeros(periods, dtype=object)
+        supply = np.zeros(periods, dtype=object)
+        rewards = exact_array(0 for _ in self.locked_values)
+
+        locked_values = self.locked_values
+        for period in range(periods):
+            next_locked_values = self._next_locked_values(locked_values)
+            total_locked_value = locked_values.sum()
+
+            if total_locked_value > 0:
+                # MinersEscrow.calculateLockedPeriods of the next period, plus the period being minted
+                all_locked_periods = -(-next_locked_values // self.release_rates)
+                amounts = mint_amounts(future_supply=self.future_supply,
+                                       current_supply=self.current_supply,
+                                       locked_values=locked_values,
+                                       total_locked_value=total_locked_value,
+                                       all_locked_periods=all_locked_periods,
+                                       mining_coefficient=self.mining_coefficient,
+                                       locked_periods_coefficient=self.locked_periods_coefficient,
+                                       awarded_periods=self.awarded_periods)
+                rewards += amounts
+                self.current_supply += amounts.sum()
+                minted[period] = amounts.sum()
+
+            supply[period] = self.current_supply
+            locked_values = next_locked_values
+
+        self.locked_values = locked_values
+        return IssuanceProjection(minted=minted, supply=supply, rewards=rewards)
@@ -0,0 +1,301 @@
+from bisect import bisect_right
+from collections import namedtuple, OrderedDict
+from typing import List, Iterable, Optional, Set
+
+
+ConfirmedPeriod = namedtuple('ConfirmedPeriod', ('period', 'locked_value'))
+
+MAX_PERIODS = 3                                # MinersEscrow.MAX_PERIODS
+MINER_SNAPSHOT_FIELDS = 7 + 2 * MAX_PERIODS    # MinersEscrow.MINER_SNAPSHOT_FIELDS
+MINERS_INFO_PAGE = 4                           # MinersEscrow.MINERS_INFO_PAGE
+
+
+class MinerState:
+    """
+    Off-chain record of a single MinersEscrow.MinerInfo entry.
+
+    Mirrors the locked token arithmetic of the MinersEscrow contract
+    so that stake-dependant values can be computed locally from a snapshot.
+    """
+
+    def __init__(self, address: str, index: int, value: int, locked_value: int, release: bool,
+                 release_rate: int, confirmed_periods: List[ConfirmedPeriod], last_active_period: int):
+
+        self.address = address
+        self.index = index    # Position in the MinersEscrow miners array
+
+        self.value = value
+        self.locked_value = locked_value
+        self.release = release
+        self.release_rate = release_rate
+        self.confirmed_periods = list(confirmed_periods)
+        self.last_active_period = last_active_period
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(address='{}', locked_value={})"
+        return r.format(class_name, self.address, self.locked_value)
+
+    @classmethod
+    def from_snapshot(cls, values: List[int], index: int) -> 'MinerState':
+        """Decode the values of one miner in the result of MinersEscrow.getMinersInfo"""
+
+        address, value, locked_value, release_rate, release, last_active_period, n_confirmed = values[:7]
+
+        confirmed_periods = list()
+        for position in range(min(n_confirmed, MAX_PERIODS)):
+            period, period_locked_value = values[7 + 2*position:9 + 2*position]
+            confirmed_periods.append(ConfirmedPeriod(period, period_locked_value))
+
+        state = cls(address='0x{:040x}'.format(address),
+                    index=index,
+                    value=value,
+                    locked_value=locked_value,
+                    release=bool(release),
+                    release_rate=release_rate,
+                    confirmed_periods=confirmed_periods,
+                    last_active_period=last_active_period)
+        return state
+
+    def _calculate_locked_tokens(self, force_release: bool, locked_tokens: int, periods: int) -> int:
+        """See MinersEscrow.calculateLockedTokens(address,bool,uint256,uint256)"""
+
+        if (force_release or self.release) and periods != 0:
+            unlocked_tokens = periods * self.release_rate
+            return locked_tokens - unlocked_tokens if unlocked_tokens <= locked_tokens else 0
+        return locked_tokens
+
+    def locked_tokens(self, current_period: int) -> int:
+        """Locked tokens in the current period; See MinersEscrow.getLockedTokens"""
+
+        if len(self.confirmed_periods) == 0:
+            locked_value = self.locked_value
+        else:
+            last = self.confirmed_periods[-1]
+            if last.period == current_period:
+                return last.locked_value
+            elif last.period < current_period:
+                locked_value = last.locked_value
+            elif len(self.confirmed_periods) > 1:
+                return self.confirmed_periods[-2].locked_value
+            else:
+                return self.locked_value
+
+        if self._calculate_locked_tokens(False, locked_value, 1) == 0:
+            return 0
+        return locked_value
+
+    def sampling_weight(self, current_period: int, periods: int) -> int:
+        """Stake used by MinersEscrow.findCumSum to position this miner on the cumulative ruler"""
+
+        if len(self.confirmed_periods) == 0:
+            return 0
+
+        last = self.confirmed_periods[-1]
+        if last.period == current_period:
+            return self._calculate_locked_tokens(True, last.locked_value, periods)
+        elif len(self.confirmed_periods) > 1 and self.confirmed_periods[-2].period == current_period:
+            return self._calculate_locked_tokens(True, last.locked_value, periods - 1)
+        return 0
+
+
+class StakeIndex:
+    """
+    Client-side prefix-sum over the stake distribution of all miners,
+    equivalent to walking MinersEscrow.findCumSum from the first miner.
+
+    Each point on the cumulative ruler is resolved with a binary search.
+    """
+
+    def __init__(self, miners: Iterable[MinerState], current_period: int, periods: int):
+        self.current_period = current_period
+        self.periods = periods
+
+        self.__miners = list()
+        self.__cumulative = list()
+
+        total = 0
+        for miner in miners:
+            weight = miner.sampling_weight(current_period=current_period, periods=periods)
+            if weight == 0:
+                continue    # Never selected on-chain either
+            total += weight
+            self.__miners.append(miner)
+            self.__cumulative.append(total)
+
+    def __len__(self):
+        return len(self.__miners)
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(miners={}, total={}, period={})"
+        return r.format(class_name, len(self), self.total, self.current_period)
+
+    @property
+    def total(self) -> int:
+        return self.__cumulative[-1] if self.__cumulative else 0
+
+    def find(self, point: int) -> Optional[MinerState]:
+        """Return the miner whose stake covers the point, or None if the point is past the end of the ruler"""
+
+        position = bisect_right(self.__cumulative, point)
+        if position == len(self.__cumulative):
+            return None
+        return self.__miners[position]
+
+    def find_many(self, points: Iterable[int]) -> List[Optional[MinerState]]:
+        return [self.find(point) for point in points]
+
+
+class MinerStateCache:
+    """
+    In-memory copy of the escrow records of all miners,
+    kept current by replaying MinersEscrow events from a block cursor.
+
+    A miner's record is only read from the escrow again
+    after an event concerning that miner has been seen.
+
+    If a SnapshotStore is provided, the cache resumes from the stored state
+    and writes every refreshed record back, together with the block cursor.
+    """
+
+    _events = ('Deposited', 'Locked', 'LockSwitched', 'Withdrawn', 'ActivityConfirmed', 'Mined')
+
+    def __init__(self, miner_agent, snapshot_store=None):
+        self.miner_agent = miner_agent
+        self.snapshot_store = snapshot_store    # Optional nkms_eth.storage.SnapshotStore
+
+        self.block_cursor = None      # Last processed block number
+        self.current_period = None    # Period of the last processed block
+        self.revision = 0             # Incremented every time a record is invalidated
+
+        self.__seconds_per_period = None
+        self.__states = OrderedDict()    # Ledger order
+        self.__stale = set()
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(miners={}, block_cursor={})"
+        return r.format(class_name, len(self), self.block_cursor)
+
+    def __len__(self):
+        return len(self.__states)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.__states
+
+    def clear(self) -> None:
+        """Forget all records; The next sync takes a full snapshot"""
+
+        self.__states.clear()
+        self.__stale.clear()
+        self.block_cursor = None
+        self.revision += 1
+
+        if self.snapshot_store is not None:
+            self.snapshot_store.clear(self.miner_agent.contract_address)
+
+    def sync(self) -> Set[str]:
+        """
+        Replay the escrow events emitted since the block cursor
+        and return the addresses of the miners whose records were invalidated.
+        """
+
+        web3 = self.miner_agent.blockchain._chain.web3
+        latest_block = web3.eth.getBlock('latest')
+
+        if self.__seconds_per_period is None:
+            self.__seconds_per_period = self.miner_agent.read().secondsPerPeriod()
+        self.current_period = latest_block['timestamp'] // self.__seconds_per_period
+
+        if self.block_cursor is None and self.snapshot_store is not None:
+            self.block_cursor, states = self.snapshot_store.load(self.miner_agent.contract_address)
+            for state in states:
+                self.__states[state.address] = state
+            self.revision += 1
+
+        if self.block_cursor is None:
+            for state in self.miner_agent.snapshot():
+                self.__states[state.address] = state
+            self.block_cursor = latest_block['number']
+            self.revision += 1
+
+            if self.snapshot_store is not None:
+                self.snapshot_store.save(self.miner_agent.contract_address,
+                                         block_number=self.block_cursor,
+                                         states=self.__states.values())
+            return set(self.__states)
+
+        if latest_block['number'] <= self.block_cursor:
+            return set()
+
+        filter_params = {'fromBlock': self.block_cursor + 1, 'toBlock': latest_block['number']}
+        entries = list()
+        for event_name in self._events:
+            entries.extend(self.miner_agent._contract.pastEvents(event_name, filter_params).get())
+        entries.sort(key=lambda entry: (entry['blockNumber'], entry['logIndex']))
+
+        invalidated = set()
+        for entry in entries:
+            address = web3.toChecksumAddress(entry['args']['owner'])
+            if address not in self.__states:
+                self.__states[address] = None    # New miners are appended to the escrow's ledger
+            invalidated.add(address)
+
+        self.__stale.update(invalidated)
+        self.block_cursor = latest_block['number']
+        if invalidated:
+            self.revision += 1
+
+        if self.snapshot_store is not None:
+            # Only fresh records may be stored alongside the advanced cursor
+            refreshed = self.refresh()
+            self.snapshot_store.save(self.miner_agent.contract_address,
+                                     block_number=self.block_cursor,
+                                     states=refreshed)
+
+        return invalidated
+
+    def refresh(self, addresses: Iterable[str]=None) -> List[MinerState]:
+        """
+        Read the invalidated records (or only those among addresses) from the escrow in bulk,
+        and return the refreshed records.
+        """
+
+        if addresses is None:
+            stale = list(self.__stale)
+        else:
+            stale = [address for address in addresses if address in self.__stale]
+        if not stale:
+            return list()
+
+        positions = {address: index for index, address in enumerate(self.__states)}
+        refreshed = self.miner_agent.get_miner_states(stale)
+        for state in refreshed:
+            state.index = positions[state.address]
+            self.__states[state.address] = state
+
+        self.__stale.difference_update(stale)
+        return refreshed
+
+    def get(self, address: str) -> Optional[MinerState]:
+        """Return the record of a miner, or None if the address has never staked"""
+
+        if address not in self.__states:
+            return None
+        self.refresh([address])
+        return self.__states[address]
+
+    def states(self) -> List[MinerState]:
+        """Return the records of all miners, in ledger order"""
+
+        self.refresh()
+        return list(self.__states.values())
+
+    def locked_tokens(self, address: str) -> int:
+        """Locked tokens of a miner in the period of the last processed block"""
+
+        state = self.get(address)
+        if state is None:
+            return 0
+        return state.locked_tokens(current_period=self.current_period)
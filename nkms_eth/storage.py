@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+
+from nkms_eth.stakes import MinerState, ConfirmedPeriod
+
+
+class SnapshotStore:
+    """
+    Persistent SQLite store of chain-derived staker state.
+
+    Records the last known state of every miner, with the block it was read at,
+    and the last processed block for each escrow contract, so a restarted node
+    only needs to replay the events emitted since then.
+    """
+
+    __schema = """
+        CREATE TABLE IF NOT EXISTS cursors (
+            contract_address TEXT PRIMARY KEY,
+            block_number INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS miners (
+            contract_address TEXT NOT NULL,
+            address TEXT NOT NULL,
+            ledger_index INTEGER NOT NULL,
+            block_number INTEGER NOT NULL,
+            value TEXT NOT NULL,
+            locked_value TEXT NOT NULL,
+            release INTEGER NOT NULL,
+            release_rate TEXT NOT NULL,
+            last_active_period INTEGER NOT NULL,
+            confirmed_periods TEXT NOT NULL,
+            PRIMARY KEY (contract_address, address)
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.__connection = sqlite3.connect(path)
+        self.__connection.executescript(self.__schema)
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(path='{}')"
+        return r.format(class_name, self.path)
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def load(self, contract_address: str) -> Tuple[Optional[int], List[MinerState]]:
+        """Return the last processed block and the stored miner states, in ledger order"""
+
+        row = self.__connection.execute('SELECT block_number FROM cursors WHERE contract_address = ?',
+                                        (contract_address, )).fetchone()
+        if row is None:
+            return None, list()
+        block_number, = row
+
+        rows = self.__connection.execute("""
+            SELECT address, ledger_index, value, locked_value, release, release_rate,
+                   last_active_period, confirmed_periods
+            FROM miners WHERE contract_address = ? ORDER BY ledger_index
+        """, (contract_address, ))
+
+        states = list()
+        for address, index, value, locked_value, release, release_rate, last_active_period, periods in rows:
+            state = MinerState(address=address,
+                               index=index,
+                               value=int(value),
+                               locked_value=int(locked_value),
+                               release=bool(release),
+                               release_rate=int(release_rate),
+                               confirmed_periods=[ConfirmedPeriod(*p) for p in json.loads(periods)],
+                               last_active_period=last_active_period)
+            states.append(state)
+
+        return block_number, states
+
+    def save(self, contract_address: str, block_number: int, states: Iterable[MinerState]) -> None:
+        """Store the given miner states as read at block_number, and advance the cursor, atomically"""
+
+        rows = ((contract_address, state.address, state.index, block_number,
+                 str(state.value), str(state.locked_value), int(state.release), str(state.release_rate),
+                 state.last_active_period, json.dumps(state.confirmed_periods))
+                for state in states)
+
+        with self.__connection:
+            self.__connection.executemany('INSERT OR REPLACE INTO miners VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.__connection.execute('INSERT OR REPLACE INTO cursors VALUES (?, ?)', (contract_address, block_number))
+
+    def clear(self, contract_address: str) -> None:
+        """Delete everything stored for a contract"""
+
+        with self.__connection:
+            self.__connection.execute('DELETE FROM miners WHERE contract_address = ?', (contract_address, ))
+            self.__connection.execute('DELETE FROM cursors WHERE contract_address = ?', (contract_address, ))
@@ -47,16 +47,12 @@ class MockNuCypherKMSTokenDeployer(NuCypherKMSTokenDeployer):
 
         _creator, *addresses = self.blockchain._chain.web3.eth.accounts
 
-        def txs():
-            for address in addresses:
-                txhash = self._contract.transact({'from': self._creator}).transfer(address, amount)
-                yield txhash
-
-        receipts = []
-        for tx in txs():    # One at a time
-            receipt = self.blockchain.wait_for_receipt(tx)
-            receipts.append(receipt)
-        return receipts
+        queue = self.blockchain.transaction_queue
+        transactions = [queue.submit(self._contract, 'transfer', address, amount, payload={'from': self._creator})
+                        for address in addresses]    # Many in flight
+
+        queue.wait(transactions)
+        return [transaction.receipt for transaction in transactions]
 
 
 class MockNuCypherMinerConfig(NuCypherMinerConfig):
@@ -1,293 +1,276 @@
 #!/usr/bin/env python3
 
 """
-Deploy contracts in tester.
-A simple Python script to deploy contracts and then estimate gas for different methods.
-"""
+Gas benchmarks for the MinersEscrow and PolicyManager entry points.
 
+For each number of miners, the token, escrow and policy manager are deployed on a fresh tester chain,
+the escrow is populated with pre-deposited miners and the gas used by each entry point is recorded;
+Policies are measured for each number of nodes. Results are written as JSON and,
+if a baseline is given, compared to it:
 
-from nkms_eth.agents import NuCypherKMSTokenAgent, MinerAgent
-import os
+    python3 scripts/estimate_gas_tester.py --output gas.json --baseline gas_baseline.json
 
-from tests.utilities import TesterBlockchain
+Entry points that can't be executed at some scale (e.g. exceed the block gas limit) are recorded as null.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from nkms_eth.agents import NuCypherKMSTokenAgent, PolicyAgent
+from nkms_eth.blockchain import TheBlockchain
+from nkms_eth.config import EthereumConfig
+from nkms_eth.deployers import NuCypherKMSTokenDeployer, PolicyManagerDeployer
+from nkms_eth.utilities import TesterBlockchain, MockMinerEscrowDeployer
+
+
+MINER_SCALES = (1, 100, 1000, 10000)
+NODE_SCALES = (1, 5, 10, 25, 50)
+
+PRE_DEPOSIT_CHUNK = 20       # Owners in each preDeposit transaction
+STAKE = 10 ** 4              # Tokens locked by each pre-deposited miner
+LOCK_PERIODS = 10            # Periods to lock the pre-deposited and deposited stakes
+POLICY_PERIODS = 10
+POLICY_RATE = 100            # Wei per period per node
+BATCH_POLICIES = 10          # Policies created by one createPolicies transaction
+
+
+class GasBenchmark:
+    """Measures entry points on a fresh tester chain with a given number of miners"""
+
+    def __init__(self, miners: int):
+        self.miners = miners
+        self.results = OrderedDict()
+
+        self.blockchain = TesterBlockchain(eth_config=EthereumConfig())
+        self.web3 = self.blockchain._chain.web3
+
+        self.creator, self.ursula, self.ursula2, self.alice, *_ = self.web3.eth.accounts
+        self._policies = 0
+
+    def __repr__(self):
+        class_name = self.__class__.__name__
+        r = "{}(miners={})"
+        return r.format(class_name, self.miners)
+
+    def close(self):
+        del self.blockchain
+        TheBlockchain._TheBlockchain__instance = None
+
+    def _key(self, name: str, **scale) -> str:
+        scale = ','.join('{}={}'.format(key, value) for key, value in sorted(scale.items()))
+        return '{}[miners={}{}]'.format(name, self.miners, ',' + scale if scale else '')
+
+    def transact(self, name: str, send: Callable, **scale) -> None:
+        """Send a transaction and record the gas it used"""
+
+        receipt = self.blockchain.wait_for_receipt(send())
+        self.results[self._key(name, **scale)] = receipt['gasUsed']
+
+    def estimate(self, name: str, estimate: Callable, **scale) -> None:
+        """Record the gas estimated for a call, or None if the call fails"""
+
+        try:
+            gas = estimate()
+        except Exception:
+            gas = None
+        self.results[self._key(name, **scale)] = gas
+
+    def _send(self, txhash) -> None:
+        self.blockchain.wait_for_receipt(txhash)
+
+    def deploy(self) -> None:
+        token_deployer = NuCypherKMSTokenDeployer(blockchain=self.blockchain)
+        token_deployer.arm()
+        token_deployer.deploy()
+        self.token = token_deployer._contract
+        self._M = token_deployer._M
+
+        token_agent = NuCypherKMSTokenAgent(blockchain=self.blockchain)
+        escrow_deployer = MockMinerEscrowDeployer(token_agent=token_agent)
+        escrow_deployer.arm()
+        escrow_deployer.deploy()
+        self.escrow = escrow_deployer._contract
+
+        policy_manager_deployer = PolicyManagerDeployer(miner_escrow_deployer=escrow_deployer)
+        policy_manager_deployer.arm()
+        policy_manager_deployer.deploy()
+        self.policy_manager = policy_manager_deployer._contract
+
+    def populate(self) -> None:
+        """Pre-deposit stakes for generated miner addresses"""
+
+        value = STAKE * self._M
+        self.owners = [self.web3.toChecksumAddress('0x{:040x}'.format(index + 1)) for index in range(self.miners)]
+        self._send(self.token.transact({'from': self.creator}).approve(self.escrow.address, value * self.miners))
+
+        for start in range(0, self.miners, PRE_DEPOSIT_CHUNK):
+            chunk = self.owners[start:start + PRE_DEPOSIT_CHUNK]
+            pre_deposit = self.escrow.transact({'from': self.creator}).preDeposit
+            self.transact('MinersEscrow.preDeposit',
+                          lambda: pre_deposit(chunk, [value] * len(chunk), [LOCK_PERIODS] * len(chunk)),
+                          owners=len(chunk))
+
+    def measure_staking(self) -> None:
+        value = STAKE * self._M
+        for ursula in (self.ursula, self.ursula2):
+            self._send(self.token.transact({'from': self.creator}).transfer(ursula, 2 * value))
+            self._send(self.token.transact({'from': ursula}).approve(self.escrow.address, 2 * value))
+
+        self.transact('MinersEscrow.deposit',
+                      lambda: self.escrow.transact({'from': self.ursula}).deposit(value, LOCK_PERIODS))
+        self._send(self.escrow.transact({'from': self.ursula2}).deposit(value, LOCK_PERIODS))
+        self.transact('MinersEscrow.deposit', lambda: self.escrow.transact({'from': self.ursula}).deposit(value, 0),
+                      again=1)
+
+        # The first confirmation for a period creates the nodes of its stake tree, the following ones update them
+        self.blockchain.wait_time(1)
+        self.transact('MinersEscrow.confirmActivity',
+                      lambda: self.escrow.transact({'from': self.ursula}).confirmActivity())
+        self.transact('MinersEscrow.confirmActivity',
+                      lambda: self.escrow.transact({'from': self.ursula2}).confirmActivity(), following=1)
+
+        self.blockchain.wait_time(1)
+        self.transact('MinersEscrow.mint', lambda: self.escrow.transact({'from': self.ursula}).mint())
+        self.transact('MinersEscrow.confirmActivity',
+                      lambda: self.escrow.transact({'from': self.ursula2}).confirmActivity(), mint=1)
+        self.transact('MinersEscrow.lock', lambda: self.escrow.transact({'from': self.ursula}).lock(0, 1))
+        self.transact('MinersEscrow.switchLock', lambda: self.escrow.transact({'from': self.ursula}).switchLock())
+
+        self.blockchain.wait_time(1)
+        self.transact('MinersEscrow.withdraw', lambda: self.escrow.transact({'from': self.ursula}).withdraw(1))
+
+    def measure_sampling(self) -> None:
+        """Sampling walks every miner in front of the confirmed stakes"""
+
+        self._send(self.escrow.transact({'from': self.ursula}).confirmActivity())
+        self._send(self.escrow.transact({'from': self.ursula2}).confirmActivity())
+        self.blockchain.wait_time(1)
+
+        self.estimate('MinersEscrow.findCumSum', lambda: self.escrow.estimateGas().findCumSum(0, 1, 1))
+        self.estimate('MinersEscrow.findConfirmedCumSum', lambda: self.escrow.estimateGas().findConfirmedCumSum(1, 1))
+
+    def _policy_id(self) -> bytes:
+        self._policies += 1
+        return self._policies.to_bytes(20, byteorder='big')
+
+    def _create_policy(self, nodes: List[str], record: bool=True) -> bytes:
+        policy_id = self._policy_id()
+        payload = {'from': self.alice, 'value': POLICY_RATE * POLICY_PERIODS * len(nodes)}
+
+        def send():
+            return self.policy_manager.transact(payload).createPolicy(policy_id, POLICY_PERIODS, nodes)
+        if record:
+            self.transact('PolicyManager.createPolicy', send, nodes=len(nodes))
+        else:
+            self._send(send())
+        return policy_id
+
+    def _create_policies(self, nodes: List[str]) -> None:
+        policies = [(self._policy_id(), POLICY_PERIODS, nodes, POLICY_RATE * POLICY_PERIODS * len(nodes))
+                    for _ in range(BATCH_POLICIES)]
+        payload = {'from': self.alice, 'value': sum(value for *_policy, value in policies)}
+
+        def send():
+            return self.policy_manager.transact(payload).createPolicies(*PolicyAgent._creation_args(policies))
+        self.transact('PolicyManager.createPolicies', send, nodes=len(nodes), policies=BATCH_POLICIES)
+
+    def measure_policies(self) -> None:
+        for number_of_nodes in NODE_SCALES:
+            # The deposited miner is the first node, so that there is a reward to withdraw
+            nodes = [self.ursula] + self.owners[:number_of_nodes - 1]
+            if len(nodes) < number_of_nodes:
+                continue
+
+            policy_id = self._create_policy(nodes)
+            self.transact('PolicyManager.revokePolicy',
+                          lambda: self.policy_manager.transact({'from': self.alice}).revokePolicy(policy_id),
+                          nodes=number_of_nodes)
+
+            self._create_policies(nodes)
+
+            policy_id = self._create_policy(nodes, record=False)
+            self.blockchain.wait_time(2)
+            self.transact('PolicyManager.refund',
+                          lambda: self.policy_manager.transact({'from': self.alice}).refund(policy_id),
+                          nodes=number_of_nodes)
+
+        self._send(self.escrow.transact({'from': self.ursula}).confirmActivity())
+        self.blockchain.wait_time(1)
+        self._send(self.escrow.transact({'from': self.ursula}).mint())
+        self.transact('PolicyManager.withdraw', lambda: self.policy_manager.transact({'from': self.ursula}).withdraw())
+
+    def measure_node_costs(self) -> None:
+        """The gas each additional node of a policy costs, between the smallest and the largest measured policy"""
+
+        for name in ('PolicyManager.createPolicy', 'PolicyManager.revokePolicy', 'PolicyManager.refund'):
+            measured = [(nodes, self.results.get(self._key(name, nodes=nodes))) for nodes in NODE_SCALES]
+            measured = [(nodes, gas) for nodes, gas in measured if gas is not None]
+            if len(measured) < 2:
+                continue
+            (first_nodes, first_gas), (last_nodes, last_gas) = measured[0], measured[-1]
+            self.results[self._key(name + '.perNode')] = (last_gas - first_gas) // (last_nodes - first_nodes)
+
+    def run(self) -> Dict[str, int]:
+        self.deploy()
+        self.populate()
+        self.measure_staking()
+        self.measure_sampling()
+        self.measure_policies()
+        self.measure_node_costs()
+        return self.results
+
+
+def compare(results: Dict[str, int], baseline: Dict[str, int], tolerance: float) -> bool:
+    """Print the changes against the baseline; Returns False if any entry point got more expensive"""
+
+    passed = True
+    for name in sorted(set(results) | set(baseline)):
+        old, new = baseline.get(name), results.get(name)
+        if old == new:
+            continue
+        if old is None or new is None:
+            print('{}: {} -> {}'.format(name, old, new))
+            passed = passed and new is not None
+            continue
+        change = (new - old) / old
+        print('{}: {} -> {} ({:+.1%})'.format(name, old, new, change))
+        if change > tolerance:
+            passed = False
+    return passed
 
 
 def main():
-    testerchain = TesterBlockchain()
-    chain, web3 = testerchain._chain, testerchain._chain.web3
-    creator, ursula1, ursula2, ursula3, alice1, *everyone_else = web3.eth.accounts
-
-    print("Web3 providers are", web3.providers)
-
-    # TODO: Updatae to agents and deployers
-    # Create an ERC20 token
-    token = NuCypherKMSToken(blockchain=testerchain)
-    token.arm()
-    token.deploy()
-
-    # Creator deploys the escrow
-    escrow = Escrow(blockchain=testerchain, token=token)
-    escrow.arm()
-    escrow.deploy()
-
-    # Creator deploys the policy manager
-    policy_manager, txhash = chain.provider.get_or_deploy_contract(
-        'PolicyManager', deploy_args=[escrow.contract.address],
-        deploy_transaction={'from': creator})
-    tx = escrow.transact({'from': creator}).setPolicyManager(policy_manager.address)
-    chain.wait.for_receipt(tx)
-
-    print("Estimate gas:")
-    # Pre deposit tokens
-    tx = token.transact({'from': creator}).approve(escrow.contract.address, 10 ** 7)
-    chain.wait.for_receipt(tx)
-    print("Pre-deposit tokens for 5 owners = " +
-          str(escrow.contract.estimateGas({'from': creator}).preDeposit(
-              web3.eth.accounts[4:9], [10 ** 6] * 5, [1] * 5)))
-
-    # Give Ursula and Alice some coins
-    print("Transfer tokens = " + str(token.contract.estimateGas({'from': creator}).transfer(ursula1, 10 ** 7)))
-    tx = token.transact({'from': creator}).transfer(ursula1, 10 ** 7)
-    chain.wait.for_receipt(tx)
-    tx = token.transact({'from': creator}).transfer(ursula2, 10 ** 7)
-    chain.wait.for_receipt(tx)
-    tx = token.transact({'from': creator}).transfer(ursula3, 10 ** 7)
-    chain.wait.for_receipt(tx)
-
-    # Ursula and Alice give Escrow rights to transfer
-    print("Approving transfer = " +
-          str(token.contract.estimateGas({'from': ursula1}).approve(escrow.contract.address, 5 * 10 ** 6 + 1)))
-    tx = token.transact({'from': ursula1}).approve(escrow.contract.address, 5 * 10 ** 6 + 1)
-    chain.wait.for_receipt(tx)
-    tx = token.transact({'from': ursula2}).approve(escrow.contract.address, 2 * 10 ** 6 + 1)
-    chain.wait.for_receipt(tx)
-    tx = token.transact({'from': ursula3}).approve(escrow.contract.address, 2 * 10 ** 6 + 1)
-    chain.wait.for_receipt(tx)
-
-    # Ursula and Alice transfer some tokens to the escrow and lock them
-    print("First deposit tokens = " + str(escrow.contract.estimateGas({'from': ursula1}).deposit(5 * 10 ** 6, 1)))
-    tx = escrow.transact({'from': ursula1}).deposit(5 * 10 ** 6, 1)
-    chain.wait.for_receipt(tx)
-    print("Second deposit tokens = " + str(escrow.contract.estimateGas({'from': ursula2}).deposit(2 * 10 ** 6, 1)))
-    tx = escrow.transact({'from': ursula2}).deposit(2 * 10 ** 6, 1)
-    chain.wait.for_receipt(tx)
-    print("Third deposit tokens = " + str(escrow.contract.estimateGas({'from': ursula3}).deposit(2 * 10 ** 6, 1)))
-    tx = escrow.transact({'from': ursula3}).deposit(2 * 10 ** 6, 1)
-    chain.wait.for_receipt(tx)
-
-    # Wait 1 period and confirm activity
-    testerchain.wait_time(1)
-    print("First confirm activity = " + str(escrow.contract.estimateGas({'from': ursula1}).confirmActivity()))
-    tx = escrow.transact({'from': ursula1}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    print("Second confirm activity = " + str(escrow.contract.estimateGas({'from': ursula2}).confirmActivity()))
-    tx = escrow.transact({'from': ursula2}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    print("Third confirm activity = " + str(escrow.contract.estimateGas({'from': ursula3}).confirmActivity()))
-    tx = escrow.transact({'from': ursula3}).confirmActivity()
-    chain.wait.for_receipt(tx)
-
-    # Wait 1 period and mint tokens
-    testerchain.wait_time(1)
-    print("First mining = " + str(escrow.contract.estimateGas({'from': ursula1}).mint()))
-    tx = escrow.transact({'from': ursula1}).mint()
-    chain.wait.for_receipt(tx)
-    print("Second mining = " + str(escrow.contract.estimateGas({'from': ursula2}).mint()))
-    tx = escrow.transact({'from': ursula2}).mint()
-    chain.wait.for_receipt(tx)
-    print("Third/last mining = " + str(escrow.contract.estimateGas({'from': ursula3}).mint()))
-    tx = escrow.transact({'from': ursula3}).mint()
-    chain.wait.for_receipt(tx)
-
-    # Confirm again
-    print("First confirm activity again = " + str(escrow.contract.estimateGas({'from': ursula1}).confirmActivity()))
-    tx = escrow.transact({'from': ursula1}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    print("Second confirm activity again = " + str(escrow.contract.estimateGas({'from': ursula2}).confirmActivity()))
-    tx = escrow.transact({'from': ursula2}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    print("Third confirm activity again = " + str(escrow.contract.estimateGas({'from': ursula3}).confirmActivity()))
-    tx = escrow.transact({'from': ursula3}).confirmActivity()
-    chain.wait.for_receipt(tx)
-
-    # Get locked tokens
-    print("Getting locked tokens = " + str(escrow.contract.estimateGas().getLockedTokens(ursula1)))
-    print("Calculating locked tokens = " + str(escrow.contract.estimateGas().calculateLockedTokens(ursula1, 1)))
-
-    # Switch to unlock and lock tokens again
-    print("First switch = " + str(escrow.contract.estimateGas({'from': ursula1}).switchLock()))
-    tx = escrow.transact({'from': ursula1}).switchLock()
-    chain.wait.for_receipt(tx)
-    print("Second switch = " + str(escrow.contract.estimateGas({'from': ursula2}).switchLock()))
-    tx = escrow.transact({'from': ursula2}).switchLock()
-    chain.wait.for_receipt(tx)
-    print("Third switch = " + str(escrow.contract.estimateGas({'from': ursula3}).switchLock()))
-    tx = escrow.transact({'from': ursula3}).switchLock()
-    chain.wait.for_receipt(tx)
-    #
-    testerchain.wait_time(1)
-    print("First locking tokens = " + str(escrow.contract.estimateGas({'from': ursula1}).lock(10 ** 6, 0)))
-    tx = escrow.transact({'from': ursula1}).lock(10 ** 6, 0)
-    chain.wait.for_receipt(tx)
-    print("Second locking tokens = " + str(escrow.contract.estimateGas({'from': ursula2}).lock(10 ** 6, 0)))
-    tx = escrow.transact({'from': ursula2}).lock(10 ** 6, 0)
-    chain.wait.for_receipt(tx)
-    print("Third locking tokens = " + str(escrow.contract.estimateGas({'from': ursula3}).lock(10 ** 6, 0)))
-    tx = escrow.transact({'from': ursula3}).lock(10 ** 6, 0)
-    chain.wait.for_receipt(tx)
-
-    # Wait 1 period and withdraw tokens
-    testerchain.wait_time(1)
-    print("First withdraw = " + str(escrow.contract.estimateGas({'from': ursula1}).withdraw(1)))
-    tx = escrow.transact({'from': ursula1}).withdraw(1)
-    chain.wait.for_receipt(tx)
-    print("Second withdraw = " + str(escrow.contract.estimateGas({'from': ursula2}).withdraw(1)))
-    tx = escrow.transact({'from': ursula2}).withdraw(1)
-    chain.wait.for_receipt(tx)
-    print("Third withdraw = " + str(escrow.contract.estimateGas({'from': ursula3}).withdraw(1)))
-    tx = escrow.transact({'from': ursula3}).withdraw(1)
-    chain.wait.for_receipt(tx)
-
-    # Wait 1 period and confirm activity
-    testerchain.wait_time(1)
-    print("First confirm activity after downtime = " + str(escrow.contract.estimateGas({'from': ursula1}).confirmActivity()))
-    tx = escrow.transact({'from': ursula1}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    print("Second confirm activity after downtime  = " + str(escrow.contract.estimateGas({'from': ursula2}).confirmActivity()))
-    tx = escrow.transact({'from': ursula2}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    print("Third confirm activity after downtime  = " + str(escrow.contract.estimateGas({'from': ursula3}).confirmActivity()))
-    tx = escrow.transact({'from': ursula3}).confirmActivity()
-    chain.wait.for_receipt(tx)
-
-    # Ursula and Alice deposit some tokens to the escrow again
-    print("First deposit tokens again = " + str(escrow.contract.estimateGas({'from': ursula1}).deposit(1, 1)))
-    tx = escrow.transact({'from': ursula1}).deposit(1, 1)
-    chain.wait.for_receipt(tx)
-    print("Second deposit tokens again = " + str(escrow.contract.estimateGas({'from': ursula2}).deposit(1, 1)))
-    tx = escrow.transact({'from': ursula2}).deposit(1, 1)
-    chain.wait.for_receipt(tx)
-    print("Third deposit tokens again = " + str(escrow.contract.estimateGas({'from': ursula3}).deposit(1, 1)))
-    tx = escrow.transact({'from': ursula3}).deposit(1, 1)
-    chain.wait.for_receipt(tx)
-
-    # Wait 1 period and mint tokens
-    testerchain.wait_time(1)
-    print("First mining again = " + str(escrow.contract.estimateGas({'from': ursula1}).mint()))
-    tx = escrow.transact({'from': ursula1}).mint()
-    chain.wait.for_receipt(tx)
-    print("Second mining again = " + str(escrow.contract.estimateGas({'from': ursula2}).mint()))
-    tx = escrow.transact({'from': ursula2}).mint()
-    chain.wait.for_receipt(tx)
-    print("Third/last mining again = " + str(escrow.contract.estimateGas({'from': ursula3}).mint()))
-    tx = escrow.transact({'from': ursula3}).mint()
-    chain.wait.for_receipt(tx)
-
-    # Create policy
-    policy_id_1 = os.urandom(20)
-    policy_id_2 = os.urandom(20)
-    number_of_periods = 10
-    print("First creating policy (1 node, 10 periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 10000})
-              .createPolicy(policy_id_1, number_of_periods, [ursula1])))
-    tx = policy_manager.transact({'from': alice1, 'value': 10000})\
-        .createPolicy(policy_id_1, number_of_periods, [ursula1])
-    chain.wait.for_receipt(tx)
-    print("Second creating policy (1 node, 10 periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 10000})
-              .createPolicy(policy_id_2, number_of_periods, [ursula1])))
-    tx = policy_manager.transact({'from': alice1, 'value': 10000}) \
-        .createPolicy(policy_id_2, number_of_periods, [ursula1])
-    chain.wait.for_receipt(tx)
-
-    # Revoke policy
-    print("Revoking policy = " +
-          str(policy_manager.estimateGas({'from': alice1}).revokePolicy(policy_id_1)))
-    tx = policy_manager.transact({'from': alice1}).revokePolicy(policy_id_1)
-    chain.wait.for_receipt(tx)
-    tx = policy_manager.transact({'from': alice1}).revokePolicy(policy_id_2)
-    chain.wait.for_receipt(tx)
-
-    # Create policy with more periods
-    policy_id_1 = os.urandom(20)
-    policy_id_2 = os.urandom(20)
-    policy_id_3 = os.urandom(20)
-    number_of_periods = 100
-    print("First creating policy (1 node, " + str(number_of_periods) + " periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 10000})
-              .createPolicy(policy_id_1, number_of_periods, [ursula2])))
-    tx = policy_manager.transact({'from': alice1, 'value': 10000})\
-        .createPolicy(policy_id_1, number_of_periods, [ursula2])
-    chain.wait.for_receipt(tx)
-    testerchain.wait_time(1)
-    print("Second creating policy (1 node, " + str(number_of_periods) + " periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 10000})
-              .createPolicy(policy_id_2, number_of_periods, [ursula2])))
-    tx = policy_manager.transact({'from': alice1, 'value': 10000}) \
-        .createPolicy(policy_id_2, number_of_periods, [ursula2])
-    chain.wait.for_receipt(tx)
-    print("Third creating policy (1 node, " + str(number_of_periods) + " periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 10000})
-              .createPolicy(policy_id_3, number_of_periods, [ursula1])))
-    tx = policy_manager.transact({'from': alice1, 'value': 10000}) \
-        .createPolicy(policy_id_3, number_of_periods, [ursula1])
-    chain.wait.for_receipt(tx)
-
-    # Mine and revoke policy
-    testerchain.wait_time(10)
-    tx = escrow.transact({'from': ursula2}).confirmActivity()
-    chain.wait.for_receipt(tx)
-    tx = escrow.transact({'from': ursula1}).confirmActivity()
-    chain.wait.for_receipt(tx)
-
-    testerchain.wait_time(1)
-    print("First mining after downtime = " + str(escrow.contract.estimateGas({'from': ursula1}).mint()))
-    tx = escrow.transact({'from': ursula1}).mint()
-    chain.wait.for_receipt(tx)
-    print("Second mining after downtime = " + str(escrow.contract.estimateGas({'from': ursula2}).mint()))
-    tx = escrow.transact({'from': ursula2}).mint()
-    chain.wait.for_receipt(tx)
-
-    testerchain.wait_time(10)
-    print("First revoking policy after downtime = " +
-          str(policy_manager.estimateGas({'from': alice1}).revokePolicy(policy_id_1)))
-    tx = policy_manager.transact({'from': alice1}).revokePolicy(policy_id_1)
-    chain.wait.for_receipt(tx)
-    print("Second revoking policy after downtime = " +
-          str(policy_manager.estimateGas({'from': alice1}).revokePolicy(policy_id_2)))
-    tx = policy_manager.transact({'from': alice1}).revokePolicy(policy_id_2)
-    chain.wait.for_receipt(tx)
-    print("Second revoking policy after downtime = " +
-          str(policy_manager.estimateGas({'from': alice1}).revokePolicy(policy_id_3)))
-    tx = policy_manager.transact({'from': alice1}).revokePolicy(policy_id_3)
-    chain.wait.for_receipt(tx)
-
-    # Create policy with multiple nodes
-    policy_id_1 = os.urandom(20)
-    policy_id_2 = os.urandom(20)
-    policy_id_3 = os.urandom(20)
-    number_of_periods = 100
-    print("First creating policy (3 nodes, 100 periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 30000})
-              .createPolicy(policy_id_1, number_of_periods, [ursula1, ursula2, ursula3])))
-    tx = policy_manager.transact({'from': alice1, 'value': 30000}) \
-        .createPolicy(policy_id_1, number_of_periods, [ursula1, ursula2, ursula3])
-    chain.wait.for_receipt(tx)
-    print("Second creating policy (3 nodes, 100 periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 10000})
-              .createPolicy(policy_id_2, number_of_periods, [ursula1, ursula2, ursula3])))
-    tx = policy_manager.transact({'from': alice1, 'value': 10000}) \
-        .createPolicy(policy_id_2, number_of_periods, [ursula1, ursula2, ursula3])
-    chain.wait.for_receipt(tx)
-    print("Third creating policy (2 nodes, 100 periods) = " +
-          str(policy_manager.estimateGas({'from': alice1, 'value': 20000})
-              .createPolicy(policy_id_3, number_of_periods, [ursula1, ursula2])))
-    tx = policy_manager.transact({'from': alice1, 'value': 20000}) \
-        .createPolicy(policy_id_3, number_of_periods, [ursula1, ursula2])
-    chain.wait.for_receipt(tx)
-
-    print("All done!")
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--miners', type=int, nargs='+', default=MINER_SCALES)
+    parser.add_argument('--output', default='gas.json')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.01, help='Allowed relative gas increase')
+    args = parser.parse_args()
+
+    results = OrderedDict()
+    for miners in args.miners:
+        benchmark = GasBenchmark(miners=miners)
+        try:
+            results.update(benchmark.run())
+        finally:
+            benchmark.close()
+        print('Measured {}'.format(benchmark))
+
+    with open(args.output, 'w') as file:
+        json.dump({'created': datetime.utcnow().isoformat(), 'results': results}, file, indent=2)
+    print('Results are written to {}'.format(os.path.abspath(args.output)))
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        if not compare(results, baseline, tolerance=args.tolerance):
+            sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
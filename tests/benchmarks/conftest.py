@@ -0,0 +1,74 @@
+import os
+from collections import Counter
+
+import pytest
+
+from nkms_eth.actors import Miner
+from nkms_eth.utilities import MockNuCypherMinerConfig
+
+
+# Comma separated numbers of pre-deposited miners to benchmark with, e.g. NKMS_BENCHMARK_MINERS=10,100,1000
+BENCHMARK_MINERS = [int(n) for n in os.environ.get('NKMS_BENCHMARK_MINERS', '10,100').split(',')]
+
+PRE_DEPOSIT_CHUNK = 20    # Owners in each preDeposit transaction
+
+
+@pytest.fixture(scope='session')
+def rpc_stats(testerchain):
+    return testerchain.rpc_stats
+
+
+@pytest.fixture(params=BENCHMARK_MINERS, ids=lambda miners: 'miners={}'.format(miners))
+def populated_escrow(request, testerchain, mock_token_deployer, mock_miner_agent):
+    """
+    Stake from every tester account, so that there are miners to sample,
+    and pre-deposit the benchmarked number of miners at generated addresses.
+    """
+
+    web3 = testerchain._chain.web3
+    mock_token_deployer._global_airdrop(amount=10000 * mock_token_deployer._M)
+
+    origin, *addresses = web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=100)
+
+    value = 10 ** 6    # MinersEscrow.minAllowableLockedTokens
+    owners = [web3.toChecksumAddress('0x{:040x}'.format(index + 1)) for index in range(request.param)]
+    txhash = mock_token_deployer._contract.transact({'from': origin}).approve(mock_miner_agent.contract_address,
+                                                                             value * len(owners))
+    testerchain.wait_for_receipt(txhash)
+    for start in range(0, len(owners), PRE_DEPOSIT_CHUNK):
+        chunk = owners[start:start+PRE_DEPOSIT_CHUNK]
+        txhash = mock_miner_agent.transact({'from': origin}).preDeposit(chunk, [value] * len(chunk), [100] * len(chunk))
+        testerchain.wait_for_receipt(txhash)
+
+    testerchain.wait_time(MockNuCypherMinerConfig._hours_per_period)
+    yield miners
+
+
+@pytest.fixture()
+def measure(benchmark, rpc_stats):
+    """
+    Benchmark a function and attach the RPC usage of its last round to the results;
+    They are written by --benchmark-json along with the timings.
+    """
+
+    def run(function, *args, rounds: int=3, **kwargs):
+        result = benchmark.pedantic(function, args=args, kwargs=kwargs, setup=rpc_stats.reset, rounds=rounds)
+
+        calls_by_method = Counter()
+        for (_tag, method), stats in rpc_stats.stats().items():
+            calls_by_method[method] += stats['calls']
+        totals = rpc_stats.totals().values()
+        benchmark.extra_info.update({'rpc_calls': sum(calls_by_method.values()),
+                                     'rpc_calls_by_method': dict(calls_by_method),
+                                     'bytes_sent': sum(total['bytes_sent'] for total in totals),
+                                     'bytes_received': sum(total['bytes_received'] for total in totals)})
+        return result
+
+    return run
+
+
+@pytest.fixture()
+def miner(populated_escrow) -> Miner:
+    first_miner, *_others = populated_escrow
+    return first_miner
@@ -0,0 +1,49 @@
+import os
+
+
+def test_swarm(measure, mock_miner_agent, populated_escrow):
+    addresses = measure(lambda: list(mock_miner_agent.swarm()))
+    assert len(addresses) >= len(populated_escrow)
+
+
+def test_sample(measure, mock_miner_agent, populated_escrow):
+
+    def sample():
+        mock_miner_agent.state_cache.clear()    # Measure the cold path, with a full snapshot
+        return mock_miner_agent.sample(quantity=3, duration=10)
+
+    miners = measure(sample)
+    assert len(set(miners)) == 3
+
+
+def test_sample_cached(measure, mock_miner_agent, populated_escrow):
+    mock_miner_agent.sample(quantity=3, duration=10)
+
+    miners = measure(mock_miner_agent.sample, quantity=3, duration=10)
+    assert len(set(miners)) == 3
+
+
+def test_sample_by_confirmed_stake(measure, mock_miner_agent, populated_escrow):
+    miners = measure(mock_miner_agent.sample, quantity=3, duration=10, by_confirmed_stake=True)
+    assert len(set(miners)) == 3
+
+
+def test_fetch_data(measure, miner):
+    for _ in range(10):
+        miner.publish_data(os.urandom(32))
+
+    miner_ids = measure(miner.fetch_data)
+    assert len(miner_ids) == 10
+
+
+def test_fetch_arrangement_data(measure, testerchain, mock_policy_agent, miner):
+    _origin, *_miners, alice = testerchain._chain.web3.eth.accounts
+    policy_id = os.urandom(20)
+    txhash = mock_policy_agent.transact({'from': alice, 'value': 1000}).createPolicy(policy_id, 10, [miner.address])
+    testerchain.wait_for_receipt(txhash)
+
+    client, rate, start_period, last_period, disabled = measure(mock_policy_agent.fetch_arrangement_data, policy_id)
+    assert client == alice
+    assert rate == 100
+    assert last_period - start_period == 9
+    assert disabled is False
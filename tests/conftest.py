@@ -1,21 +1,15 @@
 import pytest
-from web3 import Web3
-from web3.providers.eth_tester import EthereumTesterProvider
 
 from nkms_eth.agents import NuCypherKMSTokenAgent, MinerAgent, PolicyAgent
 from nkms_eth.blockchain import TheBlockchain
 from nkms_eth.config import EthereumConfig
 from nkms_eth.deployers import PolicyManagerDeployer
 from nkms_eth.utilities import TesterBlockchain, MockNuCypherKMSTokenDeployer, MockMinerEscrowDeployer, MockMinerAgent
-from eth_tester import EthereumTester
 
 
 @pytest.fixture(scope='session')
 def testerchain():
-    tester = EthereumTester()
-    test_provider = EthereumTesterProvider(ethereum_tester=tester)
-    web3_provider = Web3(providers=test_provider)
-    ethconfig = EthereumConfig(provider=web3_provider)
+    ethconfig = EthereumConfig()
     testerchain = TesterBlockchain(eth_config=ethconfig)
     yield testerchain
 
@@ -40,8 +34,8 @@ def mock_miner_escrow_deployer(token_agent):
 
 
 @pytest.fixture()
-def mock_policy_manager_deployer(mock_token_deployer):
-    policy_manager_deployer = PolicyManagerDeployer(token_deployer=mock_token_deployer)
+def mock_policy_manager_deployer(mock_miner_escrow_deployer):
+    policy_manager_deployer = PolicyManagerDeployer(miner_escrow_deployer=mock_miner_escrow_deployer)
     policy_manager_deployer.arm()
     policy_manager_deployer.deploy()
     yield policy_manager_deployer
@@ -64,6 +58,7 @@ def mock_miner_agent(token_agent, mock_token_deployer, mock_miner_escrow_deploye
 
 
 @pytest.fixture()
-def mock_policy_agent(mock_miner_agent, token_agent, mock_token_deployer, mock_miner_escrow_deployer):
+def mock_policy_agent(mock_miner_agent, token_agent, mock_token_deployer, mock_miner_escrow_deployer,
+                      mock_policy_manager_deployer):
     policy_agent = PolicyAgent(miner_agent=mock_miner_agent)
     yield policy_agent
@@ -1,14 +1,15 @@
-pragma solidity ^0.4.18;
+pragma solidity ^0.4.19;
 
 
 import "contracts/PolicyManager.sol";
 import "contracts/MinersEscrow.sol";
+import "contracts/NodesInfo.sol";
 
 
 /**
 * @notice Contract for using in PolicyManager tests
 **/
-contract MinersEscrowForPolicyMock {
+contract MinersEscrowForPolicyMock is NodesInfo {
 
     struct Downtime {
         uint256 startPeriod;
@@ -20,6 +21,7 @@ contract MinersEscrowForPolicyMock {
     mapping(address => bool) public nodes;
     uint256 public lastActivePeriod;
     Downtime[] public downtime;
+    uint256[] public downtimeCumSum;
 
     /**
     * @param _nodes Addresses of nodes that allow to use policy manager
@@ -62,7 +64,44 @@ contract MinersEscrowForPolicyMock {
     * @notice Add downtime period
     **/
     function pushDowntimePeriod(uint256 _startPeriod, uint256 _endPeriod) external {
+        uint256 cumSum = downtime.length > 0 ? downtimeCumSum[downtime.length - 1] : 0;
         downtime.push(Downtime(_startPeriod, _endPeriod));
+        downtimeCumSum.push(cumSum + _endPeriod - _startPeriod + 1);
+    }
+
+    /**
+    * @notice Emulate getDowntimePeriods method
+    **/
+    function getDowntimePeriods(address, uint256 _startIndex, uint256 _minPeriod, uint256 _maxPeriod)
+        public view returns (uint256 downtimePeriods, uint256 stopIndex)
+    {
+        uint256 startPeriod;
+        uint256 firstIndex = findDowntime(_startIndex, _minPeriod);
+        stopIndex = findDowntime(firstIndex, _minPeriod > _maxPeriod ? _minPeriod : _maxPeriod);
+        if (firstIndex < stopIndex) {
+            startPeriod = downtime[firstIndex].startPeriod;
+            downtimePeriods = downtimeCumSum[stopIndex - 1] -
+                (firstIndex > 0 ? downtimeCumSum[firstIndex - 1] : 0) -
+                (_minPeriod > startPeriod ? _minPeriod - startPeriod : 0);
+        }
+        if (_minPeriod <= _maxPeriod && stopIndex < downtime.length &&
+            downtime[stopIndex].startPeriod <= _maxPeriod) {
+            startPeriod = downtime[stopIndex].startPeriod;
+            downtimePeriods += _maxPeriod - (_minPeriod > startPeriod ? _minPeriod : startPeriod) + 1;
+        }
+    }
+
+    function findDowntime(uint256 _startIndex, uint256 _period) internal view returns (uint256 low) {
+        low = _startIndex;
+        uint256 high = downtime.length;
+        while (low < high) {
+            uint256 middle = (low + high) / 2;
+            if (downtime[middle].endPeriod < _period) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
     }
 
     /**
@@ -83,6 +122,21 @@ contract MinersEscrowForPolicyMock {
         policyManager = _policyManager;
     }
 
+    /**
+    * @notice Emulate getNodesInfo method
+    **/
+    function getNodesInfo(address[] _nodes)
+        public view returns (uint256[NODES_INFO_SIZE] result)
+    {
+        require(_nodes.length <= NODES_INFO_BATCH);
+        for (uint256 i = 0; i < _nodes.length; i++) {
+            uint256 position = i * NODE_INFO_FIELDS;
+            result[position + LOCKED_TOKENS_FIELD] = getLockedTokens(_nodes[i]);
+            result[position + DOWNTIME_LENGTH_FIELD] = downtime.length;
+            result[position + LAST_ACTIVE_PERIOD_FIELD] = lastActivePeriod;
+        }
+    }
+
     function getMinerInfo(MinersEscrow.MinerInfoField _field, address, uint256 _index)
         public view returns (bytes32)
     {
@@ -0,0 +1,41 @@
+pragma solidity ^0.4.19;
+
+
+import "contracts/MinersEscrow.sol";
+import "contracts/NuCypherKMSToken.sol";
+
+
+/**
+* @notice Contract for using in MinersEscrow tests,
+* adds downtime without the total number of downtime periods like the version before it was introduced
+**/
+contract MinersEscrowLegacyDowntimeMock is MinersEscrow {
+
+    function MinersEscrowLegacyDowntimeMock(
+        NuCypherKMSToken _token,
+        uint256 _hoursPerPeriod,
+        uint256 _miningCoefficient,
+        uint256 _lockedPeriodsCoefficient,
+        uint256 _awardedPeriods,
+        uint256 _minReleasePeriods,
+        uint256 _minAllowableLockedTokens,
+        uint256 _maxAllowableLockedTokens
+    )
+        public
+        MinersEscrow(
+            _token,
+            _hoursPerPeriod,
+            _miningCoefficient,
+            _lockedPeriodsCoefficient,
+            _awardedPeriods,
+            _minReleasePeriods,
+            _minAllowableLockedTokens,
+            _maxAllowableLockedTokens
+        )
+    {
+    }
+
+    function addDowntime(MinerInfo storage _info, uint256 _startPeriod, uint256 _endPeriod) internal {
+        _info.downtime.push(Downtime(_startPeriod, _endPeriod));
+    }
+}
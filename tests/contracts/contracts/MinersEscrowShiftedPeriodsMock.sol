@@ -0,0 +1,59 @@
+pragma solidity ^0.4.19;
+
+
+import "contracts/MinersEscrow.sol";
+import "contracts/NuCypherKMSToken.sol";
+
+
+/**
+* @notice Contract for using in MinersEscrow tests,
+* keeps confirmed periods at the beginning of the array and moves them after each mint
+* like the version before slots of dropped periods were reused
+**/
+contract MinersEscrowShiftedPeriodsMock is MinersEscrow {
+
+    function MinersEscrowShiftedPeriodsMock(
+        NuCypherKMSToken _token,
+        uint256 _hoursPerPeriod,
+        uint256 _miningCoefficient,
+        uint256 _lockedPeriodsCoefficient,
+        uint256 _awardedPeriods,
+        uint256 _minReleasePeriods,
+        uint256 _minAllowableLockedTokens,
+        uint256 _maxAllowableLockedTokens
+    )
+        public
+        MinersEscrow(
+            _token,
+            _hoursPerPeriod,
+            _miningCoefficient,
+            _lockedPeriodsCoefficient,
+            _awardedPeriods,
+            _minReleasePeriods,
+            _minAllowableLockedTokens,
+            _maxAllowableLockedTokens
+        )
+    {
+    }
+
+    function getConfirmedPeriodsLength(MinerInfo storage _info) internal view returns (uint256) {
+        return _info.confirmedPeriods.length;
+    }
+
+    function getConfirmedPeriod(MinerInfo storage _info, uint256 _index)
+        internal view returns (ConfirmedPeriodInfo storage)
+    {
+        return _info.confirmedPeriods[_index];
+    }
+
+    function dropConfirmedPeriods(MinerInfo storage _info, uint256 _number) internal {
+        for (uint256 i = 0; i < _info.confirmedPeriods.length - _number; i++) {
+            _info.confirmedPeriods[i] = _info.confirmedPeriods[_number + i];
+        }
+        _info.confirmedPeriods.length -= _number;
+    }
+
+    function pushConfirmedPeriod(MinerInfo storage _info, uint256 _period, uint256 _lockedValue) internal {
+        _info.confirmedPeriods.push(ConfirmedPeriodInfo(_period, _lockedValue));
+    }
+}
@@ -0,0 +1,33 @@
+import pytest
+from ethereum.tester import TransactionFailed
+
+
+def test_batch_transfer(web3, chain):
+    creator = web3.eth.accounts[0]
+    recipients = web3.eth.accounts[1:]
+    values = [100 * (i + 1) for i in range(len(recipients))]
+
+    token, _ = chain.provider.get_or_deploy_contract(
+        'NuCypherKMSToken', deploy_args=[10 ** 9],
+        deploy_transaction={'from': creator})
+    batch_transfer, _ = chain.provider.deploy_contract('BatchTransfer')
+
+    # Can't transfer without approval
+    with pytest.raises(TransactionFailed):
+        tx = batch_transfer.transact({'from': creator}).batchTransfer(token.address, recipients, values)
+        chain.wait.for_receipt(tx)
+
+    tx = token.transact({'from': creator}).approve(batch_transfer.address, sum(values))
+    chain.wait.for_receipt(tx)
+
+    # Lengths must match
+    with pytest.raises(TransactionFailed):
+        tx = batch_transfer.transact({'from': creator}).batchTransfer(token.address, recipients, values[:-1])
+        chain.wait.for_receipt(tx)
+
+    tx = batch_transfer.transact({'from': creator}).batchTransfer(token.address, recipients, values)
+    chain.wait.for_receipt(tx)
+    for recipient, value in zip(recipients, values):
+        assert token.call().balanceOf(recipient) == value
+    assert token.call().balanceOf(creator) == 10 ** 9 - sum(values)
+    assert token.call().allowance(creator, batch_transfer.address) == 0
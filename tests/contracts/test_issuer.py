@@ -2,6 +2,8 @@ import pytest
 from ethereum.tester import TransactionFailed
 from web3.contract import Contract
 
+from nkms_eth.simulation import IssuanceSimulation
+
 
 @pytest.fixture()
 def token(web3, chain):
@@ -104,6 +106,48 @@ def test_inflation_rate(web3, chain, token):
     assert 2 * one_period + 3 * minted_amount > token.call().balanceOf(ursula)
 
 
+def test_issuance_simulation(web3, chain, token):
+    creator = web3.eth.accounts[0]
+    ursulas = web3.eth.accounts[1:3]
+
+    issuer, _ = chain.provider.get_or_deploy_contract(
+        'IssuerMock', deploy_args=[token.address, 1, 2 * 10 ** 19, 1, 5],
+        deploy_transaction={'from': creator})
+    tx = token.transact({'from': creator}).transfer(issuer.address, 2 * 10 ** 40 - 10 ** 30)
+    chain.wait.for_receipt(tx)
+    tx = issuer.transact().initialize()
+    chain.wait.for_receipt(tx)
+
+    # The first Ursula releases 100 tokens per period, the second one keeps her tokens locked
+    locked_values, release_rates, release = [1000, 3000], [100, 1], [True, False]
+    simulation = IssuanceSimulation(future_supply=2 * 10 ** 40,
+                                    current_supply=10 ** 30,
+                                    locked_values=locked_values,
+                                    release_rates=release_rates,
+                                    release=release,
+                                    mining_coefficient=2 * 10 ** 19,
+                                    locked_periods_coefficient=1,
+                                    awarded_periods=5)
+    projection = simulation.run(periods=3)
+
+    # Mint the same periods on-chain, one Ursula after the other
+    period = issuer.call().getCurrentPeriod()
+    for offset in range(3):
+        next_locked_values = [max(1000 - 100 * (offset + 1), 0), 3000]
+        minted_values = zip(ursulas, locked_values, next_locked_values, release_rates)
+        for ursula, locked_value, next_locked_value, rate in minted_values:
+            all_locked_periods = -(-next_locked_value // rate)
+            tx = issuer.transact({'from': ursula}).testMint(
+                period + 1 + offset, locked_value, sum(locked_values), all_locked_periods, 0)
+            chain.wait.for_receipt(tx)
+        locked_values = next_locked_values
+
+    balances = [token.call().balanceOf(ursula) for ursula in ursulas]
+    assert balances == list(projection.rewards)
+    assert 10 ** 30 + sum(balances) == projection.supply[-1]
+    assert sum(balances) == sum(projection.minted)
+
+
 def test_verifying_state(web3, chain, token):
     creator = web3.eth.accounts[0]
 
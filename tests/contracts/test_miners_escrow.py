@@ -1,8 +1,11 @@
 import pytest
 from ethereum.tester import TransactionFailed
 import os
+from itertools import accumulate
 from web3.contract import Contract
 
+from nkms_eth.accounting import calculate_refund, Downtime
+
 
 MINERS_LENGTH = 0
 MINER = 1
@@ -21,6 +24,7 @@ DOWNTIME_START_PERIOD_FIELD = 13
 DOWNTIME_END_PERIOD_FIELD = 14
 MINER_IDS_FIELD_LENGTH = 15
 MINER_ID_FIELD = 16
+DOWNTIME_CUM_SUM_FIELD = 17
 
 
 @pytest.fixture()
@@ -410,6 +414,28 @@ def test_locked_distribution(web3, chain, token, escrow_contract):
         assert index + 1 == index_stop
         assert 1 == shift
 
+    # The search by confirmed stake weights miners by the value confirmed for the current period
+    address_stop, index_stop, shift = escrow.call().findConfirmedCumSum(n_locked // 3, 1)
+    assert miners[0].lower() == address_stop.lower()
+    assert 0 == index_stop
+    assert n_locked // 3 == shift
+
+    address_stop, index_stop, shift = escrow.call().findConfirmedCumSum(largest_locked, 1)
+    assert miners[1].lower() == address_stop.lower()
+    assert 1 == index_stop
+    assert 0 == shift
+
+    address_stop, index_stop, shift = escrow.call().findConfirmedCumSum(n_locked - 1, 1)
+    assert miners[-1].lower() == address_stop.lower()
+    assert len(miners) - 1 == index_stop
+
+    address_stop, index_stop, shift = escrow.call().findConfirmedCumSum(n_locked, 1)
+    assert NULL_ADDR == address_stop.lower()
+
+    # The first miner's tokens will be unlocked before 11 periods
+    address_stop, index_stop, shift = escrow.call().findConfirmedCumSum(1, 11)
+    assert NULL_ADDR == address_stop.lower()
+
     # Test miners iteration
     assert len(miners) == web3.toInt(escrow.call().getMinerInfo(MINERS_LENGTH, NULL_ADDR, 0).encode('latin-1'))
     for index, miner in enumerate(miners):
@@ -500,6 +526,10 @@ def test_mining(web3, chain, token, escrow_contract):
     assert 21 == event_args['value']
     assert escrow.call().getCurrentPeriod() - 1 == event_args['period']
 
+    # Not mined period is kept
+    assert 1 == web3.toInt(escrow.call().getMinerInfo(CONFIRMED_PERIODS_FIELD_LENGTH, ursula1, 0).encode('latin-1'))
+    assert escrow.call().getCurrentPeriod() == \
+        web3.toInt(escrow.call().getMinerInfo(CONFIRMED_PERIOD_FIELD, ursula1, 0).encode('latin-1'))
     assert 1 == policy_manager.call().getPeriodsLength(ursula1)
     assert 1 == policy_manager.call().getPeriodsLength(ursula2)
     period = escrow.call().getCurrentPeriod() - 1
@@ -740,6 +770,263 @@ def test_miner_id(web3, chain, token, escrow_contract):
     assert miner_id == escrow.call().getMinerInfo(MINER_ID_FIELD, miner, 1).encode('latin-1')
 
 
+def test_miners_info(web3, chain, token, escrow_contract):
+    escrow = escrow_contract(1500)
+    creator = web3.eth.accounts[0]
+    ursula1 = web3.eth.accounts[1]
+    ursula2 = web3.eth.accounts[2]
+    fields = 7 + 2 * 3
+    page = 4 * fields
+
+    # Initialize Escrow contract
+    tx = escrow.transact().initialize()
+    chain.wait.for_receipt(tx)
+
+    # No miners yet, the page is filled with zeros
+    assert [0] * page == escrow.call().getMinersInfo(0)
+
+    # Ursula and Ursula(2) deposit some tokens
+    for ursula, value in ((ursula1, 1000), (ursula2, 500)):
+        tx = token.transact({'from': creator}).transfer(ursula, value)
+        chain.wait.for_receipt(tx)
+        tx = token.transact({'from': ursula}).approve(escrow.address, value)
+        chain.wait.for_receipt(tx)
+        tx = escrow.transact({'from': ursula}).deposit(value, 2)
+        chain.wait.for_receipt(tx)
+    tx = escrow.transact({'from': ursula2}).switchLock()
+    chain.wait.for_receipt(tx)
+    period = escrow.call().getCurrentPeriod()
+
+    # Both miners fit in one page, which has a fixed size even through the dispatcher
+    info = escrow.call().getMinersInfo(0)
+    assert page == len(info)
+    assert int(ursula1, 16) == info[0]
+    assert [1000, 1000, 500, 0, period, 1, period + 1, 1000] == info[1:9]
+    assert int(ursula2, 16) == info[fields]
+    assert [500, 500, 250, 1, period, 1, period + 1, 500] == info[fields + 1:fields + 9]
+    assert [0] * (page - 2 * fields) == info[2 * fields:]
+
+    # Pages start at the index
+    assert info[fields:2 * fields] + [0] * (page - fields) == escrow.call().getMinersInfo(1)
+    assert [0] * page == escrow.call().getMinersInfo(2)
+
+
+def test_nodes_info(web3, chain, token, escrow_contract):
+    escrow = escrow_contract(1500)
+    creator = web3.eth.accounts[0]
+    ursula1 = web3.eth.accounts[1]
+    ursula2 = web3.eth.accounts[2]
+    fields = 3
+
+    # Initialize Escrow contract
+    tx = escrow.transact().initialize()
+    chain.wait.for_receipt(tx)
+
+    # Ursula deposits some tokens, Ursula(2) is not a miner
+    tx = token.transact({'from': creator}).transfer(ursula1, 1000)
+    chain.wait.for_receipt(tx)
+    tx = token.transact({'from': ursula1}).approve(escrow.address, 1000)
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact({'from': ursula1}).deposit(1000, 2)
+    chain.wait.for_receipt(tx)
+    period = escrow.call().getCurrentPeriod()
+
+    # Locked tokens, downtime length and last active period of each node
+    info = escrow.call().getNodesInfo([ursula2, ursula1])
+    assert 16 * fields == len(info)
+    assert [0, 0, 0] == info[:fields]
+    assert [escrow.call().getLockedTokens(ursula1), 0, period] == info[fields:2 * fields]
+    assert all(value == 0 for value in info[2 * fields:])
+
+    # A batch is up to 16 nodes
+    info = escrow.call().getNodesInfo([ursula2] * 15 + [ursula1])
+    assert [escrow.call().getLockedTokens(ursula1), 0, period] == info[15 * fields:]
+
+
+def count_downtime_periods(downtime, start_index, min_period, max_period):
+    """Count downtime one by one, as PolicyManager did before MinersEscrow.getDowntimePeriods"""
+    downtime_periods = 0
+    index = start_index
+    while index < len(downtime):
+        start_period, end_period = downtime[index]
+        if start_period > max_period:
+            break
+        elif end_period >= min_period:
+            downtime_periods += min(max_period, end_period) - max(min_period, start_period) + 1
+            if max_period <= end_period:
+                break
+        index += 1
+    return [downtime_periods, index]
+
+
+def test_downtime(web3, chain, token):
+    creator = web3.eth.accounts[0]
+    client = web3.eth.accounts[1]
+    ursula1 = web3.eth.accounts[2]
+    ursula2 = web3.eth.accounts[3]
+    deploy_args = [token.address, 1, 4 * 2 * 10 ** 7, 4, 4, 2, 100, 1500]
+
+    # The escrow starts with the version that did not keep the total number of downtime periods
+    contract_library_v1, _ = chain.provider.deploy_contract(
+        'MinersEscrowLegacyDowntimeMock', deploy_args=deploy_args,
+        deploy_transaction={'from': creator})
+    dispatcher, _ = chain.provider.deploy_contract(
+        'Dispatcher', deploy_args=[contract_library_v1.address],
+        deploy_transaction={'from': creator})
+    contract_library_v2, _ = chain.provider.deploy_contract(
+        'MinersEscrow', deploy_args=deploy_args,
+        deploy_transaction={'from': creator})
+    escrow = web3.eth.contract(
+        contract_library_v2.abi,
+        dispatcher.address,
+        ContractFactoryClass=Contract)
+
+    tx = token.transact({'from': creator}).transfer(escrow.address, 10 ** 9)
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().initialize()
+    chain.wait.for_receipt(tx)
+    policy_manager, _ = chain.provider.deploy_contract(
+        'PolicyManager', deploy_args=[escrow.address],
+        deploy_transaction={'from': creator})
+    tx = escrow.transact({'from': creator}).setPolicyManager(policy_manager.address)
+    chain.wait.for_receipt(tx)
+    tx = web3.eth.sendTransaction({'from': web3.eth.coinbase, 'to': client, 'value': 10000})
+    chain.wait.for_receipt(tx)
+
+    def deposit(ursula):
+        tx = token.transact({'from': creator}).transfer(ursula, 1000)
+        chain.wait.for_receipt(tx)
+        tx = token.transact({'from': ursula}).approve(escrow.address, 1000)
+        chain.wait.for_receipt(tx)
+        tx = escrow.transact({'from': ursula}).deposit(1000, 100)
+        chain.wait.for_receipt(tx)
+
+    def confirm_activity(ursulas, activity):
+        # Each period the miners confirm activity for the next one or are down in the next one
+        for active in activity:
+            wait_time(chain, 1)
+            if active:
+                for ursula in ursulas:
+                    tx = escrow.transact({'from': ursula}).confirmActivity()
+                    chain.wait.for_receipt(tx)
+
+    def get_info(field, ursula, index=0):
+        return web3.toInt(escrow.call().getMinerInfo(field, ursula, index).encode('latin-1'))
+
+    def get_downtime(ursula):
+        return [Downtime(get_info(DOWNTIME_START_PERIOD_FIELD, ursula, index),
+                         get_info(DOWNTIME_END_PERIOD_FIELD, ursula, index))
+                for index in range(get_info(DOWNTIME_FIELD_LENGTH, ursula))]
+
+    # Ursula is down twice before the upgrade
+    deposit(ursula1)
+    confirm_activity([ursula1], [True, False, True, False, False, True])
+    legacy_downtime = get_downtime(ursula1)
+    assert 2 == len(legacy_downtime)
+
+    # The upgrade keeps her downtime without the total, Ursula(2) is a new miner
+    tx = dispatcher.transact({'from': creator}).upgrade(contract_library_v2.address)
+    chain.wait.for_receipt(tx)
+    assert contract_library_v2.address.lower() == dispatcher.call().target().lower()
+    assert legacy_downtime == get_downtime(ursula1)
+    deposit(ursula2)
+
+    # Both miners are down several times in a policy
+    period = escrow.call().getCurrentPeriod()
+    number_of_periods = 20
+    rate = 10
+    policy_id = os.urandom(20)
+    tx = policy_manager.transact({'from': client, 'value': 2 * rate * number_of_periods, 'gas_price': 0}) \
+        .createPolicy(policy_id, number_of_periods, [ursula1, ursula2])
+    chain.wait.for_receipt(tx)
+
+    # Index of downtime and last refunded period of each arrangement
+    arrangements = {ursula1: (2, 0), ursula2: (0, 0)}
+    refunds = list()
+
+    def refund():
+        current_period = escrow.call().getCurrentPeriod()
+        for ursula, (index, last_refunded_period) in arrangements.items():
+            value, index, last_refunded_period = calculate_refund(
+                rate=rate,
+                start_period=period + 1,
+                last_period=period + number_of_periods,
+                downtime=get_downtime(ursula),
+                index_of_downtime_periods=index,
+                last_refunded_period=last_refunded_period,
+                last_active_period=get_info(LAST_ACTIVE_PERIOD_FIELD, ursula),
+                current_period=current_period)
+            arrangements[ursula] = (index, last_refunded_period)
+
+            tx = policy_manager.transact({'from': client, 'gas_price': 0}).refund(policy_id, ursula)
+            chain.wait.for_receipt(tx)
+            events = policy_manager.pastEvents('RefundForArrangement').get()
+            assert value == events[-1]['args']['value']
+            refunds.append(value)
+
+    confirm_activity([ursula1, ursula2], [True, False, True, True, False, False, False, True])
+    refund()
+    confirm_activity([ursula1, ursula2], [False, True, False, False, True, True])
+    refund()
+    assert all(value > 0 for value in refunds)
+
+    # The total is kept only for the miner whose downtime was all added after the upgrade
+    downtime = get_downtime(ursula2)
+    assert 4 == len(downtime)
+    assert list(accumulate(end - start + 1 for start, end in downtime)) == \
+        [get_info(DOWNTIME_CUM_SUM_FIELD, ursula2, index) for index in range(len(downtime))]
+    assert legacy_downtime + downtime == get_downtime(ursula1)
+
+    # Downtime found by binary search and counted by the total, or summed one by one for the miner
+    # from before the upgrade, is the same as downtime counted one by one
+    for ursula in (ursula1, ursula2):
+        downtime = get_downtime(ursula)
+        first_period = downtime[0].start_period - 1
+        last_period = downtime[-1].end_period + 1
+        for start_index in range(len(downtime) + 1):
+            for min_period in range(first_period, last_period + 1):
+                for max_period in range(min_period - 1, last_period + 1):
+                    assert count_downtime_periods(downtime, start_index, min_period, max_period) == \
+                        escrow.call().getDowntimePeriods(ursula, start_index, min_period, max_period)
+
+
+def test_confirmed_periods_gas(web3, chain, token):
+    creator = web3.eth.accounts[0]
+    ursula = web3.eth.accounts[1]
+    tx = token.transact({'from': creator}).transfer(ursula, 10000)
+    chain.wait.for_receipt(tx)
+
+    def confirm_activity_gas(contract_name):
+        escrow, _ = chain.provider.deploy_contract(
+            contract_name, deploy_args=[token.address, 1, 4 * 2 * 10 ** 7, 4, 4, 2, 100, 1500],
+            deploy_transaction={'from': creator})
+        tx = token.transact({'from': creator}).transfer(escrow.address, 10 ** 8)
+        chain.wait.for_receipt(tx)
+        tx = escrow.transact().initialize()
+        chain.wait.for_receipt(tx)
+        tx = token.transact({'from': ursula}).approve(escrow.address, 1000)
+        chain.wait.for_receipt(tx)
+        tx = escrow.transact({'from': ursula}).deposit(1000, 20)
+        chain.wait.for_receipt(tx)
+
+        # Each period Ursula mints for the previous period and confirms the next one
+        gas_used = []
+        for _ in range(10):
+            wait_time(chain, 1)
+            tx = escrow.transact({'from': ursula}).confirmActivity()
+            gas_used.append(chain.wait.for_receipt(tx)['gasUsed'])
+        assert 2 == web3.toInt(
+            escrow.call().getMinerInfo(CONFIRMED_PERIODS_FIELD_LENGTH, ursula, 0).encode('latin-1'))
+        assert 9 == len(escrow.pastEvents('Mined').get())
+        return gas_used
+
+    # Once both slots are used, the new period is written to the slot of the minted one (2 words for 5000)
+    # instead of moving the rest and pushing to a deleted slot (2 words for 5000 and 2 words for 20000)
+    gas_used = confirm_activity_gas('MinersEscrow')
+    shifted_gas_used = confirm_activity_gas('MinersEscrowShiftedPeriodsMock')
+    assert sum(gas_used[2:]) < sum(shifted_gas_used[2:])
+
+
 def test_verifying_state(web3, chain, token):
     creator = web3.eth.accounts[0]
     miner = web3.eth.accounts[1]
@@ -3,6 +3,8 @@ from ethereum.tester import TransactionFailed
 import os
 from web3.contract import Contract
 
+from nkms_eth.accounting import calculate_refund, Downtime
+
 
 CLIENT_FIELD = 0
 INDEX_OF_DOWNTIME_PERIODS_FIELD = 1
@@ -17,6 +19,7 @@ REWARD_FIELD = 0
 REWARD_RATE_FIELD = 1
 LAST_MINED_PERIOD_FIELD = 2
 REWARD_DELTA_FIELD = 3
+REWARD_DELTA_PERIODS_FIELD = 4
 
 NULL_ADDR = '0x' + '0' * 40
 
@@ -266,6 +269,184 @@ def test_create_revoke(web3, chain, escrow, policy_manager):
     assert 0 == len(events)
 
 
+def test_create_policies(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    node1 = web3.eth.accounts[3]
+    node2 = web3.eth.accounts[4]
+    node3 = web3.eth.accounts[5]
+    client_balance = web3.eth.getBalance(client)
+
+    # Lengths of arguments must match
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client, 'value': 2 * value})\
+            .createPolicies([policy_id, policy_id_2], [number_of_periods], [1, 1], [node1, node2], [value, value])
+        chain.wait.for_receipt(tx)
+    # Nodes must be split between policies exactly
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client, 'value': 2 * value})\
+            .createPolicies([policy_id, policy_id_2], [number_of_periods, number_of_periods],
+                            [1, 1], [node1, node2, node3], [value, value])
+        chain.wait.for_receipt(tx)
+    # Sum of values must be equal to the sent ETH
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client, 'value': value})\
+            .createPolicies([policy_id, policy_id_2], [number_of_periods, number_of_periods],
+                            [1, 1], [node1, node2], [value, value])
+        chain.wait.for_receipt(tx)
+    # Policy can't be created twice
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client, 'value': 2 * value})\
+            .createPolicies([policy_id, policy_id], [number_of_periods, number_of_periods],
+                            [1, 1], [node1, node2], [value, value])
+        chain.wait.for_receipt(tx)
+
+    # Create two policies in one transaction
+    period = escrow.call().getCurrentPeriod()
+    tx = policy_manager.transact({'from': client, 'value': 3 * value, 'gas_price': 0})\
+        .createPolicies([policy_id, policy_id_2], [number_of_periods, number_of_periods // 2],
+                        [1, 2], [node1, node2, node3], [value, 2 * value])
+    chain.wait.for_receipt(tx)
+    assert 3 * value == web3.eth.getBalance(policy_manager.address)
+    assert client_balance - 3 * value == web3.eth.getBalance(client)
+
+    assert 1 == policy_manager.call().getPolicyNodesLength(policy_id)
+    assert node1 == policy_manager.call().getPolicyNode(policy_id, 0)
+    assert rate == web3.toInt(policy_manager.call().getPolicyInfo(RATE_FIELD, policy_id, NULL_ADDR).encode('latin-1'))
+    assert period + 10 == web3.toInt(
+        policy_manager.call().getPolicyInfo(LAST_PERIOD_FIELD, policy_id, NULL_ADDR).encode('latin-1'))
+
+    assert 2 == policy_manager.call().getPolicyNodesLength(policy_id_2)
+    assert node2 == policy_manager.call().getPolicyNode(policy_id_2, 0)
+    assert node3 == policy_manager.call().getPolicyNode(policy_id_2, 1)
+    assert 2 * rate == web3.toInt(
+        policy_manager.call().getPolicyInfo(RATE_FIELD, policy_id_2, NULL_ADDR).encode('latin-1'))
+    assert period + 5 == web3.toInt(
+        policy_manager.call().getPolicyInfo(LAST_PERIOD_FIELD, policy_id_2, NULL_ADDR).encode('latin-1'))
+    assert client == web3.toChecksumAddress(
+        policy_manager.call().getPolicyInfo(CLIENT_FIELD, policy_id_2, NULL_ADDR).encode('latin-1'))
+
+    events = policy_manager.pastEvents('PolicyCreated').get()
+    assert 2 == len(events)
+    assert policy_id == events[0]['args']['policyId'].encode('latin-1')
+    assert policy_id_2 == events[1]['args']['policyId'].encode('latin-1')
+
+    # Policies created together are revoked separately
+    tx = policy_manager.transact({'from': client, 'gas_price': 0}).revokePolicy(policy_id_2)
+    chain.wait.for_receipt(tx)
+    assert value == web3.eth.getBalance(policy_manager.address)
+    assert client_balance - value == web3.eth.getBalance(client)
+
+
+def test_create_policy_gas(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    nodes = web3.eth.accounts[3:6]
+
+    # The first policy of the nodes initializes their reward records
+    tx = policy_manager.transact({'from': client, 'value': 3 * value})\
+        .createPolicy(policy_id, number_of_periods, nodes)
+    chain.wait.for_receipt(tx)
+    period = escrow.call().getCurrentPeriod()
+
+    # Create policies with one and with all nodes, updating the same reward deltas
+    tx = policy_manager.transact({'from': client, 'value': value})\
+        .createPolicy(policy_id_2, number_of_periods, nodes[:1])
+    single_node_gas = chain.wait.for_receipt(tx)['gasUsed']
+    tx = policy_manager.transact({'from': client, 'value': 3 * value})\
+        .createPolicy(policy_id_3, number_of_periods, nodes)
+    all_nodes_gas = chain.wait.for_receipt(tx)['gasUsed']
+    assert period == escrow.call().getCurrentPeriod()
+
+    # Each node adds a new policy node and two arrangement slots (45000), and updates two reward deltas
+    # and two delta period words (20000); The escrow info of the nodes is read by one call,
+    # so the rest, mostly calldata and storage reads, stays under 10000 per node
+    per_node_gas = (all_nodes_gas - single_node_gas) // (len(nodes) - 1)
+    assert per_node_gas < 75000
+
+
+def test_create_policy_batches(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    bad_node = web3.eth.accounts[2]
+    nodes = web3.eth.accounts[3:6]
+
+    # Escrow info is read for batches of 16 nodes, so the node after them is checked in the second batch
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client, 'value': 17 * value})\
+            .createPolicy(policy_id, number_of_periods, nodes[:1] * 16 + [bad_node])
+        chain.wait.for_receipt(tx)
+
+    # Policy with two batches of nodes
+    tx = policy_manager.transact({'from': client, 'value': 18 * value, 'gas_price': 0})\
+        .createPolicy(policy_id, number_of_periods, nodes * 6)
+    chain.wait.for_receipt(tx)
+    assert 18 == policy_manager.call().getPolicyNodesLength(policy_id)
+    assert nodes[1] == policy_manager.call().getPolicyNode(policy_id, 16)
+    assert 18 * value == web3.eth.getBalance(policy_manager.address)
+
+
+def test_revoke_refund_policies(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    bad_client = web3.eth.accounts[2]
+    node1 = web3.eth.accounts[3]
+    node2 = web3.eth.accounts[4]
+    node3 = web3.eth.accounts[5]
+    client_balance = web3.eth.getBalance(client)
+
+    # Create three policies, with four arrangements in total
+    period = escrow.call().getCurrentPeriod()
+    tx = policy_manager.transact({'from': client, 'value': 4 * value, 'gas_price': 0})\
+        .createPolicies([policy_id, policy_id_2, policy_id_3], [number_of_periods] * 3,
+                        [1, 2, 1], [node1, node2, node3, node1], [value, 2 * value, value])
+    chain.wait.for_receipt(tx)
+    all_policies = [policy_id, policy_id_2, policy_id_3]
+
+    # Only the client can revoke or refund the policies, and the list must not be empty
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': bad_client}).revokePolicies([policy_id])
+        chain.wait.for_receipt(tx)
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': bad_client}).refundPolicies([policy_id])
+        chain.wait.for_receipt(tx)
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client}).revokePolicies([])
+        chain.wait.for_receipt(tx)
+
+    # Nodes were down for two periods, the refund for all policies is sent back at once
+    tx = escrow.transact().pushDowntimePeriod(period + 1, period + 2)
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().setLastActivePeriod(period + 2 * number_of_periods)
+    chain.wait.for_receipt(tx)
+    wait_time(chain, 3)
+    tx = policy_manager.transact({'from': client, 'gas_price': 0}).refundPolicies(all_policies)
+    chain.wait.for_receipt(tx)
+    assert client_balance - 4 * value + 4 * 2 * rate == web3.eth.getBalance(client)
+    events = policy_manager.pastEvents('RefundForPolicy').get()
+    assert all_policies == [event['args']['policyId'].encode('latin-1') for event in events]
+    assert [2 * rate, 4 * rate, 2 * rate] == [event['args']['value'] for event in events]
+    assert 4 == len(policy_manager.pastEvents('RefundForArrangement').get())
+
+    # Revoke one policy, then the rest of them together; Revoked policies are skipped
+    tx = policy_manager.transact({'from': client, 'gas_price': 0}).revokePolicy(policy_id_3)
+    chain.wait.for_receipt(tx)
+    client_balance = web3.eth.getBalance(client)
+    tx = policy_manager.transact({'from': client, 'gas_price': 0}).revokePolicies(all_policies)
+    chain.wait.for_receipt(tx)
+    events = policy_manager.pastEvents('PolicyRevoked').get()
+    assert [policy_id_3, policy_id, policy_id_2] == [event['args']['policyId'].encode('latin-1') for event in events]
+    assert client_balance + sum(event['args']['value'] for event in events[1:]) == web3.eth.getBalance(client)
+    assert 4 == len(policy_manager.pastEvents('ArrangementRevoked').get())
+    for policy in all_policies:
+        assert 1 == web3.toInt(policy_manager.call().getPolicyInfo(DISABLED_FIELD, policy, NULL_ADDR)
+                               .encode('latin-1'))
+
+    # Nothing is left to refund
+    tx = policy_manager.transact({'from': client, 'gas_price': 0}).refundPolicies(all_policies)
+    chain.wait.for_receipt(tx)
+    assert 3 == len(policy_manager.pastEvents('RefundForPolicy').get())
+    with pytest.raises(TransactionFailed):
+        tx = policy_manager.transact({'from': client}).revokePolicy(policy_id)
+        chain.wait.for_receipt(tx)
+
+
 def test_reward(web3, chain, escrow, policy_manager):
     client = web3.eth.accounts[1]
     node1 = web3.eth.accounts[3]
@@ -332,6 +513,35 @@ def test_reward(web3, chain, escrow, policy_manager):
     assert 120 == event_args['value']
 
 
+def test_reward_gas(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    node1 = web3.eth.accounts[3]
+
+    # Create policy and mint all of its periods
+    period = escrow.call().getCurrentPeriod()
+    tx = policy_manager.transact({'from': client, 'value': value})\
+        .createPolicy(policy_id, number_of_periods, [node1])
+    chain.wait.for_receipt(tx)
+    period += number_of_periods + 1
+    tx = escrow.transact({'from': node1}).mint(period, 1)
+    chain.wait.for_receipt(tx)
+    assert value == web3.toInt(policy_manager.call().getNodeInfo(REWARD_FIELD, node1, 0).encode('latin-1'))
+    assert 0 != web3.toInt(policy_manager.call()
+                           .getNodeInfo(REWARD_DELTA_PERIODS_FIELD, node1, period).encode('latin-1'))
+
+    # Catching up after idle periods costs about the same regardless of the gap
+    gas_used = list()
+    for gap in (1, 10, 100, 1000):
+        period += gap
+        tx = escrow.transact({'from': node1}).mint(period, 1)
+        gas_used.append(chain.wait.for_receipt(tx)['gasUsed'])
+        assert value == web3.toInt(policy_manager.call().getNodeInfo(REWARD_FIELD, node1, 0).encode('latin-1'))
+        assert period == web3.toInt(policy_manager.call()
+                                    .getNodeInfo(LAST_MINED_PERIOD_FIELD, node1, 0).encode('latin-1'))
+    # One storage read for each 256 skipped periods
+    assert max(gas_used) - min(gas_used) < 5000
+
+
 def test_refund(web3, chain, escrow, policy_manager):
     client = web3.eth.accounts[1]
     node1 = web3.eth.accounts[3]
@@ -588,6 +798,105 @@ def test_refund(web3, chain, escrow, policy_manager):
     assert 3 == len(events)
 
 
+def test_refund_calculation(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    node1 = web3.eth.accounts[3]
+
+    # Create policy and mark some periods as downtime periods
+    period = escrow.call().getCurrentPeriod()
+    tx = policy_manager.transact({'from': client, 'value': value, 'gas_price': 0}) \
+        .createPolicy(policy_id, number_of_periods, [node1])
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().pushDowntimePeriod(period + 2, period + 3)
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().pushDowntimePeriod(period + 5, period + 7)
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().setLastActivePeriod(period + 8)
+    chain.wait.for_receipt(tx)
+
+    # Refund calculated locally is the same as on-chain
+    downtime = [Downtime(*escrow.call().downtime(index)) for index in range(2)]
+    for wait_periods in (4, 10):
+        wait_time(chain, wait_periods)
+        current_period = escrow.call().getCurrentPeriod()
+        index = web3.toInt(policy_manager.call()
+                           .getPolicyInfo(INDEX_OF_DOWNTIME_PERIODS_FIELD, policy_id, node1).encode('latin-1'))
+        last_refunded_period = web3.toInt(policy_manager.call()
+                                          .getPolicyInfo(LAST_REFUNDED_PERIOD_FIELD, policy_id, node1)
+                                          .encode('latin-1'))
+        refund, index, last_refunded_period = calculate_refund(rate=rate,
+                                                               start_period=period + 1,
+                                                               last_period=period + number_of_periods,
+                                                               downtime=downtime,
+                                                               index_of_downtime_periods=index,
+                                                               last_refunded_period=last_refunded_period,
+                                                               last_active_period=period + 8,
+                                                               current_period=current_period)
+
+        tx = policy_manager.transact({'from': client, 'gas_price': 0}).refund(policy_id, node1)
+        chain.wait.for_receipt(tx)
+        events = policy_manager.pastEvents('RefundForArrangement').get()
+        assert refund == events[-1]['args']['value']
+        assert index == web3.toInt(policy_manager.call()
+                                   .getPolicyInfo(INDEX_OF_DOWNTIME_PERIODS_FIELD, policy_id, node1)
+                                   .encode('latin-1'))
+        assert last_refunded_period == web3.toInt(policy_manager.call()
+                                                  .getPolicyInfo(LAST_REFUNDED_PERIOD_FIELD, policy_id, node1)
+                                                  .encode('latin-1'))
+    assert refund > 0
+
+
+def test_refund_gas(web3, chain, escrow, policy_manager):
+    client = web3.eth.accounts[1]
+    node1 = web3.eth.accounts[3]
+
+    # The first policy is created before the node was down a hundred times, the second one after that
+    period = escrow.call().getCurrentPeriod()
+    tx = policy_manager.transact({'from': client, 'value': value, 'gas_price': 0}) \
+        .createPolicy(policy_id, number_of_periods, [node1])
+    chain.wait.for_receipt(tx)
+    for start in range(1, 200, 2):
+        tx = escrow.transact().pushDowntimePeriod(start, start)
+        chain.wait.for_receipt(tx)
+    assert 100 == escrow.call().downtimeCumSum(99)
+    tx = policy_manager.transact({'from': client, 'value': value, 'gas_price': 0}) \
+        .createPolicy(policy_id_2, number_of_periods, [node1])
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().pushDowntimePeriod(period + 3, period + 4)
+    chain.wait.for_receipt(tx)
+    tx = escrow.transact().setLastActivePeriod(period + 8)
+    chain.wait.for_receipt(tx)
+    downtime = [Downtime(*escrow.call().downtime(index)) for index in range(101)]
+
+    # Downtime is found by binary search, so refunds cost about the same however much downtime is skipped
+    wait_time(chain, 6)
+    current_period = escrow.call().getCurrentPeriod()
+    gas_used = list()
+    for policy, index_of_downtime_periods in ((policy_id, 0), (policy_id_2, 100)):
+        start_period = web3.toInt(policy_manager.call()
+                                  .getPolicyInfo(START_PERIOD_FIELD, policy, NULL_ADDR).encode('latin-1'))
+        assert index_of_downtime_periods == web3.toInt(policy_manager.call()
+                                                       .getPolicyInfo(INDEX_OF_DOWNTIME_PERIODS_FIELD, policy, node1)
+                                                       .encode('latin-1'))
+        refund, index, _last_refunded_period = calculate_refund(rate=rate,
+                                                                start_period=start_period,
+                                                                last_period=start_period + number_of_periods - 1,
+                                                                downtime=downtime,
+                                                                index_of_downtime_periods=index_of_downtime_periods,
+                                                                last_refunded_period=0,
+                                                                last_active_period=period + 8,
+                                                                current_period=current_period)
+
+        tx = policy_manager.transact({'from': client, 'gas_price': 0}).refund(policy, node1)
+        gas_used.append(chain.wait.for_receipt(tx)['gasUsed'])
+        events = policy_manager.pastEvents('RefundForArrangement').get()
+        assert refund == events[-1]['args']['value']
+        assert 101 == index == web3.toInt(policy_manager.call()
+                                          .getPolicyInfo(INDEX_OF_DOWNTIME_PERIODS_FIELD, policy, node1)
+                                          .encode('latin-1'))
+    assert abs(gas_used[0] - gas_used[1]) < 20000
+
+
 def test_verifying_state(web3, chain):
     creator = web3.eth.accounts[0]
     address1 = web3.eth.accounts[1].lower()
@@ -0,0 +1,116 @@
+from functools import partial
+
+from nkms_eth.accounting import PolicyAccountant, Downtime
+from nkms_eth.actors import PolicyAuthor
+from nkms_eth.agents import MinerAgent
+from nkms_eth.policies import BlockchainPolicy
+
+
+def test_accountant_matches_policy_manager(testerchain, mock_token_deployer, mock_miner_agent, mock_policy_agent):
+    web3 = testerchain._chain.web3
+    mock_token_deployer._global_airdrop(amount=10000)
+    _origin, *addresses, alice_address = web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses[:3], miner_agent=mock_miner_agent, locktime=10)
+    hours_per_period = mock_miner_agent._deployer._hours_per_period
+    testerchain.wait_time(hours_per_period)
+
+    alice = PolicyAuthor(address=alice_address, policy_agent=mock_policy_agent)
+    policies = [BlockchainPolicy(author=alice, periods=10, rate=10) for _ in range(2)]
+    for policy in policies:
+        for miner in miners:
+            policy.add_arrangement(miner)
+    BlockchainPolicy.publish_many(policies)
+    refunded_id, revoked_id = (policy.id for policy in policies)
+
+    # The first two miners confirm and mint every period, the last one is down
+    for _ in range(3):
+        for miner in miners[:2]:
+            miner.mint()
+        testerchain.wait_time(hours_per_period)
+    for miner in miners[:2]:
+        miner.mint()
+
+    accountant = PolicyAccountant(policy_agent=mock_policy_agent, miner_agent=mock_miner_agent)
+    assert accountant.sync() > 0
+
+    def to_int(value: str) -> int:
+        return int.from_bytes(value.encode('latin-1'), byteorder='big')
+
+    def period_of(receipt: dict) -> int:
+        timestamp = web3.eth.getBlock(receipt['blockNumber'])['timestamp']
+        return timestamp // mock_miner_agent.read().secondsPerPeriod()
+
+    def events(event_name: str, receipt: dict) -> list:
+        filter_params = {'fromBlock': receipt['blockNumber'], 'toBlock': receipt['blockNumber']}
+        return mock_policy_agent._contract.pastEvents(event_name, filter_params).get()
+
+    # Rewards are the ones PolicyManager stores for each node
+    for miner in miners:
+        reward = to_int(mock_policy_agent.read().getNodeInfo(0, miner.address, 0))    # NodeInfoField.Reward
+        assert accountant.get_withdrawable_reward(miner.address) == reward
+    assert accountant.get_withdrawable_reward(miners[0].address) > 0
+    assert accountant.get_withdrawable_reward(miners[2].address) == 0
+
+    # The refund of each arrangement is the one the contract pays; The accountant is not synced yet,
+    # so it answers for the state before the transaction
+    receipt, = alice.refund_policies([refunded_id])
+    refund_period = period_of(receipt)
+    expected = accountant.get_refund(refunded_id, period=refund_period)
+    refunds = {web3.toChecksumAddress(entry['args']['node']): entry['args']['value']
+               for entry in events('RefundForArrangement', receipt)}
+    assert refunds == expected
+    assert refunds[miners[0].address] == 0 and refunds[miners[2].address] > 0
+
+    receipt, = alice.revoke_policies([revoked_id])
+    expected = accountant.get_revocation_refund(revoked_id, period=period_of(receipt))
+    entry, = events('PolicyRevoked', receipt)
+    assert entry['args']['value'] == expected
+
+    # After replaying the refund and the revocation the accountant agrees with the contract again
+    accountant.sync()
+    assert accountant.policies[revoked_id].disabled
+    assert list(accountant.get_client_refunds(alice_address, period=refund_period)) == [refunded_id]
+    assert accountant.get_refund(refunded_id, period=refund_period) == \
+        {address: 0 for address in accountant.policies[refunded_id].arrangements}
+
+
+def test_accountant_follows_redeposit(testerchain, mock_token_deployer, mock_miner_agent, mock_policy_agent):
+    mock_token_deployer._global_airdrop(amount=10000)
+    _origin, miner_address, *everyone_else = testerchain._chain.web3.eth.accounts
+    miner, = testerchain.spawn_miners(addresses=[miner_address], miner_agent=mock_miner_agent, locktime=1)
+    hours_per_period = mock_miner_agent._deployer._hours_per_period
+    accountant = PolicyAccountant(policy_agent=mock_policy_agent, miner_agent=mock_miner_agent)
+
+    def assert_synced() -> None:
+        accountant.sync()
+        node = accountant.nodes[miner.address]
+        read = partial(mock_miner_agent.read_miner_info, address=miner.address)
+        assert node.value == read(MinerAgent.MinerInfo.VALUE)
+        assert node.last_active_period == read(MinerAgent.MinerInfo.LAST_ACTIVE_PERIOD_F)
+        downtime = [Downtime(read(MinerAgent.MinerInfo.DOWNTIME_START_PERIOD, index=index),
+                             read(MinerAgent.MinerInfo.DOWNTIME_END_PERIOD, index=index))
+                    for index in range(read(MinerAgent.MinerInfo.DOWNTIME_LENGTH))]
+        assert node.downtime == downtime
+
+    assert_synced()
+
+    # The miner mints and withdraws everything
+    testerchain.wait_time(hours_per_period)
+    testerchain.wait_time(hours_per_period)
+    miner.mint()
+    miner.collect_staking_reward()
+    assert_synced()
+    assert accountant.nodes[miner.address].value == 0
+
+    # Periods without tokens are not downtime, the new deposit starts the activity again
+    testerchain.wait_time(hours_per_period)
+    testerchain.wait_time(hours_per_period)
+    miner.stake(amount=miner.token_balance() // 2, locktime=1, auto_switch_lock=False)
+    assert_synced()
+
+    # A period skipped after the new deposit is downtime
+    testerchain.wait_time(hours_per_period)
+    testerchain.wait_time(hours_per_period)
+    miner.mint()
+    assert_synced()
+    assert len(accountant.nodes[miner.address].downtime) > 0
@@ -1,13 +1,14 @@
+import asyncio
 import os
 import random
 
 import pytest
 
-from nkms_eth.actors import Miner
+from nkms_eth.actors import Miner, AsyncMiner
 from nkms_eth.agents import MinerAgent
 
 
-def test_miner_locking_tokens(testerchain, mock_token_deployer, mock_miner_agent):
+def test_miner_locking_tokens(testerchain, mock_token_deployer, mock_miner_agent, monkeypatch):
 
     mock_token_deployer._global_airdrop(amount=10000)    # weeee
 
@@ -28,6 +29,15 @@ def test_miner_locking_tokens(testerchain, mock_token_deployer, mock_miner_agent
 
     assert mock_miner_agent.read().getLockedTokens(miner.address) == an_amount_of_tokens
 
+    # The state cache is only synced when a block was mined since the last access
+    syncs = list()
+    sync = mock_miner_agent.state_cache.sync
+    monkeypatch.setattr(mock_miner_agent.state_cache, 'sync', lambda: syncs.append(sync()))
+    assert miner.locked_tokens == an_amount_of_tokens
+    assert len(syncs) == 1
+    assert miner.is_staking and miner.locked_tokens == an_amount_of_tokens
+    assert len(syncs) == 1
+
 
 def test_mine_then_withdraw_tokens(testerchain, mock_token_deployer, token_agent, mock_miner_agent, mock_miner_escrow_deployer):
     """
@@ -90,7 +100,9 @@ def test_mine_then_withdraw_tokens(testerchain, mock_token_deployer, token_agent
     # ...wait more...
     testerchain.wait_time(mock_miner_agent._deployer._hours_per_period)
 
-    miner.mint()
+    # A single confirmActivity transaction mints the confirmed periods
+    mint_txhash = miner.mint()
+    assert miner._transactions[-1][1] == mint_txhash
     miner.collect_staking_reward()
 
     final_balance = token_agent.get_balance(miner.address)
@@ -151,3 +163,28 @@ def test_publish_miner_datastore(testerchain, mock_token_deployer, mock_miner_ag
 
     assert another_mock_miner_id == supposedly_the_same_miner_id
 
+
+def test_async_miners_stake_concurrently(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    _origin, *everybody = testerchain._chain.web3.eth.accounts
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    miners = [AsyncMiner(miner_agent=mock_miner_agent, address=address, loop=loop) for address in everybody]
+
+    amount = 1000 * mock_token_deployer._M
+    stakes = (miner.stake(amount=amount, locktime=1, auto_switch_lock=True) for miner in miners)
+    all_transactions = loop.run_until_complete(asyncio.gather(*stakes))
+
+    for miner, transactions in zip(miners, all_transactions):
+        assert list(transactions) == ['approve', 'deposit', 'switch_lock']
+        assert miner.locked_tokens == amount
+
+    # Each miner's transactions were submitted with consecutive nonces
+    web3 = testerchain._chain.web3
+    for transactions in all_transactions:
+        nonces = [web3.eth.getTransaction(txhash)['nonce'] for txhash in transactions.values()]
+        assert nonces == list(range(nonces[0], nonces[0] + len(nonces)))
+
+    loop.close()
@@ -1,16 +1,18 @@
 import pytest
 
+from nkms_eth.agents import MinerAgent
+from nkms_eth.instrumentation import UNTAGGED
+from nkms_eth.stakes import MINERS_INFO_PAGE
+from nkms_eth.storage import SnapshotStore
 from nkms_eth.utilities import MockNuCypherMinerConfig
 
-M = 10 ** 6
-
 
 def test_get_swarm(testerchain, mock_token_deployer, mock_miner_agent):
 
     mock_token_deployer._global_airdrop(amount=10000)
 
     creator, *addresses = testerchain._chain.web3.eth.accounts
-    testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=1, m=M)
+    testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=1)
 
     default_period_duration = MockNuCypherMinerConfig._hours_per_period
     testerchain.wait_time(default_period_duration)
@@ -29,3 +31,186 @@ def test_get_swarm(testerchain, mock_token_deployer, mock_miner_agent):
     except ValueError:
         pytest.fail()
 
+
+def test_stake_index_matches_find_cum_sum(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=100)
+
+    default_period_duration = MockNuCypherMinerConfig._hours_per_period
+    testerchain.wait_time(default_period_duration)
+
+    duration = 10
+    stake_index = mock_miner_agent.get_stake_index(duration=duration)
+    assert len(stake_index) == len(addresses)
+
+    # Every point on the ruler resolves to the same miner as the on-chain walk
+    step = stake_index.total // 20
+    for point in range(0, stake_index.total, step):
+        addr, _index, _shift = mock_miner_agent.read().findCumSum(0, point, duration)
+        assert stake_index.find(point).address.lower() == addr.lower()
+
+    # Points past the end of the ruler select nobody
+    assert stake_index.find(stake_index.total) is None
+
+    # The index is reused within a period
+    assert mock_miner_agent.get_stake_index(duration=duration) is stake_index
+
+    miners = mock_miner_agent.sample(quantity=3, duration=duration, verify=True)
+    assert len(set(miners)) == 3
+
+
+def test_sample_by_confirmed_stake(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=100)
+
+    default_period_duration = MockNuCypherMinerConfig._hours_per_period
+    testerchain.wait_time(default_period_duration)
+
+    # Every point on the ruler resolves to a miner, except those past the end
+    n_tokens = mock_miner_agent.read().getAllLockedTokens()
+    step = n_tokens // 20
+    points = list(range(0, n_tokens, step))
+    addrs = mock_miner_agent._find_confirmed_cum_sum(points=points, duration=10)
+    assert addrs <= set(addresses)
+    null_addr = testerchain._chain.web3.toChecksumAddress(mock_miner_agent._deployer._null_addr)
+    assert mock_miner_agent._find_confirmed_cum_sum(points=[n_tokens], duration=10) == {null_addr}
+
+    miners = mock_miner_agent.sample(quantity=3, duration=10, by_confirmed_stake=True)
+    assert len(set(miners)) == 3
+    assert set(miners) <= set(addresses)
+
+
+def test_read_batch(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=1)
+
+    # Batched results are decoded and returned in call order, across several batches
+    calls = [(address, ) for address in addresses]
+    locked_tokens = mock_miner_agent.read_batch('getLockedTokens', calls, batch_size=4)
+    assert locked_tokens == [mock_miner_agent.read().getLockedTokens(address) for address in addresses]
+
+    # Snapshots built from batched getMinerInfo lookups agree with the single field reader
+    states = mock_miner_agent.snapshot()
+    assert [state.address for state in states] == list(mock_miner_agent.swarm())
+    for state in states:
+        value = mock_miner_agent.read_miner_info(mock_miner_agent.MinerInfo.VALUE, state.address)
+        assert state.value == value
+
+
+def test_snapshot_pages(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    testerchain.spawn_miners(addresses=addresses, miner_agent=mock_miner_agent, locktime=1)
+
+    # Paging through getMinersInfo yields the same records as the getMinerInfo lookups
+    paged_states = mock_miner_agent.snapshot()
+    assert len(addresses) > MINERS_INFO_PAGE    # Several pages
+    assert mock_miner_agent.get_miners_page(MINERS_INFO_PAGE)[0].address == paged_states[MINERS_INFO_PAGE].address
+    batched_states = mock_miner_agent.get_miner_states(list(mock_miner_agent.swarm()))
+    assert len(paged_states) == len(addresses)
+
+    for paged, batched in zip(paged_states, batched_states):
+        assert paged.address == batched.address
+        assert paged.index == batched.index
+        assert paged.value == batched.value
+        assert paged.locked_value == batched.locked_value
+        assert paged.release_rate == batched.release_rate
+        assert paged.confirmed_periods == batched.confirmed_periods
+
+
+def test_miner_state_cache(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses[:-1], miner_agent=mock_miner_agent, locktime=1)
+
+    state_cache = mock_miner_agent.state_cache
+    state_cache.sync()
+    for address in addresses[:-1]:
+        assert state_cache.locked_tokens(address) == mock_miner_agent.read().getLockedTokens(address)
+
+    # No new blocks, nothing to replay
+    assert state_cache.sync() == set()
+
+    # Only the miner that emitted an event is invalidated
+    miners[0].switch_lock()
+    assert state_cache.sync() == {miners[0].address}
+    assert state_cache.get(miners[0].address).release is True
+
+    # New miners are appended in ledger order
+    newcomer, = testerchain.spawn_miners(addresses=addresses[-1:], miner_agent=mock_miner_agent, locktime=1)
+    assert newcomer.address in state_cache.sync()
+    assert state_cache.get(newcomer.address).index == len(addresses) - 1
+    assert [state.address for state in state_cache.states()] == list(mock_miner_agent.swarm())
+
+
+def test_miner_state_cache_resumes_from_snapshot_store(testerchain, mock_token_deployer, mock_miner_agent, tmpdir):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses[:-1], miner_agent=mock_miner_agent, locktime=1)
+
+    snapshot_store = SnapshotStore(str(tmpdir.join('stakers.sqlite')))
+    first_agent = MinerAgent(token_agent=mock_miner_agent.token_agent, snapshot_store=snapshot_store)
+    first_agent.state_cache.sync()
+    block_cursor = first_agent.state_cache.block_cursor
+
+    # Chain moves on while the node is down
+    miners[0].switch_lock()
+    testerchain.spawn_miners(addresses=addresses[-1:], miner_agent=mock_miner_agent, locktime=1)
+
+    # A restarted node resumes from the stored cursor and only replays the delta
+    restarted_agent = MinerAgent(token_agent=mock_miner_agent.token_agent, snapshot_store=snapshot_store)
+    invalidated = restarted_agent.state_cache.sync()
+    assert invalidated == {miners[0].address, addresses[-1]}
+    assert restarted_agent.state_cache.block_cursor > block_cursor
+
+    states = restarted_agent.state_cache.states()
+    assert [state.address for state in states] == list(mock_miner_agent.swarm())
+    assert restarted_agent.state_cache.get(miners[0].address).release is True
+
+    # Everything was written back
+    stored_cursor, stored_states = snapshot_store.load(mock_miner_agent.contract_address)
+    assert stored_cursor == restarted_agent.state_cache.block_cursor
+    assert [state.address for state in stored_states] == [state.address for state in states]
+
+
+def test_cached_read(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    miner, *_ = testerchain.spawn_miners(addresses=addresses[:1], miner_agent=mock_miner_agent, locktime=100)
+
+    view_cache = testerchain.view_cache
+    view_cache.clear()
+    stats = testerchain.rpc_stats
+    stats.reset()
+
+    # Identical view calls in the same block are served from memory
+    locked_tokens = mock_miner_agent.read().getLockedTokens(miner.address)
+    assert mock_miner_agent.read().getLockedTokens(miner.address) == locked_tokens
+    assert view_cache.hits == 1
+    assert stats.stats(tag=UNTAGGED)['eth_call']['calls'] == 1
+
+    # A new block invalidates the cache
+    miner.switch_lock()
+    assert mock_miner_agent.read().getLockedTokens(miner.address) == locked_tokens
+    assert view_cache.hits == 1
+    assert len(view_cache) == 1
+
+    # Uncached reads always go to the node
+    assert mock_miner_agent.read(cached=False).getLockedTokens(miner.address) == locked_tokens
+    assert view_cache.hits == 1
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from nkms_eth.blockchain import QueuedTransaction, ReceiptTracker
+from nkms_eth.instrumentation import UNTAGGED
+
+
+def test_transaction_queue(testerchain, mock_token_deployer):
+    origin, *everybody = testerchain._chain.web3.eth.accounts
+
+    queue = testerchain.transaction_queue
+    queue.max_in_flight = 2
+
+    first_nonce = testerchain._chain.web3.eth.getTransactionCount(origin)
+    transactions = [queue.submit(mock_token_deployer._contract, 'transfer', address, 1000, payload={'from': origin})
+                    for address in everybody]
+
+    assert len(queue.pending(origin)) <= 2
+    assert [transaction.nonce for transaction in transactions] == list(range(first_nonce, first_nonce + len(everybody)))
+
+    queue.wait(transactions)
+    assert all(transaction.state == QueuedTransaction.MINED for transaction in transactions)
+    assert not queue.pending()
+
+    for address in everybody:
+        assert mock_token_deployer._contract.call().balanceOf(address) >= 1000
+
+    # The sender was released once settled; Its nonce is read from the node again
+    txhash = mock_token_deployer._contract.transact({'from': origin}).transfer(everybody[0], 1000)
+    testerchain.wait_for_receipt(txhash)
+    transaction = queue.submit(mock_token_deployer._contract, 'transfer', everybody[0], 1000, payload={'from': origin})
+    assert transaction.nonce == first_nonce + len(everybody) + 1
+    queue.wait([transaction])
+
+
+def test_transaction_queue_mined_after_tracker_poll(testerchain, mock_token_deployer, monkeypatch):
+    origin, *everybody = testerchain._chain.web3.eth.accounts
+    queue, tracker = testerchain.transaction_queue, testerchain.receipt_tracker
+
+    # The transaction is mined after the tracker last polled, so only the nonce tells it is settled
+    transaction = queue.submit(mock_token_deployer._contract, 'transfer', everybody[0], 1000, payload={'from': origin})
+    testerchain.wait_for_receipt(transaction.txhash)
+    monkeypatch.setattr(tracker, 'poll', lambda force=False: None)
+    monkeypatch.setattr(tracker, 'receipt', lambda txhash: None)
+
+    assert queue.poll() == [transaction]
+    assert transaction.state == QueuedTransaction.MINED
+    assert transaction.receipt is not None and transaction.receipt['blockNumber'] is not None
+
+
+def test_receipt_tracker(testerchain, mock_token_deployer):
+    origin, *everybody = testerchain._chain.web3.eth.accounts
+    tracker = testerchain.receipt_tracker
+
+    txhashes = [mock_token_deployer._contract.transact({'from': origin}).transfer(address, 1000)
+                for address in everybody]
+    for txhash in txhashes:
+        tracker.track(txhash)
+
+    *synchronous, asynchronous = txhashes
+    for txhash in synchronous:
+        receipt = testerchain.wait_for_receipt(txhash)
+        assert ReceiptTracker._normalize(receipt['transactionHash']) == ReceiptTracker._normalize(txhash)
+
+    loop = asyncio.new_event_loop()
+    receipt = loop.run_until_complete(tracker.wait_async(asynchronous, loop=loop))
+    assert ReceiptTracker._normalize(receipt['transactionHash']) == ReceiptTracker._normalize(asynchronous)
+    loop.close()
+
+    with pytest.raises(ReceiptTracker.ReceiptTimeout):
+        tracker.wait('0x' + '00' * 32, timeout=0.5)
+    tracker.forget('0x' + '00' * 32)
+
+
+def test_rpc_stats(testerchain, mock_token_deployer, mock_miner_agent):
+    mock_token_deployer._global_airdrop(amount=10000)
+    creator, *addresses = testerchain._chain.web3.eth.accounts
+    testerchain.spawn_miners(addresses=addresses[:2], miner_agent=mock_miner_agent, locktime=1)
+
+    # Requests are attributed to the outermost instrumented action
+    stats = testerchain.rpc_stats
+    stats.reset()
+    swarm = list(mock_miner_agent.swarm())
+    assert len(swarm) == 2
+
+    swarm_stats = stats.stats(tag='MinerAgent.swarm')
+    assert swarm_stats['eth_call']['calls'] >= 1
+    assert swarm_stats['eth_call']['bytes_received'] > 0
+    assert sum(swarm_stats['eth_call']['latency_buckets']) >= 1
+    assert set(stats.totals()) == {'MinerAgent.swarm'}
+
+    # Untagged requests are counted too
+    testerchain._chain.web3.eth.blockNumber
+    assert stats.stats(tag=UNTAGGED)['eth_blockNumber']['calls'] == 1
+
+    exported = stats.prometheus()
+    assert '# TYPE nkms_rpc_latency_seconds histogram' in exported
+    assert 'nkms_rpc_calls_total{tag="untagged",method="eth_blockNumber"} 1' in exported
+    assert 'nkms_rpc_latency_seconds_bucket{tag="MinerAgent.swarm",method="eth_call",le="+Inf"}' in exported
@@ -0,0 +1,26 @@
+from nkms_eth.deployers import BatchTransferDeployer
+
+
+def test_token_distribution(testerchain, mock_token_deployer):
+    _creator, *everybody = testerchain._chain.web3.eth.accounts
+    token = mock_token_deployer._contract
+
+    batch_transfer_deployer = BatchTransferDeployer(token_deployer=mock_token_deployer)
+    batch_transfer_deployer.arm()
+    batch_transfer_deployer.deploy()
+
+    balances = {address: token.call().balanceOf(address) for address in everybody}
+    values = [1000 + i for i in range(len(everybody))]
+
+    # Everybody fits in a single transaction
+    receipts = mock_token_deployer.distribute(batch_transfer_deployer, recipients=everybody, values=values)
+    assert len(receipts) == 1
+    for address, value in zip(everybody, values):
+        assert token.call().balanceOf(address) == balances[address] + value
+
+    # A tiny gas budget falls back to one recipient per transaction
+    mock_token_deployer._distribution_gas_share = 0
+    receipts = mock_token_deployer.distribute(batch_transfer_deployer, recipients=everybody, values=values)
+    assert len(receipts) == len(everybody)
+    for address, value in zip(everybody, values):
+        assert token.call().balanceOf(address) == balances[address] + 2 * value
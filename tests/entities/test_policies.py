@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from nkms_eth.actors import PolicyAuthor
+from nkms_eth.policies import BlockchainPolicy
+
+
+def test_publish_policy(testerchain, mock_token_deployer, mock_miner_agent, mock_policy_agent):
+    mock_token_deployer._global_airdrop(amount=10000)
+    _origin, *addresses, alice_address = testerchain._chain.web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses[:3], miner_agent=mock_miner_agent, locktime=10)
+    testerchain.wait_time(mock_miner_agent._deployer._hours_per_period)
+
+    alice = PolicyAuthor(address=alice_address, policy_agent=mock_policy_agent)
+
+    # All arrangements are created by a single transaction
+    policy = BlockchainPolicy(author=alice, periods=10, value=3000 + 7)
+    for miner in miners:
+        policy.add_arrangement(miner)
+    assert policy.rate == 100 and policy.value == 3000
+
+    policy.publish()
+    assert policy.is_published and all(arrangement.is_published for arrangement in policy)
+    receipt = testerchain._chain.web3.eth.getTransactionReceipt(policy.publish_transaction)
+    assert receipt['to'] == mock_policy_agent.contract_address
+
+    published = BlockchainPolicy.from_blockchain(author=alice, policy_id=policy.id)
+    assert published.rate == 100 and published.periods == 10
+    assert [arrangement.miner.address for arrangement in published] == [miner.address for miner in miners]
+
+    with pytest.raises(BlockchainPolicy.PolicyError):
+        policy.add_arrangement(miners[0])
+    with pytest.raises(BlockchainPolicy.NoSuchPolicy):
+        BlockchainPolicy.from_blockchain(author=alice, policy_id=os.urandom(20))
+
+    # Several policies are submitted before waiting for any of them
+    policies = [BlockchainPolicy(author=alice, periods=5, rate=10) for _ in range(3)]
+    for policy, miner in zip(policies, miners):
+        policy.add_arrangement(miner)
+    txhashes = BlockchainPolicy.publish_many(policies)
+    assert len(set(txhashes)) == 3
+    for policy in policies:
+        assert mock_policy_agent.fetch_arrangement_data(policy.id)[1] == 10
+
+
+def test_revoke_policies(testerchain, mock_token_deployer, mock_miner_agent, mock_policy_agent):
+    mock_token_deployer._global_airdrop(amount=10000)
+    _origin, *addresses, alice_address = testerchain._chain.web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses[:3], miner_agent=mock_miner_agent, locktime=10)
+    testerchain.wait_time(mock_miner_agent._deployer._hours_per_period)
+
+    alice = PolicyAuthor(address=alice_address, policy_agent=mock_policy_agent)
+    policies = [BlockchainPolicy(author=alice, periods=5, rate=10) for _ in range(4)]
+    for policy in policies:
+        for miner in miners:
+            policy.add_arrangement(miner)
+    BlockchainPolicy.publish_many(policies)
+    policy_ids = [policy.id for policy in policies]
+
+    # Every policy is refunded and revoked by a single transaction
+    receipts = alice.refund_policies(policy_ids)
+    assert len(receipts) == 1 and receipts[0].get('status', 1) == 1
+    receipts = alice.revoke_policies(policy_ids)
+    assert len(receipts) == 1 and receipts[0].get('status', 1) == 1
+    for policy_id in policy_ids:
+        assert mock_policy_agent.fetch_arrangement_data(policy_id)[-1] is True
+
+    # Revoked policies are skipped
+    receipts = alice.revoke_policies(policy_ids)
+    assert receipts[0].get('status', 1) == 1
+
+
+def test_create_policies_in_chunks(testerchain, mock_token_deployer, mock_miner_agent, mock_policy_agent, monkeypatch):
+    mock_token_deployer._global_airdrop(amount=10000)
+    _origin, *addresses, alice_address = testerchain._chain.web3.eth.accounts
+    miners = testerchain.spawn_miners(addresses=addresses[:3], miner_agent=mock_miner_agent, locktime=10)
+    testerchain.wait_time(mock_miner_agent._deployer._hours_per_period)
+    alice = PolicyAuthor(address=alice_address, policy_agent=mock_policy_agent)
+
+    # The per-policy and per-node terms are recovered from the probes
+    policies = [(os.urandom(20), 5, [miner.address for miner in miners[:n]], 0) for n in (1, 3, 2, 1)]
+    chunks, base_gas, policy_gas, node_gas = mock_policy_agent._estimate_chunks(
+        policies, nodes_length=lambda policy: len(policy[2]),
+        estimate=lambda chunk: 21000 + 50000 * len(chunk) + 20000 * sum(len(policy[2]) for policy in chunk))
+    assert (base_gas, policy_gas, node_gas) == (21000, 50000, 20000)
+    assert chunks == [policies]
+
+    # A small gas budget splits the policies into several transactions, all of which are created
+    monkeypatch.setattr(mock_policy_agent, '_batch_gas_share', 1e-6)
+    policies = [(policy_id, periods, nodes, 10 * periods * len(nodes))
+                for policy_id, periods, nodes, _value in policies]
+    receipts = mock_policy_agent.create_policies(policies, author=alice)
+    assert len(receipts) == len(policies)
+    assert all(receipt.get('status', 1) == 1 for receipt in receipts)
+    for policy_id, periods, nodes, _value in policies:
+        assert mock_policy_agent.fetch_arrangement_data(policy_id)[1] == 10
+        assert mock_policy_agent.fetch_policy_nodes(policy_id) == nodes
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+import requests
+
+from nkms_eth.providers import PooledHTTPProvider
+
+
+class StubNode(ThreadingMixIn, HTTPServer):
+    """A local JSON-RPC node answering every method with its name, after a delay"""
+
+    daemon_threads = True
+
+    def __init__(self, delay: float=0.0, block_number: int=100):
+        self.delay = delay
+        self.block_number = block_number
+        self.methods = list()
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def uri(self) -> str:
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def answer(self, request: dict) -> dict:
+        self.methods.append(request['method'])
+        if request['method'] == 'eth_blockNumber':
+            result = hex(self.block_number)
+        else:
+            result = request['method']
+        return {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.delay)
+        if isinstance(request, list):
+            response = [self.server.answer(r) for r in request]
+        else:
+            response = self.server.answer(request)
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def nodes():
+    nodes = [StubNode(delay=0.05), StubNode()]
+    yield nodes
+    for node in nodes:
+        node.shutdown()
+        node.server_close()
+
+
+def test_pooled_provider(nodes):
+    slow, fast = nodes
+    provider = PooledHTTPProvider(endpoint_uris=[slow.uri, fast.uri], health_check_interval=0)
+    sender = '0x' + '01' * 20
+
+    # Reads go to the fastest node once latencies are known
+    provider.check_health()
+    for _ in range(3):
+        assert provider.make_request('eth_call', [{}, 'latest'])['result'] == 'eth_call'
+    assert fast.methods.count('eth_call') == 3
+    assert provider.endpoint_uri == fast.uri
+    assert [r['id'] for r in provider.make_batch_request([{'jsonrpc': '2.0', 'method': 'eth_call',
+                                                           'params': [], 'id': i} for i in range(3)])] == [0, 1, 2]
+
+    # A sender's writes and pending nonce stay on one node, even when another one is faster
+    writer = provider._writer(sender)
+    writer.latency = 1.0
+    provider.make_request('eth_getTransactionCount', [sender, 'pending'])
+    provider.make_request('eth_sendTransaction', [{'from': sender}])
+    sent_to = fast if writer.uri == fast.uri else slow
+    assert sent_to.methods[-2:] == ['eth_getTransactionCount', 'eth_sendTransaction']
+
+    # Filters are read from the node that installed them
+    filter_id = provider.make_request('eth_newBlockFilter', [])['result']
+    installed_on = fast if 'eth_newBlockFilter' in fast.methods else slow
+    provider.make_request('eth_getFilterChanges', [filter_id])
+    assert installed_on.methods[-1] == 'eth_getFilterChanges'
+    assert 'error' in provider.make_request('eth_getFilterChanges', ['0xunknown'])
+
+    # Nodes lagging behind are read from last
+    provider = PooledHTTPProvider(endpoint_uris=[fast.uri, slow.uri], health_check_interval=0)
+    fast.block_number = 90
+    provider.check_health()
+    assert provider.endpoint_uri == slow.uri
+    provider.close()
+
+
+def test_pooled_provider_failover(nodes):
+    down, up = nodes
+    provider = PooledHTTPProvider(endpoint_uris=[down.uri, up.uri], health_check_interval=0)
+    sender = '0x' + '02' * 20
+    assert provider._writer(sender).uri == down.uri
+
+    down.shutdown()
+    down.server_close()
+
+    # Writes are not repeated on another node, but the sender moves to a healthy one
+    with pytest.raises(requests.RequestException):
+        provider.make_request('eth_sendTransaction', [{'from': sender}])
+    assert provider._writer(sender).uri == up.uri
+    assert provider.make_request('eth_sendTransaction', [{'from': sender}])['result'] == 'eth_sendTransaction'
+    provider.close()
+
+    # Reads are retried on the next node, and the failed one is tried last
+    provider = PooledHTTPProvider(endpoint_uris=[down.uri, up.uri], health_check_interval=0)
+    assert provider.make_request('eth_call', [{}, 'latest'])['result'] == 'eth_call'
+    assert [endpoint.uri for endpoint in provider._readers()] == [up.uri, down.uri]
+    provider.close()
@@ -0,0 +1,42 @@
+import asyncio
+
+from nkms_eth.actors import AsyncMiner
+from nkms_eth.scheduling import ActivityConfirmationScheduler
+from nkms_eth.utilities import MockNuCypherMinerConfig
+
+
+def test_confirm_activity_for_all_miners(testerchain, mock_token_deployer, mock_miner_agent):
+
+    mock_token_deployer._global_airdrop(amount=10000)
+
+    _origin, *everybody = testerchain._chain.web3.eth.accounts
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    miners = [AsyncMiner(miner_agent=mock_miner_agent, address=address, loop=loop) for address in everybody]
+    amount = 1000 * mock_token_deployer._M
+    loop.run_until_complete(asyncio.gather(*(miner.stake(amount=amount, locktime=10) for miner in miners)))
+
+    testerchain.wait_time(MockNuCypherMinerConfig._hours_per_period)
+
+    scheduler = ActivityConfirmationScheduler(miner_agent=mock_miner_agent, miners=miners, retry_delay=0, loop=loop)
+
+    # The period is computed locally, in agreement with the contract
+    current_period = scheduler.get_current_period()
+    assert current_period == mock_miner_agent.read().getCurrentPeriod()
+
+    reports = loop.run_until_complete(scheduler.run(periods=1))
+    report = reports[current_period]
+    assert not report.failures
+    assert set(report.latencies) == {miner.address for miner in miners}
+    assert report.max_latency >= report.mean_latency > 0
+
+    # Every miner has confirmed the next period
+    for miner in miners:
+        n_confirmed = mock_miner_agent.read_miner_info(mock_miner_agent.MinerInfo.CONFIRMED_PERIODS_LENGTH,
+                                                       miner.address)
+        last_period = mock_miner_agent.read_miner_info(mock_miner_agent.MinerInfo.CONFIRMED_PERIOD,
+                                                       miner.address, n_confirmed - 1)
+        assert last_period == current_period + 1
+
+    loop.close()